@@ -3,6 +3,14 @@ import { Upload, CheckCircle, AlertCircle, Loader2 } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent } from '@/components/ui/card';
 import { Progress } from '@/components/ui/progress';
+import { subscribeTaskStatus, type VideoAnalysisTask } from '@/lib/api';
+
+const STAGE_LABELS: Record<string, string> = {
+  loading_model: '加载模型中...',
+  inference: '姿态分析中...',
+  transcoding: '视频转码中...',
+  saving: '保存结果中...',
+};
 
 interface VideoUploadProps {
   onUploadComplete: (taskId: string) => void;
@@ -13,6 +21,7 @@ export function VideoUpload({ onUploadComplete, trainingType }: VideoUploadProps
   const [file, setFile] = useState<File | null>(null);
   const [uploading, setUploading] = useState(false);
   const [progress, setProgress] = useState(0);
+  const [stage, setStage] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
@@ -42,6 +51,7 @@ export function VideoUpload({ onUploadComplete, trainingType }: VideoUploadProps
 
     setUploading(true);
     setProgress(0);
+    setStage(null);
     setError(null);
 
     try {
@@ -61,27 +71,39 @@ export function VideoUpload({ onUploadComplete, trainingType }: VideoUploadProps
       const data = await response.json();
       const taskId = data.task_id;
 
-      // 轮询获取处理进度
-      const pollInterval = setInterval(async () => {
-        try {
-          const statusResponse = await fetch(`http://localhost:5000/api/status/${taskId}`);
-          const statusData = await statusResponse.json();
-
-          setProgress(statusData.progress);
-
-          if (statusData.status === 'completed') {
-            clearInterval(pollInterval);
-            setUploading(false);
-            onUploadComplete(taskId);
-          } else if (statusData.status === 'failed') {
-            clearInterval(pollInterval);
-            setUploading(false);
-            setError(statusData.error || '处理失败');
-          }
-        } catch (err) {
-          console.error('获取状态失败:', err);
+      // 处理任务状态：返回 true 表示任务已结束
+      const handleStatus = (statusData: VideoAnalysisTask) => {
+        setProgress(statusData.progress);
+        // 结果保存后 stage 已是 done，后台转码期间以任务状态 transcoding 为准
+        setStage(statusData.status === 'transcoding' ? statusData.status : statusData.stage ?? null);
+
+        if (statusData.status === 'completed') {
+          setUploading(false);
+          onUploadComplete(taskId);
+          return true;
+        } else if (statusData.status === 'failed') {
+          setUploading(false);
+          setError(statusData.error || '处理失败');
+          return true;
         }
-      }, 1000);
+        return false;
+      };
+
+      // 服务端推送进度；推送连接失败时回退到轮询
+      subscribeTaskStatus(taskId, handleStatus, () => {
+        const pollInterval = setInterval(async () => {
+          try {
+            const statusResponse = await fetch(`http://localhost:5000/api/status/${taskId}`);
+            const statusData = await statusResponse.json();
+
+            if (handleStatus(statusData)) {
+              clearInterval(pollInterval);
+            }
+          } catch (err) {
+            console.error('获取状态失败:', err);
+          }
+        }, 1000);
+      });
     } catch (err) {
       setUploading(false);
       setError(err instanceof Error ? err.message : '上传失败');
@@ -159,7 +181,9 @@ export function VideoUpload({ onUploadComplete, trainingType }: VideoUploadProps
               <>
                 <Loader2 className="w-12 h-12 text-brand animate-spin" />
                 <div className="w-full max-w-md">
-                  <p className="text-lg font-medium text-slate-700 mb-2">处理中...</p>
+                  <p className="text-lg font-medium text-slate-700 mb-2">
+                    {(stage && STAGE_LABELS[stage]) || '处理中...'}
+                  </p>
                   <Progress value={progress} className="h-2" />
                   <p className="text-sm text-slate-500 mt-2">{progress}%</p>
                 </div>
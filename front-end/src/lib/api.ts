@@ -118,8 +118,9 @@ const API_BASE_URL = 'http://localhost:5000/api';
 
 export interface VideoAnalysisTask {
   task_id: string;
-  status: 'uploaded' | 'processing' | 'completed' | 'failed';
+  status: 'uploaded' | 'processing' | 'transcoding' | 'completed' | 'failed';
   progress: number;
+  stage?: 'loading_model' | 'inference' | 'transcoding' | 'saving' | 'done';
   error?: string;
 }
 
@@ -162,6 +163,40 @@ export async function getTaskStatus(taskId: string): Promise<VideoAnalysisTask>
   return response.json();
 }
 
+/**
+ * 通过 Server-Sent Events 订阅任务状态，代替轮询 getTaskStatus。
+ * 传入多个任务 ID 时共用一个连接；任务全部结束后服务端关闭连接。返回取消订阅的函数。
+ * 连接失败（例如代理不支持 SSE）时调用 onConnectionError，调用方可回退到轮询。
+ */
+export function subscribeTaskStatus(
+  taskIds: string | string[],
+  onStatus: (task: VideoAnalysisTask) => void,
+  onConnectionError?: () => void
+): () => void {
+  const url = Array.isArray(taskIds)
+    ? `${API_BASE_URL}/status/stream?task_ids=${taskIds.map(encodeURIComponent).join(',')}`
+    : `${API_BASE_URL}/status/${encodeURIComponent(taskIds)}/stream`;
+  const source = new EventSource(url);
+  let ended = false;
+
+  source.addEventListener('status', (event) => {
+    onStatus(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener('end', () => {
+    ended = true;
+    source.close();
+  });
+  source.onerror = () => {
+    // 服务端推送 end 后关闭连接也会触发 error，此时不算失败
+    if (!ended) {
+      source.close();
+      onConnectionError?.();
+    }
+  };
+
+  return () => source.close();
+}
+
 export async function getAnalysisResult(taskId: string): Promise<{ metrics: MetricsFrame[] }> {
   const response = await fetch(`${API_BASE_URL}/result/${taskId}`);
   
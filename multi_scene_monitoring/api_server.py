@@ -2,6 +2,8 @@
 
 import os
 import json
+import contextlib
+import functools
 import cv2
 import numpy as np
 import re
@@ -14,20 +16,41 @@ from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import tempfile
+import time
 import uuid
 from datetime import datetime
 
-# 根据环境与依赖情况决定是否进入模拟模式
-SIMULATION_MODE = False
-try:
-    from modules.inference_engine_pytorch import InferenceEnginePyTorch
-except Exception as _e:
-    print(f"[WARN] 无法加载PyTorch推理引擎，进入模拟模式: {_e}")
-    InferenceEnginePyTorch = None
-    SIMULATION_MODE = True
+from modules.engine_factory import AUTO_BACKEND, INFERENCE_BACKENDS, default_model_path, resolve_backend
+from modules.engine_selection import create_selected_engine
 
-from modules.parse_poses import parse_poses
+# 推理后端：auto（默认，按本机微基准测试结果选择）、pytorch、onnx 或 openvino
+INFERENCE_BACKEND = resolve_backend()
+
+from modules.batch_scheduler import BatchInferenceScheduler
 from modules.draw import draw_poses
+from modules.ffmpeg_decoder import FFmpegFrameReader
+from modules.frame_sampling import (
+    adjust_stride_for_motion,
+    calculate_adaptive_stride,
+    estimate_pose_motion,
+    interpolate_poses,
+    stitch_order,
+)
+from modules.motion_gate import MotionGate, resolve_motion_threshold
+from modules.pose import PoseTracker
+from modules.pose_cache import PoseCacheWriter, load_pose_cache
+from modules.model_manager import ModelManager
+from modules.pose_roi import PersonRoiTracker, infer_frame_poses, infer_with_roi
+from modules.result_cache import ResultCache, file_sha256, make_cache_key, save_stream_with_hash
+from modules.shape_buckets import BUCKET_WIDTHS
+from modules.stage_timer import observe_stages, timed
+from modules.task_events import TaskEvents
+from modules.task_profiler import PROFILE_FILES, profile_paths, profile_task
+from modules.transcode_queue import TranscodeQueue, is_browser_h264, probe_video_stream
+from modules.telemetry import REGISTRY, Counter, Gauge, Histogram
+from modules.live_session import LiveSession, normalize_stream_source
+from modules.partial_results import PartialResults
+from modules.task_checkpoint import TaskCheckpoint
 from scenes.basketball.metrics_calculator import BasketballMetricsCalculator
 
 app = Flask(__name__)
@@ -54,22 +77,221 @@ app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 最大500MB
 
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
 
-# 加载模型（若缺失或初始化失败则进入模拟模式）
-model_path = str(PROJECT_ROOT / 'human-pose-estimation-3d.pth')
-pose_net = None
-if not SIMULATION_MODE:
-    if not Path(model_path).exists():
+# 推理帧间隔：1 为逐帧推理，N 为每 N 帧推理一次，auto 为按时长与动作幅度自适应
+DEFAULT_FRAME_STRIDE = os.environ.get('FRAME_STRIDE', '1')
+
+# 静止帧门控：画面几乎无变化时复用上一帧姿态，阈值按训练类型通过 MOTION_GATE_<TYPE> 配置
+DEFAULT_MOTION_GATE = os.environ.get('MOTION_GATE', '0')
+
+# ROI 推理：检测到人后只对其周围的裁剪区域推理，跟丢时回退整帧
+DEFAULT_ROI_MODE = os.environ.get('ROI_INFERENCE', '0')
+
+# 分段并行：把长视频按时间切成带重叠的分段，用多个进程并行处理；1 为关闭，auto 为 CPU 核数
+DEFAULT_PARALLEL_WORKERS = os.environ.get('PARALLEL_WORKERS', '1')
+SEGMENT_OVERLAP = int(os.environ.get('SEGMENT_OVERLAP', '30'))  # 分段之间用于预热的重叠帧数
+MIN_SEGMENT_FRAMES = 150
+
+# 跨任务批量推理：开启后各任务的帧凑满 BATCH_MAX_SIZE 或等待 BATCH_MAX_WAIT_MS 毫秒后合批推理
+BATCH_INFERENCE = os.environ.get('BATCH_INFERENCE', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '8'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '10'))
+
+# 视频解码：opencv 为 cv2.VideoCapture 解码后再缩放；ffmpeg 由 ffmpeg 管道直接输出网络输入尺寸的帧
+# （连同绘制用的原分辨率帧）到复用的缓冲池；auto 在找到 ffmpeg 时使用 ffmpeg
+VIDEO_DECODER = os.environ.get('VIDEO_DECODER', 'opencv').strip().lower()
+
+# H.264 转码在独立的线程池中排队进行：同时运行的转码数（默认每 4 个核一个）与每个转码的编码线程数（0 为按核数均分）
+TRANSCODE_WORKERS = int(os.environ.get('TRANSCODE_WORKERS', str(max(1, (os.cpu_count() or 1) // 4))))
+TRANSCODE_THREADS = int(os.environ.get('TRANSCODE_THREADS', '0'))
+
+# 性能剖析：开启后任务在 cProfile 与 tracemalloc 下运行（明显变慢），也可在上传时用 profile 字段逐个开启
+DEFAULT_PROFILE = os.environ.get('PROFILE_TASKS', '0')
+
+# 实时分析会话：同时运行的会话数上限、默认延迟预算（毫秒，超出的帧直接丢弃）与是否使用 ROI 推理
+LIVE_MAX_SESSIONS = int(os.environ.get('LIVE_MAX_SESSIONS', '2'))
+LIVE_MAX_LATENCY_MS = float(os.environ.get('LIVE_MAX_LATENCY_MS', '500'))
+DEFAULT_LIVE_ROI = os.environ.get('LIVE_ROI_INFERENCE', '1')
+# 实时会话允许连接的视频流协议与主机白名单（逗号分隔的主机名、IP 或网段）；
+# 白名单为空时只允许公网地址，内网摄像头需要加入白名单
+LIVE_STREAM_SCHEMES = tuple(scheme.strip().lower() for scheme in
+                            os.environ.get('LIVE_STREAM_SCHEMES', 'rtsp,rtmp,http,https').split(',') if scheme.strip())
+LIVE_ALLOWED_HOSTS = tuple(host.strip() for host in os.environ.get('LIVE_ALLOWED_HOSTS', '').split(',') if host.strip())
+
+# 检查点间隔（帧）：每处理这么多帧落盘一次进度，服务重启后从最近的检查点继续，0 为关闭
+CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', '500'))
+# 同一任务最多自动续跑的次数，避免每次续跑都让进程崩溃的任务无限重启
+MAX_RESUME_ATTEMPTS = int(os.environ.get('MAX_RESUME_ATTEMPTS', '3'))
+
+# 自动选择的测试结果按主机名保存，之后启动直接复用
+ENGINE_SELECTION_PATH = Path(os.environ.get('ENGINE_SELECTION_PATH', PROJECT_ROOT / 'engine_selection.json'))
+
+# 模型文件缺失或引擎初始化失败时进入模拟模式；auto 模式下取第一个存在的模型文件
+if INFERENCE_BACKEND == AUTO_BACKEND:
+    model_path = next((path for path in (default_model_path(PROJECT_ROOT, backend) for backend in INFERENCE_BACKENDS)
+                       if Path(path).exists()), default_model_path(PROJECT_ROOT, 'pytorch'))
+else:
+    model_path = default_model_path(PROJECT_ROOT, INFERENCE_BACKEND)
+SIMULATION_MODE = not Path(model_path).exists()
+# 实际使用的推理配置与各配置的测试耗时，由 load_pose_net 填充，/api/diagnostics 返回
+engine_selection = {}
+# 并行分段子进程沿用主进程选定的推理配置，由 process_video_segment 设置
+inherited_engine_config = None
+
+# 预热使用的典型视频分辨率（宽x高，逗号分隔），覆盖横屏与竖屏拍摄
+WARMUP_FRAME_SIZES = os.environ.get('WARMUP_FRAME_SIZES', '1280x720,1920x1080,720x1280')
+
+
+def load_pose_net():
+    """创建推理引擎（由 model_manager 在后台线程中调用），模拟模式下返回 None"""
+    global SIMULATION_MODE
+    if SIMULATION_MODE:
         print(f"[WARN] 模型文件缺失：{model_path}，将使用模拟模式")
+        return None
+    try:
+        engine, selection = create_selected_engine(PROJECT_ROOT, INFERENCE_BACKEND, ENGINE_SELECTION_PATH,
+                                                   selected=inherited_engine_config)
+    except Exception:
+        # 模型文件存在却无法加载：任务仍以模拟模式处理，但加载状态为 failed，就绪检查返回 503
         SIMULATION_MODE = True
-    else:
+        raise
+    engine_selection.update(selection)
+    if engine is None:
+        SIMULATION_MODE = True
+        raise RuntimeError('没有可用的推理后端')
+    config = selection['selected']
+    print(f"[INFO] 推理后端: {config['backend']}，设备: {getattr(engine, 'device', 'cpu')}，"
+          f"线程数: {config['threads'] or '默认'}{'（本机测试结果）' if selection['mode'] == AUTO_BACKEND else ''}")
+
+    # 跨任务批量推理：多个任务同时处理时把各自的帧合批后统一推理，减少对模型的争用
+    if BATCH_INFERENCE:
+        engine = BatchInferenceScheduler(engine, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS).start()
+        print(f"[INFO] 已开启跨任务批量推理，最大批量 {engine.max_batch_size}")
+    return engine
+
+
+def warmup_pose_net(engine):
+    """按预期分辨率各跑一次完整推理，让首个真实请求不再承担内存分配与算子初始化"""
+    for size in WARMUP_FRAME_SIZES.split(','):
         try:
-            pose_net = InferenceEnginePyTorch(model_path, 'GPU', use_tensorrt=False)
-        except Exception as _e:
-            print(f"[WARN] 初始化推理引擎失败，进入模拟模式: {_e}")
-            SIMULATION_MODE = True
+            width, height = (int(v) for v in size.lower().split('x'))
+        except ValueError:
+            continue
+        infer_frame_poses(engine, np.zeros((height, width, 3), dtype=np.uint8))
+
+
+# 导入本模块不会加载模型：服务启动、首次上传或就绪探测时在后台加载并预热
+model_manager = ModelManager(load_pose_net, warmup_pose_net)
+
+
+def is_simulated():
+    """当前是否以模拟模式产出姿态：模型文件缺失，或加载、预热任一环节失败"""
+    return SIMULATION_MODE or model_manager.simulated
+
+
+@functools.lru_cache(maxsize=8)
+def _model_file_hash(path, size, mtime):
+    return file_sha256(path)[:16]
+
+
+def model_version():
+    """模型版本参与上传去重的缓存键，换模型、后端或精度后旧结果不再复用。
+
+    等模型加载结束后按实际使用的引擎计算：加载或预热失败时产出的是模拟姿态，版本为 simulation。
+    """
+    model_manager.get()
+    if is_simulated():
+        return 'simulation'
+    config = engine_selection.get('selected') or {}
+    path = config.get('model_path', model_path)
+    stat = Path(path).stat()
+    return (f"{_model_file_hash(str(path), stat.st_size, stat.st_mtime_ns)}-"
+            f"{config.get('backend', INFERENCE_BACKEND)}-{os.environ.get('INFERENCE_PRECISION', 'fp32')}")
+
+# 上传去重索引：相同内容、训练类型与模型版本的任务直接复用已有产物
+result_cache = ResultCache(OUTPUT_FOLDER / 'result_cache.json')
 
 # 存储处理任务状态
 processing_tasks = {}
+# 状态、阶段或进度变化时通知 SSE 连接
+task_events = TaskEvents()
+SSE_HEARTBEAT_SECONDS = 15
+transcode_queue = TranscodeQueue(TRANSCODE_WORKERS, TRANSCODE_THREADS or None)
+# 指标与姿态缓存已落盘、输出视频仍在转码的任务也可以读取结果
+RESULT_READY_STATUSES = ('transcoding', 'completed')
+# 实时分析会话，结果更新时通过 live_events 通知推送连接
+live_sessions = {}
+live_events = TaskEvents()
+
+# 运行指标（/api/metrics）：记录只是一次加锁累加，不影响逐帧处理的耗时
+STAGE_SECONDS = Histogram('pose_stage_seconds', 'Per-stage latency of the video pipeline (self time)', ['stage'],
+                          buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                                   10, 30, 60, 120))
+FRAMES_PROCESSED = Counter('pose_frames_processed_total', 'Frames written to output videos')
+TASK_FPS = Histogram('pose_task_completed_fps', 'Average processing speed of completed tasks (frames/s)',
+                     buckets=(0.5, 1, 2, 5, 10, 15, 25, 30, 60, 120))
+TASKS_FINISHED = Counter('pose_tasks_finished_total', 'Processing tasks finished', ['status'])
+ACTIVE_WORKERS = Gauge('pose_active_workers', 'Running processing threads and segment processes', ['kind'])
+TRANSCODE_SECONDS = Histogram('pose_transcode_seconds', 'H.264 transcode duration', ['result'],
+                              buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+UPLOAD_BYTES = Counter('pose_upload_bytes_total', 'Bytes received by /api/upload')
+UPLOADS = Counter('pose_uploads_total', 'Uploads, by whether an earlier result was reused', ['cached'])
+VIDEO_BYTES_SERVED = Counter('pose_video_bytes_served_total', 'Video bytes served', ['endpoint', 'request'])
+DEEPSEEK_SECONDS = Histogram('deepseek_request_seconds', 'DeepSeek API call latency',
+                             buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60))
+DEEPSEEK_REQUESTS = Counter('deepseek_requests_total', 'AI analysis requests, by outcome', ['result'])
+DEEPSEEK_FALLBACKS = Counter('deepseek_fallbacks_total', 'AI analyses answered by the mock fallback', ['reason'])
+TASKS_BY_STATUS = Gauge('pose_tasks', 'Tasks currently known to the server, by status', ['status'])
+TASK_CURRENT_FPS = Gauge('pose_task_fps', 'Processing speed of running tasks (frames/s)', ['task_id'])
+QUEUE_DEPTH = Gauge('pose_queue_depth', 'Work waiting to run', ['queue'])
+
+_stage_children = {}
+
+
+def _observe_stage(name, seconds):
+    child = _stage_children.get(name)
+    if child is None:
+        child = _stage_children[name] = STAGE_SECONDS.labels(name)
+    child.observe(seconds)
+
+
+observe_stages(_observe_stage)
+
+
+def _tasks_by_status():
+    counts = {}
+    for task in list(processing_tasks.values()):
+        key = (task.get('status', 'unknown'),)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _running_task_fps():
+    now = time.time()
+    return {(task_id,): round(task.get('processed_frames', 0) / max(now - task['started_at'], 1e-6), 3)
+            for task_id, task in list(processing_tasks.items())
+            if task.get('status') == 'processing' and 'started_at' in task}
+
+
+def _queue_depth():
+    engine = model_manager.engine
+    pending = engine.stats()['queue_depth'] if isinstance(engine, BatchInferenceScheduler) else 0
+    waiting = sum(1 for task in list(processing_tasks.values()) if task.get('status') == 'uploaded')
+    return {('inference_frames',): pending, ('tasks_waiting',): waiting,
+            ('transcodes_waiting',): transcode_queue.stats()['waiting']}
+
+
+def _live_sessions_by_state():
+    counts = {}
+    for session in list(live_sessions.values()):
+        counts[(session.state,)] = counts.get((session.state,), 0) + 1
+    return counts
+
+
+LIVE_SESSIONS = Gauge('pose_live_sessions', 'Live analysis sessions, by state', ['state'])
+LIVE_SESSIONS.set_function(_live_sessions_by_state)
+TASKS_BY_STATUS.set_function(_tasks_by_status)
+TASK_CURRENT_FPS.set_function(_running_task_fps)
+QUEUE_DEPTH.set_function(_queue_depth)
 
 # 存储学员信息（实际应用中应使用数据库）
 students_db = [
@@ -91,11 +313,8 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def transcode_video_to_h264(input_path: Path) -> Tuple[bool, Optional[str]]:
-    """使用 FFmpeg 将视频转码为浏览器友好的 H.264 Baseline 格式。
-
-    返回 (success, error_message)。成功时 error_message 为 None。
-    """
+def find_ffmpeg() -> Optional[str]:
+    """查找 ffmpeg 可执行文件，找不到时返回 None"""
     # 首先尝试系统PATH中的ffmpeg
     ffmpeg_path = shutil.which('ffmpeg')
     
@@ -104,7 +323,151 @@ def transcode_video_to_h264(input_path: Path) -> Tuple[bool, Optional[str]]:
         local_ffmpeg = Path("C:/ffmpeg/ffmpeg-8.0-essentials_build/bin/ffmpeg.exe")
         if local_ffmpeg.exists():
             ffmpeg_path = str(local_ffmpeg)
+    return ffmpeg_path
+
+
+def open_video_writer(output_path: Path, fps: float, frame_size: Tuple[int, int]):
+    """按兼容性优先级依次尝试编码器，返回已打开的 VideoWriter"""
+    # 使用最兼容的编码器
+    fourcc_options = [
+        ('mp4v', 'MP4V'),  # MPEG-4编码 (最兼容)
+        ('XVID', 'XVID'),  # Xvid编码
+        ('MJPG', 'MJPEG'), # Motion JPEG
+        ('DIVX', 'DIVX'),  # DivX编码
+        ('avc1', 'H.264'),  # H.264编码 (如果可用)
+    ]
+    
+    out = None
+    for codec_str, codec_name in fourcc_options:
+        try:
+            fourcc = cv2.VideoWriter_fourcc(*codec_str)
+            out = cv2.VideoWriter(str(output_path), fourcc, fps, frame_size)
+            
+            # 验证视频写入器是否成功初始化
+            if out.isOpened():
+                print(f"Successfully initialized VideoWriter with {codec_name} codec")
+                break
+            else:
+                out.release()
+                out = None
+        except Exception as e:
+            print(f"Failed to use {codec_name} codec: {e}")
+            if out:
+                out.release()
+            out = None
     
+    if not out or not out.isOpened():
+        raise RuntimeError("无法初始化视频编码器，请检查 OpenCV 和 FFmpeg 安装")
+    return out
+
+
+def open_frame_reader(cap, video_path, width, height, pool_size):
+    """按 VIDEO_DECODER 返回解码器：ffmpeg 可用时换成 FFmpegFrameReader 并释放 cap，否则原样返回 cap。
+
+    带旋转元数据的视频仍用 OpenCV 解码，避免两者对画面方向的处理不一致。
+    pool_size 须大于两个关键帧之间缓存的帧数，否则待插值的帧会被覆盖。
+    """
+    if VIDEO_DECODER not in ('ffmpeg', 'auto'):
+        return cap
+    ffmpeg_path = find_ffmpeg()
+    if ffmpeg_path is None:
+        if VIDEO_DECODER == 'ffmpeg':
+            print("[WARN] 找不到 ffmpeg，改用 OpenCV 解码")
+        return cap
+    orientation_prop = getattr(cv2, 'CAP_PROP_ORIENTATION_META', None)
+    if orientation_prop is not None and cap.get(orientation_prop):
+        return cap
+    try:
+        reader = FFmpegFrameReader(ffmpeg_path, video_path, width, height, pool_size=pool_size)
+    except OSError as exc:
+        print(f"[WARN] 启动 ffmpeg 解码失败，改用 OpenCV 解码: {exc}")
+        return cap
+    cap.release()
+    return reader
+
+
+def seek_video(cap, frame_idx: int) -> bool:
+    """将视频定位到指定帧；容器不支持精确跳转时逐帧 grab 前进"""
+    if frame_idx <= 0:
+        return True
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+        return True
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_idx):
+        if not cap.grab():
+            return False
+    return True
+
+
+def concat_video_segments(segments: List[Path], output_path: Path):
+    """把检查点切分出的多个视频分段合并成一个输出文件，合并后删除分段"""
+    if len(segments) == 1:
+        os.replace(segments[0], output_path)
+        return
+
+    ffmpeg_path = find_ffmpeg()
+    if ffmpeg_path:
+        list_path = output_path.with_name(f"{output_path.stem}_segments.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for segment in segments:
+                f.write(f"file '{Path(segment).resolve().as_posix()}'\n")
+        command = [ffmpeg_path, '-y', '-f', 'concat', '-safe', '0', '-i', str(list_path),
+                   '-c', 'copy', str(output_path)]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        list_path.unlink(missing_ok=True)
+        if result.returncode == 0 and output_path.exists():
+            for segment in segments:
+                Path(segment).unlink(missing_ok=True)
+            return
+        print(f"[WARN] FFmpeg 合并分段失败，改用 OpenCV 重新编码: {result.stderr.strip()}")
+
+    # 没有 ffmpeg 时用 OpenCV 逐帧重新写入
+    out = None
+    for segment in segments:
+        cap = cv2.VideoCapture(str(segment))
+        if out is None:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            out = open_video_writer(output_path, fps, size)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+    if out is not None:
+        out.release()
+    for segment in segments:
+        Path(segment).unlink(missing_ok=True)
+
+
+def transcode_video_to_h264(input_path: Path, threads: Optional[int] = None) -> Tuple[bool, Optional[str]]:
+    """使用 FFmpeg 将视频转码为浏览器友好的 H.264 Baseline 格式。
+
+    threads 为解码与编码使用的线程数，不指定时由 ffmpeg 按核数决定。
+    返回 (success, error_message)。成功时 error_message 为 None。
+    """
+    thread_args = ['-threads', str(threads)] if threads else []
+    return _rewrite_video_with_ffmpeg(input_path, 'h264', thread_args, [
+        '-c:v', 'libx264',
+        '-profile:v', 'baseline',
+        '-level', '3.0',
+        '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart',
+        *thread_args,
+    ])
+
+
+def remux_faststart(input_path: Path) -> Tuple[bool, Optional[str]]:
+    """不重新编码，只把 MP4 的 moov 索引移到文件开头（-c copy -movflags +faststart），
+    浏览器无需下载完整文件即可开始播放。返回 (success, error_message)。
+    """
+    return _rewrite_video_with_ffmpeg(input_path, 'faststart', [], ['-c', 'copy', '-movflags', '+faststart'])
+
+
+def _rewrite_video_with_ffmpeg(input_path, tag, input_args, output_args):
+    """用 ffmpeg 把视频写到同目录的临时文件，成功后原子替换原文件"""
+    ffmpeg_path = find_ffmpeg()
     if not ffmpeg_path:
         return False, '找不到 ffmpeg，请确认已经安装并加入 PATH'
 
@@ -112,22 +475,11 @@ def transcode_video_to_h264(input_path: Path) -> Tuple[bool, Optional[str]]:
     if not input_path.exists():
         return False, '待转码的视频文件不存在'
 
-    temp_output = input_path.with_name(f"{input_path.stem}_h264{input_path.suffix}")
+    temp_output = input_path.with_name(f"{input_path.stem}_{tag}{input_path.suffix}")
     if temp_output.exists():
         temp_output.unlink()
 
-    command = [
-        ffmpeg_path,
-        '-y',
-        '-i', str(input_path),
-        '-c:v', 'libx264',
-        '-profile:v', 'baseline',
-        '-level', '3.0',
-        '-pix_fmt', 'yuv420p',
-        '-movflags', '+faststart',
-        str(temp_output)
-    ]
-
+    command = [ffmpeg_path, '-y', '-nostdin', *input_args, '-i', str(input_path), *output_args, str(temp_output)]
     result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
     if result.returncode != 0 or not temp_output.exists():
@@ -218,24 +570,497 @@ def generate_mock_poses(frame, frame_idx):
     return poses_3d, poses_2d
 
 
-def process_video(video_path, task_id, training_type='dribbling'):
-    """处理视频并生成带骨架的输出视频和指标数据"""
+# 关键点名称映射（与前端中文标注一致，按 panoptic 19 点顺序）
+KEYPOINT_NAMES = [
+    '颈部', '鼻尖', '骨盆',
+    '左肩', '左肘', '左腕',
+    '左髋', '左膝', '左踝',
+    '右肩', '右肘', '右腕',
+    '右髋', '右膝', '右踝',
+    '右眼', '左眼', '右耳', '左耳'
+]
+
+
+def parse_flag(value, default=False):
+    """解析开关类参数（表单字段或环境变量）"""
+    if value is None:
+        return default
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_frame_stride(value):
+    """解析帧间隔配置：正整数为固定间隔，'auto' 表示按视频时长与动作幅度自适应"""
+    if value is None:
+        return 1
+    value = str(value).strip().lower()
+    if value == 'auto':
+        return 'auto'
+    try:
+        return max(1, int(value))
+    except ValueError:
+        return 1
+
+
+def parse_parallel_workers(value):
+    """解析分段并行进程数：正整数或 'auto'（按 CPU 核数）"""
+    if value is None:
+        return 1
+    value = str(value).strip().lower()
+    if value == 'auto':
+        return 'auto'
+    try:
+        return max(1, int(value))
+    except ValueError:
+        return 1
+
+
+def resolve_parallel_workers(value):
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def inference_session():
+    """登记一个正在处理的任务；批量推理调度器据此决定是否等待其他任务的帧凑批"""
+    engine = model_manager.get()
+    if isinstance(engine, BatchInferenceScheduler):
+        return engine.session()
+    return contextlib.nullcontext()
+
+
+def estimate_frame_poses(frame, frame_idx, pose_tracker, roi_tracker=None, prescaled=None):
+    """对单帧执行姿态估计，模拟模式下返回模拟关键点；pose_tracker 为该任务或会话自己的跟踪状态，
+    传入 roi_tracker 时使用 ROI 裁剪推理，prescaled 为解码器输出的网络输入 (图像, padding)"""
+    pose_net = model_manager.get()
+    if pose_net is None:
+        with timed('infer'):
+            return generate_mock_poses(frame, frame_idx)
+    return infer_with_roi(pose_net, frame, roi_tracker, pose_tracker=pose_tracker, prescaled=prescaled)
+
+
+def filter_training_metrics(person_metrics: Dict[str, float], training_type: str) -> Dict[str, float]:
+    """根据训练类型筛选相关指标"""
+    if training_type == 'dribbling':
+        return {
+            'dribble_frequency': person_metrics.get('dribble_frequency', 0),
+            'center_of_mass': person_metrics.get('center_of_mass', 0),
+            'left_wrist_angle': person_metrics.get('left_elbow_angle', 0),
+            'right_wrist_angle': person_metrics.get('right_elbow_angle', 0),
+            'left_elbow_angle': person_metrics.get('left_elbow_angle', 0),
+            'right_elbow_angle': person_metrics.get('right_elbow_angle', 0),
+            'left_shoulder_angle': person_metrics.get('left_shoulder_angle', 0),
+            'right_shoulder_angle': person_metrics.get('right_shoulder_angle', 0),
+            'left_knee_angle': person_metrics.get('left_knee_angle', 0),
+            'right_knee_angle': person_metrics.get('right_knee_angle', 0),
+        }
+    if training_type == 'defense':
+        return {
+            'defense_center_fluctuation': person_metrics.get('defense_center_fluctuation', 0),
+            'arm_spread_ratio': person_metrics.get('arm_spread_ratio', 0),
+            'arm_spread_distance': person_metrics.get('arm_spread_distance', 0),
+            'leg_spread_ratio': person_metrics.get('leg_spread_ratio', 0),
+            'leg_spread_distance': person_metrics.get('leg_spread_distance', 0),
+            'defense_knee_angle': person_metrics.get('defense_knee_angle', 0),
+            'body_balance': person_metrics.get('body_balance', 0),
+        }
+    if training_type == 'shooting':
+        return {
+            'shooting_elbow_angle': person_metrics.get('shooting_elbow_angle', 0),
+            'shooting_support_elbow_angle': person_metrics.get('shooting_support_elbow_angle', 0),
+            'wrist_extension_angle': person_metrics.get('wrist_extension_angle', 0),
+            'upper_arm_body_angle': person_metrics.get('upper_arm_body_angle', 0),
+            'shooting_release_height': person_metrics.get('shooting_release_height', 0),
+            'shooting_body_alignment': person_metrics.get('shooting_body_alignment', 0),
+            'hand_coordination': person_metrics.get('hand_coordination', 0),
+        }
+    return person_metrics
+
+
+def build_keypoints_list(pose_2d) -> List[Dict[str, Any]]:
+    """提取单人的2D关键点（与 metrics 一起保存，供前端叠加绘制使用）"""
+    keypoints_list = []
+    try:
+        pose2d = np.array(pose_2d[0:-1]).reshape((-1, 3))  # (19,3) => x,y,conf
+        for i, name in enumerate(KEYPOINT_NAMES):
+            x, y, conf = pose2d[i]
+            if conf == -1:
+                # 缺失关键点用占位，前端会自动跳过低置信度/缺失
+                keypoints_list.append({
+                    'name': name,
+                    'x': float(x if x != -1 else 0),
+                    'y': float(y if y != -1 else 0),
+                    'confidence': float(conf if conf != -1 else 0.0)
+                })
+            else:
+                keypoints_list.append({
+                    'name': name,
+                    'x': float(x),
+                    'y': float(y),
+                    'confidence': float(conf)
+                })
+    except Exception:
+        # 回退：如果解析失败则给空数组
+        keypoints_list = []
+    return keypoints_list
+
+
+def build_frame_metrics(frame_idx, fps, poses_3d, poses_2d, R, t, metrics_calculator, training_type):
+    """计算单帧中每个人的训练指标与关键点"""
+    frame_metrics = {
+        'frame': frame_idx,
+        'timestamp': frame_idx / fps,
+        'people': []
+    }
+
+    if len(poses_3d) > 0:
+        with timed('canonicalize'):
+            canonical_poses = canonicalize_poses(poses_3d, R, t)
+
+        for person_idx, pose in enumerate(canonical_poses):
+            # 计算该人的所有指标
+            with timed('metrics'):
+                person_metrics = metrics_calculator.calculate_all_metrics(pose)
+            frame_metrics['people'].append({
+                'person_id': person_idx,
+                'metrics': filter_training_metrics(person_metrics, training_type),
+                'keypoints': build_keypoints_list(poses_2d[person_idx])
+            })
+
+    return frame_metrics
+
+
+class FrameLoopState:
+    """逐帧处理循环中需要跨帧保留的状态，断点续跑时整体写入检查点"""
+
+    def __init__(self, training_type, base_stride, fps, motion_gate=False, roi_mode=False):
+        self.next_frame = 0  # 下一帧待处理的帧号
+        self.last_key = None  # 最近一次推理的关键帧 (frame_idx, poses_3d, poses_2d)
+        self.current_stride = base_stride
+        self.inferred_frames = 0
+        self.reused_frames = 0
+        self.segments = []  # 已完成并落盘的输出视频分段
+        self.pose_cache = PoseCacheWriter()  # 每帧的原始姿态，供重新分析使用
+        self.metrics_calculator = BasketballMetricsCalculator()
+        # 静止帧门控，连续复用最多约 1 秒后强制推理一次
+        self.gate = None
+        if motion_gate:
+            # 复用上限按源视频帧数计，与帧间隔无关，约 1 秒强制推理一次
+            self.gate = MotionGate(resolve_motion_threshold(training_type), max_reuse_frames=max(1, fps))
+        self.roi_tracker = PersonRoiTracker() if roi_mode else None
+        self.pose_tracker = PoseTracker()  # 本任务的姿态 ID 与平滑滤波状态，不与其他任务共享
+
+    def __getstate__(self):
+        # 原始姿态随处理进度不断增长，由 TaskCheckpoint 分块追加写入，不随状态整体 pickle
+        state = self.__dict__.copy()
+        state.pop('pose_cache', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('pose_cache', PoseCacheWriter())
+
+
+def load_extrinsics():
+    """读取摄像机外参（缺失时使用默认值）"""
+    extrinsics_path = PROJECT_ROOT / 'data' / 'extrinsics.json'
+    try:
+        with open(extrinsics_path, 'r') as f:
+            extrinsics = json.load(f)
+        R = np.array(extrinsics.get('R', np.eye(3).tolist()), dtype=np.float32)
+        t = np.array(extrinsics.get('t', [0, 0, 0]), dtype=np.float32)
+    except Exception as _e:
+        print(f"[WARN] 外参文件缺失或读取失败，使用默认值: {_e}")
+        R = np.eye(3, dtype=np.float32)
+        t = np.zeros(3, dtype=np.float32)
+    return R, t
+
+
+def infer_or_reuse(state, frame, frame_idx, prescaled=None):
+    """关键帧姿态估计；开启静止帧门控且画面无变化时直接复用上一关键帧的姿态"""
+    gate = state.gate
+    if gate is not None and state.last_key is not None and not gate.should_infer(frame, frame_idx):
+        state.reused_frames += 1
+        return state.last_key[1], state.last_key[2], 'reused'
+    if gate is not None and state.last_key is None:
+        gate.should_infer(frame, frame_idx)  # 记录首帧作为参考画面
+    state.inferred_frames += 1
+    poses_3d, poses_2d = estimate_frame_poses(frame, frame_idx, state.pose_tracker, state.roi_tracker, prescaled)
+    return poses_3d, poses_2d, 'inferred'
+
+
+def run_pose_loop(cap, state, frame_stride, base_stride, emit_frame, end_frame=None, on_keyframe=None):
+    """从 state.next_frame 开始逐帧读取视频直到 end_frame（不含）或视频结束。
+
+    关键帧执行推理，被跳过的帧在下一个关键帧到来后插值，所有帧按顺序交给
+    emit_frame(idx, frame, poses_3d, poses_2d, pose_source)。每个关键帧输出后
+    （此时没有待插值的帧）调用 on_keyframe()，可在此安全地写检查点。
+    cap 为 FFmpegFrameReader 时，推理直接使用解码器输出的网络输入。
+    """
+    pending = []  # 两个关键帧之间被跳过、等待插值的帧
+    network_input = getattr(cap, 'network_input', lambda frame: None)
+
+    def emit_interpolated(key_start, key_end):
+        start_idx, start_3d, start_2d = key_start
+        end_idx, end_3d, end_2d = key_end
+        for idx, pending_frame in pending:
+            alpha = (idx - start_idx) / (end_idx - start_idx)
+            poses_3d, poses_2d = interpolate_poses((start_3d, start_2d), (end_3d, end_2d), alpha)
+            emit_frame(idx, pending_frame, poses_3d, poses_2d, 'interpolated')
+        pending.clear()
+
+    frame_idx = state.next_frame
+    while end_frame is None or frame_idx < end_frame:
+        with timed('decode'):
+            ret, frame = cap.read()
+        if not ret:
+            break
+
+        last_key = state.last_key
+        if last_key is not None and frame_idx - last_key[0] < state.current_stride:
+            pending.append((frame_idx, frame))
+            frame_idx += 1
+            continue
+
+        # 姿态估计（推理、模拟或静止时复用）
+        poses_3d, poses_2d, pose_source = infer_or_reuse(state, frame, frame_idx, network_input(frame))
+        key = (frame_idx, poses_3d, poses_2d)
+        if last_key is not None:
+            emit_interpolated(last_key, key)
+            if frame_stride == 'auto':
+                motion = estimate_pose_motion(last_key[2], poses_2d, frame_idx - last_key[0])
+                state.current_stride = adjust_stride_for_motion(base_stride, motion)
+        emit_frame(frame_idx, frame, poses_3d, poses_2d, pose_source)
+        state.last_key = key
+        frame_idx += 1
+        state.next_frame = frame_idx
+
+        if on_keyframe is not None:
+            on_keyframe()
+
+    # 末尾被跳过的帧：对最后一帧补一次推理作为收尾关键帧
+    if pending:
+        end_idx, end_frame_img = pending.pop()
+        poses_3d, poses_2d, pose_source = infer_or_reuse(state, end_frame_img, end_idx, network_input(end_frame_img))
+        key = (end_idx, poses_3d, poses_2d)
+        emit_interpolated(state.last_key, key)
+        emit_frame(end_idx, end_frame_img, poses_3d, poses_2d, pose_source)
+        state.last_key = key
+        state.next_frame = end_idx + 1
+
+
+def resolve_base_stride(frame_stride, total_frames, fps):
+    """计算推理帧间隔：自适应模式下先按时长确定上限，再根据动作幅度逐段收紧"""
+    if frame_stride == 'auto':
+        duration = total_frames / fps if fps > 0 else 0
+        return calculate_adaptive_stride(total_frames, fps, duration)
+    return max(1, int(frame_stride))
+
+
+def process_video_segment(video_path, segment_index, warmup_start, start, end, training_type, options,
+                          base_stride, output_path, progress_queue=None, torch_threads=None, engine_config=None):
+    """在独立进程中处理 [start, end) 帧，[warmup_start, start) 的重叠帧只用于预热跟踪与指标状态"""
+    global inherited_engine_config
+    # 先按主进程选定的配置加载模型（不再各自测试），再按分段数限制线程数，避免覆盖分段的线程配额
+    inherited_engine_config = engine_config
+    model_manager.get()
+    if torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+    R, t = load_extrinsics()
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError("无法打开视频文件")
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if not seek_video(cap, warmup_start):
+        raise RuntimeError(f"无法定位到分段起始帧 {warmup_start}")
+
+    state = FrameLoopState(training_type, base_stride, fps,
+                           motion_gate=options['motion_gate'], roi_mode=options['roi_mode'])
+    state.next_frame = warmup_start
+    out = open_video_writer(output_path, fps, (width, height))
+    all_metrics = []
+    seam_poses_2d = []  # 重叠区最后一帧的姿态，用于和上一分段拼接人员顺序
+    emitted = 0
+
+    def emit_frame(idx, frame, poses_3d, poses_2d, pose_source):
+        nonlocal seam_poses_2d, emitted
+        if idx < start:
+            # 重叠帧：只推进跟踪滤波与指标计算器的滑动窗口，不输出
+            build_frame_metrics(idx, fps, poses_3d, poses_2d, R, t, state.metrics_calculator, training_type)
+            if idx == start - 1:
+                seam_poses_2d = np.asarray(poses_2d, dtype=np.float32)
+            return
+        draw_poses(frame, poses_2d)
+        frame_metrics = build_frame_metrics(idx, fps, poses_3d, poses_2d, R, t,
+                                            state.metrics_calculator, training_type)
+        frame_metrics['pose_source'] = pose_source
+        all_metrics.append(frame_metrics)
+        state.pose_cache.append(idx, poses_3d, poses_2d, pose_source)
+        out.write(frame)
+        emitted += 1
+        if progress_queue is not None and emitted % 25 == 0:
+            progress_queue.put(('progress', segment_index, 25))
+
+    with inference_session():
+        run_pose_loop(cap, state, options['frame_stride'], base_stride, emit_frame, end_frame=end)
+    cap.release()
+    out.release()
+    if progress_queue is not None:
+        progress_queue.put(('progress', segment_index, emitted % 25))
+    return {
+        'metrics': all_metrics,
+        'pose_cache': state.pose_cache,
+        'seam_poses_2d': seam_poses_2d,
+        'inferred_frames': state.inferred_frames,
+        'reused_frames': state.reused_frames,
+    }
+
+
+def _segment_worker(queue, kwargs):
+    """分段处理子进程入口，结果或异常通过队列回传给主进程"""
+    segment_index = kwargs['segment_index']
+    try:
+        queue.put(('done', segment_index, process_video_segment(progress_queue=queue, **kwargs)))
+    except Exception as exc:
+        import traceback
+        traceback.print_exc()
+        queue.put(('error', segment_index, str(exc)))
+
+
+def process_segments_parallel(video_path, task_id, training_type, options, base_stride, workers,
+                              total_frames, fps, output_video_path):
+    """把长视频切成带重叠的时间分段，在多个进程中并行处理，再按顺序拼接人员顺序、指标与输出视频"""
+    import multiprocessing
+
+    segment_length = -(-total_frames // workers)
+    bounds = [(start, min(total_frames, start + segment_length))
+              for start in range(0, total_frames, segment_length)]
+    segment_paths = [OUTPUT_FOLDER / f"{task_id}_output.seg{i:03d}.mp4" for i in range(len(bounds))]
+    torch_threads = max(1, (os.cpu_count() or 1) // len(bounds))
+    # 等主进程完成引擎选择，子进程直接沿用，不再各自读取结果文件或测试
+    model_manager.get()
+    print(f"[INFO] 分段并行处理: {len(bounds)} 个分段，每段约 {segment_length} 帧，重叠 {SEGMENT_OVERLAP} 帧")
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    processes = []
+    for i, (start, end) in enumerate(bounds):
+        kwargs = {
+            'video_path': str(video_path),
+            'segment_index': i,
+            'warmup_start': max(0, start - SEGMENT_OVERLAP),
+            'start': start,
+            'end': end,
+            'training_type': training_type,
+            'options': options,
+            'base_stride': base_stride,
+            'output_path': str(segment_paths[i]),
+            'torch_threads': torch_threads,
+            'engine_config': engine_selection.get('selected'),
+        }
+        process = ctx.Process(target=_segment_worker, args=(queue, kwargs), daemon=True)
+        process.start()
+        processes.append(process)
+    ACTIVE_WORKERS.labels('segment_process').inc(len(processes))
+
+    import queue as queue_module
+    results = {}
+    done_frames = 0
+    try:
+        while len(results) < len(bounds):
+            try:
+                kind, index, payload = queue.get(timeout=5)
+            except queue_module.Empty:
+                crashed = [p for i, p in enumerate(processes) if i not in results and p.exitcode not in (None, 0)]
+                if crashed:
+                    raise RuntimeError(f"分段处理进程异常退出 (exitcode={crashed[0].exitcode})")
+                continue
+            if kind == 'progress':
+                done_frames += payload
+                processing_tasks[task_id]['processed_frames'] = done_frames
+                FRAMES_PROCESSED.inc(payload)
+                set_task_progress(task_id, min(99, int(done_frames / max(total_frames, 1) * 100)))
+            elif kind == 'error':
+                raise RuntimeError(f"分段 {index} 处理失败: {payload}")
+            else:
+                results[index] = payload
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        ACTIVE_WORKERS.labels('segment_process').dec(len(processes))
+
+    # 按顺序拼接：用重叠区最后一帧匹配前后分段的人员，让同一个人在分段之间保持相同的序号
+    state = FrameLoopState(training_type, base_stride, fps)
+    all_metrics = []
+    for i in range(len(bounds)):
+        result = results[i]
+        metrics, pose_cache = result['metrics'], result['pose_cache']
+        if i > 0 and metrics:
+            order = stitch_order(state.pose_cache.poses_2d[-1], result['seam_poses_2d'])
+            position = 0
+            while order is not None and position < len(metrics) and len(metrics[position]['people']) == len(order):
+                people = [metrics[position]['people'][j] for j in order]
+                for person_idx, person in enumerate(people):
+                    person['person_id'] = person_idx
+                metrics[position]['people'] = people
+                pose_cache.reorder_people(position, order)
+                position += 1
+        all_metrics.extend(metrics)
+        state.pose_cache.extend(pose_cache)
+        state.inferred_frames += result['inferred_frames']
+        state.reused_frames += result['reused_frames']
+
+    concat_video_segments(segment_paths, output_video_path)
+    return all_metrics, state
+
+
+def set_task_stage(task_id, stage):
+    """记录任务当前所处的处理阶段并通知订阅者"""
+    processing_tasks[task_id]['stage'] = stage
+    task_events.publish(task_id)
+
+
+def set_task_progress(task_id, progress):
+    """进度百分比变化时才通知，避免逐帧推送"""
+    task = processing_tasks[task_id]
+    if task['progress'] != progress:
+        task['progress'] = progress
+        task_events.publish(task_id)
+
+
+def process_video(video_path, task_id, training_type='dribbling', frame_stride=1, motion_gate=False,
+                  roi_mode=False, parallel_workers=1):
+    """处理视频并生成带骨架的输出视频和指标数据
+
+    frame_stride 为 1 时逐帧推理；大于 1 或为 'auto' 时只对关键帧推理，
+    中间帧的 2D/3D 关键点由前后关键帧插值得到，输出视频与指标时间轴仍覆盖每一帧。
+    motion_gate 开启时，关键帧画面与上次推理相比几乎没有变化则直接复用上次的姿态。
+    roi_mode 开启时，检测到人后只对其周围的裁剪区域推理，跟丢时回退到整帧推理。
+    开启检查点（CHECKPOINT_INTERVAL > 0）时，每隔若干帧落盘一次进度，重启后从最近的检查点继续。
+    parallel_workers 大于 1 且视频足够长时，按时间分段在多个进程中并行处理（不写检查点）。
+    """
+    options = {'frame_stride': frame_stride, 'motion_gate': motion_gate, 'roi_mode': roi_mode,
+               'parallel_workers': parallel_workers}
+    partial = None
+    checkpoint = None
     try:
         # 更新任务状态
         processing_tasks[task_id]['status'] = 'processing'
         processing_tasks[task_id]['progress'] = 0
+        processing_tasks[task_id]['started_at'] = time.time()
+        processing_tasks[task_id]['processed_frames'] = 0
+        set_task_stage(task_id, 'inference' if model_manager.finished else 'loading_model')
         
         # 读取摄像机外参（缺失时使用默认值）
-        extrinsics_path = PROJECT_ROOT / 'data' / 'extrinsics.json'
-        try:
-            with open(extrinsics_path, 'r') as f:
-                extrinsics = json.load(f)
-            R = np.array(extrinsics.get('R', np.eye(3).tolist()), dtype=np.float32)
-            t = np.array(extrinsics.get('t', [0, 0, 0]), dtype=np.float32)
-        except Exception as _e:
-            print(f"[WARN] 外参文件缺失或读取失败，使用默认值: {_e}")
-            R = np.eye(3, dtype=np.float32)
-            t = np.zeros(3, dtype=np.float32)
+        R, t = load_extrinsics()
         
         # 打开视频
         cap = cv2.VideoCapture(str(video_path))
@@ -248,205 +1073,359 @@ def process_video(video_path, task_id, training_type='dribbling'):
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        # 创建输出视频（使用兼容的编码器）
         output_video_path = OUTPUT_FOLDER / f"{task_id}_output.mp4"
-        
-        # 使用最兼容的编码器
-        fourcc_options = [
-            ('mp4v', 'MP4V'),  # MPEG-4编码 (最兼容)
-            ('XVID', 'XVID'),  # Xvid编码
-            ('MJPG', 'MJPEG'), # Motion JPEG
-            ('DIVX', 'DIVX'),  # DivX编码
-            ('avc1', 'H.264'),  # H.264编码 (如果可用)
-        ]
-        
-        out = None
-        for codec_str, codec_name in fourcc_options:
-            try:
-                fourcc = cv2.VideoWriter_fourcc(*codec_str)
-                out = cv2.VideoWriter(str(output_video_path), fourcc, fps, (width, height))
-                
-                # 验证视频写入器是否成功初始化
-                if out.isOpened():
-                    print(f"Successfully initialized VideoWriter with {codec_name} codec")
-                    break
-                else:
-                    out.release()
-                    out = None
-            except Exception as e:
-                print(f"Failed to use {codec_name} codec: {e}")
-                if out:
-                    out.release()
-                out = None
-        
-        if not out or not out.isOpened():
-            raise RuntimeError("无法初始化视频编码器，请检查 OpenCV 和 FFmpeg 安装")
-        
-        # 创建指标计算器
-        metrics_calculator = BasketballMetricsCalculator()
-        
-        # 存储所有帧的指标
-        all_metrics = []
-        frame_idx = 0
-        
-        # 关键点名称映射（与前端中文标注一致，按 panoptic 19 点顺序）
-        kp_names = [
-            '颈部', '鼻尖', '骨盆',
-            '左肩', '左肘', '左腕',
-            '左髋', '左膝', '左踝',
-            '右肩', '右肘', '右腕',
-            '右髋', '右膝', '右踝',
-            '右眼', '左眼', '右耳', '左耳'
-        ]
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # 姿态估计
-            stride = 8
-            base_height = 256
-            input_scale = base_height / frame.shape[0]
-            scaled_img = cv2.resize(frame, dsize=None, fx=input_scale, fy=input_scale)
-            scaled_img = scaled_img[:, 0:scaled_img.shape[1] - (scaled_img.shape[1] % stride)]
-            fx = np.float32(0.8 * frame.shape[1])
-
-            # 推理或模拟
-            if SIMULATION_MODE or pose_net is None:
-                poses_3d, poses_2d = generate_mock_poses(frame, frame_idx)
+        base_stride = resolve_base_stride(frame_stride, total_frames, fps)
+        print(f"[INFO] 推理帧间隔: {base_stride} ({'自适应' if frame_stride == 'auto' else '固定'})")
+
+        # 分段数受视频长度限制，每段至少 MIN_SEGMENT_FRAMES 帧，避免重叠预热占比过高
+        workers = min(resolve_parallel_workers(parallel_workers), total_frames // MIN_SEGMENT_FRAMES)
+        if workers > 1:
+            cap.release()
+            set_task_stage(task_id, 'inference')
+            all_metrics, state = process_segments_parallel(
+                video_path, task_id, training_type, options, base_stride, workers,
+                total_frames, fps, output_video_path)
+        else:
+            # 存储所有帧的指标；存在检查点时从检查点恢复状态与已完成帧的指标
+            checkpoint = TaskCheckpoint(OUTPUT_FOLDER, task_id) if CHECKPOINT_INTERVAL > 0 else None
+            saved = checkpoint.load() if checkpoint is not None else None
+            if saved is not None:
+                state = saved['state']
+                all_metrics = checkpoint.load_metrics(saved['metrics_count'])
+                if 'pose_cache_count' in saved:
+                    state.pose_cache = checkpoint.load_pose_cache(saved['pose_cache_count'])
+                if 'tracking_state' in saved:
+                    # 旧版检查点单独保存了进程级的跟踪状态
+                    state.pose_tracker = PoseTracker()
+                    state.pose_tracker.restore(saved['tracking_state'])
+                if not seek_video(cap, state.next_frame):
+                    raise RuntimeError(f"无法定位到检查点帧 {state.next_frame}")
+                processing_tasks[task_id]['resumed_from_frame'] = state.next_frame
+                print(f"[INFO] 从检查点恢复任务 {task_id}，继续处理第 {state.next_frame} 帧")
             else:
-                inference_result = pose_net.infer(scaled_img)
-                poses_3d, poses_2d = parse_poses(inference_result, input_scale, stride, fx, is_video=True)
-            
-            # 在图像上绘制骨架
-            draw_poses(frame, poses_2d)
-            
-            # 计算指标
-            frame_metrics = {
-                'frame': frame_idx,
-                'timestamp': frame_idx / fps,
-                'people': []
-            }
-            
-            if len(poses_3d) > 0:
-                canonical_poses = canonicalize_poses(poses_3d, R, t)
-                
-                for person_idx, pose in enumerate(canonical_poses):
-                    # 计算该人的所有指标
-                    person_metrics = metrics_calculator.calculate_all_metrics(pose)
-                    
-                    # 根据训练类型筛选相关指标
-                    if training_type == 'dribbling':
-                        filtered_metrics = {
-                            'dribble_frequency': person_metrics.get('dribble_frequency', 0),
-                            'center_of_mass': person_metrics.get('center_of_mass', 0),
-                            'left_wrist_angle': person_metrics.get('left_elbow_angle', 0),
-                            'right_wrist_angle': person_metrics.get('right_elbow_angle', 0),
-                            'left_elbow_angle': person_metrics.get('left_elbow_angle', 0),
-                            'right_elbow_angle': person_metrics.get('right_elbow_angle', 0),
-                            'left_shoulder_angle': person_metrics.get('left_shoulder_angle', 0),
-                            'right_shoulder_angle': person_metrics.get('right_shoulder_angle', 0),
-                            'left_knee_angle': person_metrics.get('left_knee_angle', 0),
-                            'right_knee_angle': person_metrics.get('right_knee_angle', 0),
-                        }
-                    elif training_type == 'defense':
-                        filtered_metrics = {
-                            'defense_center_fluctuation': person_metrics.get('defense_center_fluctuation', 0),
-                            'arm_spread_ratio': person_metrics.get('arm_spread_ratio', 0),
-                            'arm_spread_distance': person_metrics.get('arm_spread_distance', 0),
-                            'leg_spread_ratio': person_metrics.get('leg_spread_ratio', 0),
-                            'leg_spread_distance': person_metrics.get('leg_spread_distance', 0),
-                            'defense_knee_angle': person_metrics.get('defense_knee_angle', 0),
-                            'body_balance': person_metrics.get('body_balance', 0),
-                        }
-                    elif training_type == 'shooting':
-                        filtered_metrics = {
-                            'shooting_elbow_angle': person_metrics.get('shooting_elbow_angle', 0),
-                            'shooting_support_elbow_angle': person_metrics.get('shooting_support_elbow_angle', 0),
-                            'wrist_extension_angle': person_metrics.get('wrist_extension_angle', 0),
-                            'upper_arm_body_angle': person_metrics.get('upper_arm_body_angle', 0),
-                            'shooting_release_height': person_metrics.get('shooting_release_height', 0),
-                            'shooting_body_alignment': person_metrics.get('shooting_body_alignment', 0),
-                            'hand_coordination': person_metrics.get('hand_coordination', 0),
-                        }
-                    else:
-                        filtered_metrics = person_metrics
-                    
-                    # 提取该人的2D关键点（与 metrics 一起保存，供前端叠加绘制使用）
-                    keypoints_list = []
-                    try:
-                        pose2d = np.array(poses_2d[person_idx][0:-1]).reshape((-1, 3))  # (19,3) => x,y,conf
-                        for i, name in enumerate(kp_names):
-                            x, y, conf = pose2d[i]
-                            if conf == -1:
-                                # 缺失关键点用占位，前端会自动跳过低置信度/缺失
-                                keypoints_list.append({
-                                    'name': name,
-                                    'x': float(x if x != -1 else 0),
-                                    'y': float(y if y != -1 else 0),
-                                    'confidence': float(conf if conf != -1 else 0.0)
-                                })
-                            else:
-                                keypoints_list.append({
-                                    'name': name,
-                                    'x': float(x),
-                                    'y': float(y),
-                                    'confidence': float(conf)
-                                })
-                    except Exception:
-                        # 回退：如果解析失败则给空数组
-                        keypoints_list = []
-
-                    frame_metrics['people'].append({
-                        'person_id': person_idx,
-                        'metrics': filtered_metrics,
-                        'keypoints': keypoints_list
-                    })
-            
-            all_metrics.append(frame_metrics)
-            
-            # 写入输出视频
-            out.write(frame)
+                state = FrameLoopState(training_type, base_stride, fps, motion_gate=motion_gate, roi_mode=roi_mode)
+                all_metrics = []
+                if checkpoint is not None:
+                    checkpoint.clear()
+                # 从检查点恢复需要按帧定位，仍用 OpenCV；新任务可换用 ffmpeg 管道解码
+                cap = open_frame_reader(cap, video_path, width, height, base_stride + 2)
+            processing_tasks[task_id]['decoder'] = 'ffmpeg' if isinstance(cap, FFmpegFrameReader) else 'opencv'
+            if state.gate is not None:
+                print(f"[INFO] 静止帧门控已开启，阈值: {state.gate.threshold}")
+            # 逐帧追加结果，处理过程中即可查询已完成的帧；从检查点恢复时接着已有的帧继续写
+            partial = PartialResults(OUTPUT_FOLDER, task_id)
+            processing_tasks[task_id]['partial_results'] = partial
+
+            # 创建输出视频；开启检查点时按检查点切分为多个分段，最后再合并
+            def open_output_segment():
+                if checkpoint is None:
+                    return open_video_writer(output_video_path, fps, (width, height)), output_video_path
+                segment_path = checkpoint.segment_path(len(state.segments))
+                return open_video_writer(segment_path, fps, (width, height)), segment_path
+
+            out, segment_path = open_output_segment()
+            segment_frames = 0
+            checkpointed_poses = len(state.pose_cache)  # 已写入检查点的原始姿态帧数
+
+            def save_checkpoint():
+                nonlocal out, segment_path, segment_frames, checkpointed_poses
+                # 关键帧处没有待插值的帧，可以安全地写检查点
+                if checkpoint is None or segment_frames < CHECKPOINT_INTERVAL:
+                    return
+                out.release()
+                state.segments.append(str(segment_path))
+                # 指标已逐帧写入同一个 JSONL 文件，检查点只记录行数
+                partial.flush()
+                checkpoint.save({
+                    'video_path': str(video_path),
+                    'training_type': training_type,
+                    'options': options,
+                    'cache_key': processing_tasks[task_id].get('cache_key'),
+                    'state': state,
+                    'metrics_count': len(all_metrics),
+                    'pose_cache_count': len(state.pose_cache),
+                }, [], state.pose_cache.slice(checkpointed_poses))
+                checkpointed_poses = len(state.pose_cache)
+                out, segment_path = open_output_segment()
+                segment_frames = 0
+
+            def emit_frame(idx, frame, poses_3d, poses_2d, pose_source):
+                nonlocal segment_frames
+                # 在图像上绘制骨架
+                with timed('draw'):
+                    draw_poses(frame, poses_2d)
+
+                # 计算指标
+                frame_metrics = build_frame_metrics(idx, fps, poses_3d, poses_2d, R, t,
+                                                    state.metrics_calculator, training_type)
+                frame_metrics['pose_source'] = pose_source
+                all_metrics.append(frame_metrics)
+                partial.append(frame_metrics)
+                state.pose_cache.append(idx, poses_3d, poses_2d, pose_source)
+
+                # 写入输出视频
+                with timed('encode'):
+                    out.write(frame)
+                segment_frames += 1
+
+                # 更新进度
+                set_task_progress(task_id, int(((idx + 1) / total_frames) * 100))
+                processing_tasks[task_id]['processed_frames'] += 1
+                FRAMES_PROCESSED.inc()
+
+            with inference_session():
+                set_task_stage(task_id, 'inference')
+                run_pose_loop(cap, state, frame_stride, base_stride, emit_frame, on_keyframe=save_checkpoint)
             
-            # 更新进度
-            frame_idx += 1
-            progress = int((frame_idx / total_frames) * 100)
-            processing_tasks[task_id]['progress'] = progress
-        
-        # 释放资源
-        cap.release()
-        out.release()
+            # 释放资源
+            decoder_error = cap.release()
+            out.release()
+            if decoder_error:
+                print(f"[WARN] ffmpeg 解码输出: {decoder_error}")
+                if not all_metrics:
+                    raise RuntimeError(f"ffmpeg 解码失败: {decoder_error}")
+
+            # 合并检查点产生的输出视频分段
+            if checkpoint is not None:
+                if segment_frames > 0 or not state.segments:
+                    state.segments.append(str(segment_path))
+                else:
+                    Path(segment_path).unlink(missing_ok=True)
+                concat_video_segments([Path(p) for p in state.segments], output_video_path)
+
+        print(f"[INFO] 共 {len(all_metrics)} 帧，实际推理 {state.inferred_frames} 帧，"
+              f"静止复用 {state.reused_frames} 帧")
 
-        # 使用 FFmpeg 进行 H.264 转码，提高浏览器兼容性
-        transcode_success, transcode_error = transcode_video_to_h264(output_video_path)
-        if not transcode_success:
-            print(f"[WARN] FFmpeg 转码失败: {transcode_error}")
-        else:
-            print("[INFO] 输出视频已成功转码为 H.264 baseline")
-        
         # 保存指标数据
+        set_task_stage(task_id, 'saving')
         metrics_path = OUTPUT_FOLDER / f"{task_id}_metrics.json"
-        with open(metrics_path, 'w', encoding='utf-8') as f:
+        with timed('json_write'), open(metrics_path, 'w', encoding='utf-8') as f:
             json.dump(all_metrics, f, ensure_ascii=False, indent=2)
+
+        # 保存原始姿态缓存，之后换训练类型重新分析无需再推理
+        pose_cache_path = OUTPUT_FOLDER / f"{task_id}_poses.npz"
+        with timed('pose_cache_write'):
+            state.pose_cache.save(pose_cache_path, fps, R, t)
         
         # 更新任务状态
-        processing_tasks[task_id]['status'] = 'completed'
         processing_tasks[task_id]['progress'] = 100
         processing_tasks[task_id]['output_video'] = str(output_video_path)
         processing_tasks[task_id]['metrics_file'] = str(metrics_path)
-        processing_tasks[task_id]['transcode_success'] = transcode_success
-        if transcode_error:
-            processing_tasks[task_id]['transcode_error'] = transcode_error
-        
+        processing_tasks[task_id]['pose_cache'] = str(pose_cache_path)
+        processing_tasks[task_id]['inferred_frames'] = state.inferred_frames
+        processing_tasks[task_id]['reused_frames'] = state.reused_frames
+        processing_tasks[task_id]['simulated'] = is_simulated()
+        elapsed = time.time() - processing_tasks[task_id]['started_at']
+        processing_tasks[task_id]['processing_seconds'] = round(elapsed, 3)
+        processing_tasks[task_id]['fps'] = round(len(all_metrics) / elapsed, 2) if elapsed > 0 else 0.0
+        TASK_FPS.observe(processing_tasks[task_id]['fps'])
+
+        # 结果已完整落盘，清理检查点与逐帧结果（之后的查询读取完整结果）
+        processing_tasks[task_id]['status'] = 'transcoding'
+        if partial is not None:
+            processing_tasks[task_id].pop('partial_results', None)
+            partial.close(remove=True)
+        if checkpoint is not None:
+            checkpoint.clear()
+
+        # H.264 转码排队进行，处理线程可以接着处理下一个视频
+        set_task_stage(task_id, 'transcoding')
+        transcode_queue.submit(finish_transcoding, task_id, video_path)
         return True
         
     except Exception as e:
         processing_tasks[task_id]['status'] = 'failed'
         processing_tasks[task_id]['error'] = str(e)
+        # 开启检查点时保留逐帧结果供查询；异常失败不同于进程中断，重启后不再续跑
+        if partial is not None:
+            processing_tasks[task_id].pop('partial_results', None)
+            partial.close(remove=CHECKPOINT_INTERVAL <= 0)
+        if checkpoint is not None:
+            checkpoint.mark_failed(str(e))
+        TASKS_FINISHED.labels('failed').inc()
+        task_events.publish(task_id)
         return False
 
 
+def finish_transcoding(task_id, video_path):
+    """转码线程中执行：输出视频已是浏览器可播放的 H.264 时跳过重新编码，只做 faststart 重新封装，
+    否则转码；结束后任务才标记为 completed
+    """
+    task = processing_tasks[task_id]
+    output_video_path = Path(task['output_video'])
+    ACTIVE_WORKERS.labels('transcode').inc()
+    transcode_start = time.perf_counter()
+    try:
+        ffmpeg_path = find_ffmpeg()
+        if ffmpeg_path is not None and is_browser_h264(probe_video_stream(ffmpeg_path, output_video_path)):
+            # 编码器写出的 MP4 把 moov 放在文件末尾，仍需重新封装，浏览器才能边下边播
+            with timed('transcode'):
+                transcode_success, transcode_error = remux_faststart(output_video_path)
+            result = 'skipped' if transcode_success else 'failed'
+            if not transcode_success:
+                print(f"[WARN] FFmpeg faststart 重新封装失败: {transcode_error}")
+            else:
+                print("[INFO] 输出视频已是浏览器可播放的 H.264，跳过转码，仅做 faststart 重新封装")
+        else:
+            # 使用 FFmpeg 进行 H.264 转码，提高浏览器兼容性
+            with timed('transcode'):
+                transcode_success, transcode_error = transcode_video_to_h264(output_video_path,
+                                                                             transcode_queue.threads)
+            result = 'success' if transcode_success else 'failed'
+            if not transcode_success:
+                print(f"[WARN] FFmpeg 转码失败: {transcode_error}")
+            else:
+                print("[INFO] 输出视频已成功转码为 H.264 baseline")
+    except Exception as exc:
+        # 转码失败不影响分析结果，原输出视频仍然可用
+        transcode_success, transcode_error, result = False, str(exc), 'failed'
+    finally:
+        ACTIVE_WORKERS.labels('transcode').dec()
+    transcode_seconds = time.perf_counter() - transcode_start
+    TRANSCODE_SECONDS.labels(result).observe(transcode_seconds)
+
+    task['transcode_success'] = transcode_success
+    task['transcode_skipped'] = result == 'skipped'
+    task['transcode_seconds'] = round(transcode_seconds, 3)
+    if transcode_error:
+        task['transcode_error'] = transcode_error
+    task['status'] = 'completed'
+    TASKS_FINISHED.labels('completed').inc()
+
+    # 登记到去重索引，之后相同内容的上传直接复用本任务的产物；模拟数据不登记
+    cache_key = task.get('cache_key')
+    if cache_key and not task.get('simulated'):
+        result_cache.store(cache_key, {
+            'task_id': task_id,
+            'video_path': str(video_path),
+            'output_video': task['output_video'],
+            'metrics_file': task['metrics_file'],
+            'pose_cache': task['pose_cache'],
+        })
+    set_task_stage(task_id, 'done')
+
+
+def process_video_profiled(video_path, task_id, *args):
+    """在性能剖析下运行 process_video，剖析文件写到输出目录，路径与摘要记录在任务的 profile 字段。
+
+    剖析本身出错（例如其他剖析工具已占用 cProfile）时任务标记为失败，不会停留在 uploaded。
+    """
+    task = processing_tasks[task_id]
+    ok = None
+    try:
+        with profile_task(OUTPUT_FOLDER, task_id) as profile:
+            ok = process_video(video_path, task_id, *args)
+    except Exception as exc:
+        if ok is not None:
+            # 处理已经完成，只是剖析结果没能写出
+            print(f"[WARN] 任务 {task_id} 性能剖析结果写出失败: {exc}")
+            task.pop('profile_requested', None)
+            return ok
+        task['status'] = 'failed'
+        task['error'] = f"性能剖析失败: {exc}"
+        TASKS_FINISHED.labels('failed').inc()
+        task_events.publish(task_id)
+        return False
+    task['profile'] = profile
+    print(f"[INFO] 任务 {task_id} 性能剖析完成：{profile['wall_seconds']} s，"
+          f"内存峰值 {profile['peak_memory_mb']} MiB")
+    return ok
+
+
+def start_processing_thread(video_path, task_id, training_type, frame_stride=1, motion_gate=False, roi_mode=False,
+                            parallel_workers=1, profile=False):
+    import threading
+
+    def run():
+        ACTIVE_WORKERS.labels('thread').inc()
+        try:
+            target = process_video_profiled if profile else process_video
+            target(video_path, task_id, training_type, frame_stride, motion_gate, roi_mode, parallel_workers)
+        finally:
+            ACTIVE_WORKERS.labels('thread').dec()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def resume_interrupted_tasks():
+    """服务启动时扫描输出目录中的检查点，恢复上次被中断的处理任务
+
+    因异常失败的任务与已续跑 MAX_RESUME_ATTEMPTS 次仍未完成的任务不再续跑，并清理其检查点。
+    """
+    if CHECKPOINT_INTERVAL <= 0:
+        return []
+    resumed = []
+    for state_path in sorted(OUTPUT_FOLDER.glob('*_checkpoint.pkl')):
+        task_id = state_path.name[:-len('_checkpoint.pkl')]
+        if task_id in processing_tasks:
+            continue
+        checkpoint = TaskCheckpoint(OUTPUT_FOLDER, task_id)
+        saved = checkpoint.load()
+        if saved is None or not Path(saved['video_path']).exists():
+            print(f"[WARN] 检查点无效或原视频已删除，放弃恢复任务 {task_id}")
+            checkpoint.clear()
+            continue
+        resume_info = checkpoint.load_resume_info()
+        if resume_info.get('error'):
+            print(f"[WARN] 任务 {task_id} 上次因异常失败（{resume_info['error']}），不再续跑")
+            checkpoint.clear()
+            continue
+        if resume_info.get('attempts', 0) >= MAX_RESUME_ATTEMPTS:
+            print(f"[WARN] 任务 {task_id} 已续跑 {resume_info['attempts']} 次仍未完成，放弃恢复")
+            checkpoint.clear()
+            continue
+        checkpoint.record_resume_attempt()
+        options = saved['options']
+        processing_tasks[task_id] = {
+            'status': 'uploaded',
+            'progress': 0,
+            'video_path': saved['video_path'],
+            'training_type': saved['training_type'],
+            'cache_key': saved.get('cache_key'),
+            **options
+        }
+        print(f"[INFO] 恢复中断的任务 {task_id}")
+        start_processing_thread(Path(saved['video_path']), task_id, saved['training_type'], **options)
+        resumed.append(task_id)
+    return resumed
+
+
+def reuse_cached_result(task_id, cache_key):
+    """相同内容的任务已完成或正在处理时，让新任务直接引用它，返回源任务 ID。
+
+    新任务创建后立即发布一次状态变更，跟随所有任务的 SSE 连接由此得知新任务及其当前状态。
+    """
+    # 正在处理中的相同任务：共享同一个状态字典，进度与结果自动同步
+    for other_id, task in list(processing_tasks.items()):
+        if task.get('cache_key') == cache_key and task['status'] in ('uploaded', 'processing', 'transcoding'):
+            source_task_id = task.get('source_task_id', other_id)
+            processing_tasks[task_id] = task
+            result_cache.add_alias(task_id, source_task_id)
+            task_events.publish(task_id)
+            return source_task_id
+
+    entry = result_cache.lookup(cache_key)
+    if entry is None:
+        return None
+    processing_tasks[task_id] = {
+        'status': 'completed',
+        'progress': 100,
+        'video_path': entry['video_path'],
+        'output_video': entry['output_video'],
+        'metrics_file': entry['metrics_file'],
+        'pose_cache': entry.get('pose_cache'),
+        'cache_key': cache_key,
+        'cached': True,
+        'source_task_id': entry['task_id'],
+    }
+    result_cache.add_alias(task_id, entry['task_id'])
+    task_events.publish(task_id)
+    return entry['task_id']
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_video():
     """上传视频并开始处理"""
@@ -455,6 +1434,11 @@ def upload_video():
     
     file = request.files['video']
     training_type = request.form.get('training_type', 'dribbling')
+    frame_stride = parse_frame_stride(request.form.get('frame_stride', DEFAULT_FRAME_STRIDE))
+    motion_gate = parse_flag(request.form.get('motion_gate', DEFAULT_MOTION_GATE))
+    roi_mode = parse_flag(request.form.get('roi_mode', DEFAULT_ROI_MODE))
+    parallel_workers = parse_parallel_workers(request.form.get('parallel_workers', DEFAULT_PARALLEL_WORKERS))
+    profile = parse_flag(request.form.get('profile', DEFAULT_PROFILE))
     
     if file.filename == '':
         return jsonify({'error': '文件名为空'}), 400
@@ -464,99 +1448,314 @@ def upload_video():
     
     # 生成唯一任务ID
     task_id = str(uuid.uuid4())
+    # 未在启动时加载模型的情况下，从首次上传开始后台加载，与写盘并行
+    model_manager.start()
     
-    # 保存上传的视频
+    # 保存上传的视频，边写盘边计算内容哈希
     filename = secure_filename(file.filename)
     video_path = UPLOAD_FOLDER / f"{task_id}_{filename}"
-    file.save(str(video_path))
+    content_hash = save_stream_with_hash(file.stream, video_path)
+    UPLOAD_BYTES.inc(video_path.stat().st_size)
+
+    options = {'frame_stride': frame_stride, 'motion_gate': motion_gate, 'roi_mode': roi_mode,
+               'parallel_workers': parallel_workers}
+    # 模型版本要等加载结束才能确定（冷启动时的首次上传会在这里等待加载完成）
+    cache_key = make_cache_key(content_hash, training_type, model_version(), options)
+    # 剖析的目的就是实际运行一遍，不复用已有结果
+    cached_task_id = None if profile else reuse_cached_result(task_id, cache_key)
+    UPLOADS.labels('true' if cached_task_id else 'false').inc()
+    if cached_task_id:
+        # 相同内容已处理或正在处理，丢弃重复上传的文件
+        video_path.unlink(missing_ok=True)
+        return jsonify({
+            'task_id': task_id,
+            'cached': True,
+            'source_task_id': cached_task_id,
+            'status': processing_tasks[task_id]['status'],
+            'message': '相同视频已处理过，直接复用结果'
+        }), 200
     
     # 创建处理任务
     processing_tasks[task_id] = {
         'status': 'uploaded',
         'progress': 0,
         'video_path': str(video_path),
-        'training_type': training_type
+        'training_type': training_type,
+        'content_hash': content_hash,
+        'cache_key': cache_key,
+        'profile_requested': profile,
+        **options
     }
     
+    task_events.publish(task_id)
+    
     # 在后台处理视频（实际应用中应使用异步任务队列）
-    import threading
-    thread = threading.Thread(target=process_video, args=(video_path, task_id, training_type))
-    thread.start()
+    start_processing_thread(video_path, task_id, training_type, profile=profile, **options)
     
     return jsonify({
         'task_id': task_id,
+        'profile': profile,
         'message': '视频上传成功，开始处理'
     }), 200
 
 
-@app.route('/api/status/<task_id>', methods=['GET'])
-def get_status(task_id):
-    """获取处理状态"""
-    if task_id not in processing_tasks:
-        return jsonify({'error': '任务不存在'}), 404
-    
-    task = processing_tasks[task_id]
+def task_status_payload(task_id, task):
+    """/api/status 与状态推送共用的任务状态"""
     response = {
         'task_id': task_id,
         'status': task['status'],
         'progress': task['progress']
     }
+    if 'stage' in task:
+        response['stage'] = task['stage']
     
     if task['status'] == 'failed':
         response['error'] = task.get('error', '未知错误')
+    if 'profile' in task:
+        response['profile'] = {key: task['profile'][key] for key in ('wall_seconds', 'peak_memory_mb')}
+    if task.get('simulated'):
+        response['simulated'] = True
+    return response
+
+
+@app.route('/api/status/<task_id>', methods=['GET'])
+def get_status(task_id):
+    """获取处理状态"""
+    if task_id not in processing_tasks:
+        return jsonify({'error': '任务不存在'}), 404
     
-    return jsonify(response), 200
+    return jsonify(task_status_payload(task_id, processing_tasks[task_id])), 200
+
+
+def _sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_task_status(task_ids=None):
+    """SSE 事件流：连接后先推送各任务的当前状态，之后每次状态、阶段或进度变化推送 status 事件，
+    空闲时每 SSE_HEARTBEAT_SECONDS 秒发送注释行保活。
+
+    task_ids 为 None 时跟随所有任务（包括之后新建的）且不主动结束；
+    否则在这些任务全部完成或失败后推送 end 事件并关闭连接。
+    """
+    follow_all = task_ids is None
+    # 命中缓存的任务与源任务共享状态，变更通知按源任务 ID 发布
+    sources = {} if follow_all else {task_id: result_cache.resolve(task_id) for task_id in task_ids}
+    # 先记下版本号再读取状态，期间的变更会在下一轮再次推送
+    seen = dict(task_events.versions) if follow_all else \
+        {source: task_events.versions.get(source, 0) for source in sources.values()}
+    finished = set()
+    yield 'retry: 3000\n\n'
+    pending = list(processing_tasks) if follow_all else list(task_ids)
+    while True:
+        for task_id in pending:
+            task = processing_tasks.get(task_id)
+            if task is None:
+                finished.add(task_id)
+                yield _sse_message('error', {'task_id': task_id, 'error': '任务不存在'})
+                continue
+            yield _sse_message('status', task_status_payload(task_id, task))
+            if task['status'] in ('completed', 'failed'):
+                finished.add(task_id)
+        if not follow_all and finished.issuperset(task_ids):
+            yield _sse_message('end', {'task_ids': list(task_ids)})
+            return
+
+        watch = None if follow_all else {sources[task_id] for task_id in task_ids if task_id not in finished}
+        changed = task_events.wait(seen, watch, timeout=SSE_HEARTBEAT_SECONDS)
+        if not changed:
+            yield ': keep-alive\n\n'
+            pending = []
+            continue
+        seen.update(changed)
+        if follow_all:
+            # 引用正在处理的源任务的任务不会单独发布变更，随源任务一起推送
+            pending = list(changed) + [task_id for task_id in result_cache.aliases_of(changed)
+                                       if task_id not in changed and task_id in processing_tasks]
+        else:
+            pending = [task_id for task_id in task_ids if task_id not in finished and sources[task_id] in changed]
+
+
+def _sse_response(generator):
+    return Response(generator, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/status/<task_id>/stream', methods=['GET'])
+def stream_status(task_id):
+    """以 Server-Sent Events 推送单个任务的进度、阶段变化与完成通知，取代轮询 /api/status"""
+    if task_id not in processing_tasks:
+        return jsonify({'error': '任务不存在'}), 404
+    return _sse_response(stream_task_status([task_id]))
+
+
+@app.route('/api/status/stream', methods=['GET'])
+def stream_status_multi():
+    """一个连接跟随多个任务：task_ids=a,b,c 时在这些任务全部结束后关闭，不传时跟随所有任务"""
+    task_ids = [task_id for task_id in request.args.get('task_ids', '').split(',') if task_id]
+    return _sse_response(stream_task_status(task_ids or None))
+
+
+def parse_frame_cursor():
+    """读取 since_frame（起始帧序号，默认 0）与 limit（最多返回的帧数，默认不限）查询参数"""
+    since_frame = max(0, request.args.get('since_frame', 0, type=int))
+    limit = request.args.get('limit', None, type=int)
+    return since_frame, (max(0, limit) if limit is not None else None)
+
+
+def read_task_frames(task, since_frame=0, limit=None, metrics_path=None):
+    """返回 (从 since_frame 开始的帧指标, 下一次请求的 since_frame, 结果是否完整)。
+
+    处理中的任务读取逐帧结果；并行分段在全部完成前没有逐帧结果，返回空列表。
+    """
+    partial = task.get('partial_results') if task is not None else None
+    if partial is not None:
+        result = partial.read(since_frame, limit)
+        if result is not None:
+            frames, next_frame = result
+            return frames, next_frame, False
+    # 逐帧结果在完整结果落盘之后才关闭，读取失败时完整结果一定已经落盘
+    if task is not None and task['status'] not in RESULT_READY_STATUSES:
+        return [], since_frame, False
+    with open(metrics_path or task['metrics_file'], 'r', encoding='utf-8') as f:
+        metrics = json.load(f)
+    frames = metrics[since_frame:] if limit is None else metrics[since_frame:since_frame + limit]
+    return frames, since_frame + len(frames), since_frame + len(frames) >= len(metrics)
 
 
 @app.route('/api/result/<task_id>', methods=['GET'])
 def get_result(task_id):
-    """获取处理结果（指标数据）"""
+    """获取处理结果（指标数据）；处理中的任务返回已完成的帧，可用 since_frame 游标增量获取"""
     if task_id not in processing_tasks:
         return jsonify({'error': '任务不存在'}), 404
     
     task = processing_tasks[task_id]
     
-    if task['status'] != 'completed':
-        return jsonify({'error': '任务尚未完成'}), 400
+    if task['status'] == 'failed':
+        return jsonify({'error': task.get('error', '任务处理失败')}), 400
     
     # 读取指标数据
-    metrics_path = task['metrics_file']
-    with open(metrics_path, 'r', encoding='utf-8') as f:
-        metrics = json.load(f)
+    since_frame, limit = parse_frame_cursor()
+    metrics, next_frame, complete = read_task_frames(task, since_frame, limit)
     
     return jsonify({
         'task_id': task_id,
+        'status': task['status'],
+        'progress': task['progress'],
+        'complete': complete,
+        'next_frame': next_frame,
         'metrics': metrics
     }), 200
 
 
+@app.route('/api/reanalyze/<task_id>', methods=['POST'])
+def reanalyze(task_id):
+    """基于缓存的原始姿态，按新的训练类型重新计算指标（不重新推理），生成一个新任务"""
+    payload = request.get_json(silent=True) or request.form
+    training_type = payload.get('training_type', 'dribbling')
+
+    task = processing_tasks.get(task_id)
+    if task is not None and task['status'] not in RESULT_READY_STATUSES:
+        return jsonify({'error': '任务尚未完成'}), 400
+    source_task_id = task.get('source_task_id', task_id) if task else result_cache.resolve(task_id)
+    pose_cache_path = (task or {}).get('pose_cache') or OUTPUT_FOLDER / f"{source_task_id}_poses.npz"
+    if not Path(pose_cache_path).exists():
+        return jsonify({'error': '该任务没有姿态缓存，请重新上传视频'}), 404
+
+    fps, R, t, frames = load_pose_cache(pose_cache_path)
+    metrics_calculator = BasketballMetricsCalculator()
+    all_metrics = []
+    for frame_idx, poses_3d, poses_2d, pose_source in frames:
+        frame_metrics = build_frame_metrics(frame_idx, fps, poses_3d, poses_2d, R, t,
+                                            metrics_calculator, training_type)
+        frame_metrics['pose_source'] = pose_source
+        all_metrics.append(frame_metrics)
+
+    if task is not None:
+        video_path = task.get('video_path')
+    else:
+        matches = list(UPLOAD_FOLDER.glob(f"{source_task_id}_*"))
+        video_path = str(matches[0]) if matches else None
+
+    new_task_id = str(uuid.uuid4())
+    metrics_path = OUTPUT_FOLDER / f"{new_task_id}_metrics.json"
+    with open(metrics_path, 'w', encoding='utf-8') as f:
+        json.dump(all_metrics, f, ensure_ascii=False, indent=2)
+
+    # 视频与姿态缓存与训练类型无关，直接引用源任务的产物
+    processing_tasks[new_task_id] = {
+        'status': 'completed',
+        'progress': 100,
+        'training_type': training_type,
+        'video_path': video_path,
+        'output_video': (task or {}).get('output_video') or str(OUTPUT_FOLDER / f"{source_task_id}_output.mp4"),
+        'metrics_file': str(metrics_path),
+        'pose_cache': str(pose_cache_path),
+        'source_task_id': source_task_id,
+        'reanalyzed_from': task_id,
+    }
+    result_cache.add_alias(new_task_id, source_task_id)
+    task_events.publish(new_task_id)
+
+    return jsonify({
+        'task_id': new_task_id,
+        'source_task_id': source_task_id,
+        'training_type': training_type,
+        'frames': len(all_metrics),
+        'message': '已基于缓存姿态重新分析'
+    }), 200
+
+
+@app.route('/api/profile/<task_id>', methods=['GET'])
+def get_profile(task_id):
+    """下载任务的性能剖析结果：file=report（默认，文本报告）/ pstats / memory / stages"""
+    kind = request.args.get('file', 'report')
+    if kind not in PROFILE_FILES:
+        return jsonify({'error': f"file 只能是 {' / '.join(PROFILE_FILES)}"}), 400
+    task = processing_tasks.get(task_id)
+    # 剖析结果在 process_video 返回后才写入 profile 字段，此时任务可能已进入 transcoding 等状态
+    profile_pending = task is not None and task.get('profile_requested') and 'profile' not in task
+    if task is not None and (task['status'] in ('uploaded', 'processing') or
+                             (profile_pending and task['status'] != 'failed')):
+        return jsonify({'error': '任务尚未完成'}), 400
+    path = profile_paths(OUTPUT_FOLDER, task_id)[kind]
+    if not path.exists():
+        return jsonify({'error': '该任务没有性能剖析结果，上传时设置 profile=1 开启'}), 404
+    return send_file(path, as_attachment=True, download_name=path.name)
+
+
 @app.route('/api/pose-sequence/<task_id>', methods=['GET'])
 def get_pose_sequence(task_id):
     """获取骨架序列数据（用于前端VideoPlayerWithOverlay组件）"""
+    since_frame, limit = parse_frame_cursor()
     # 首先检查内存中的任务
     if task_id in processing_tasks:
         task = processing_tasks[task_id]
-        if task['status'] != 'completed':
-            return jsonify({'error': '任务尚未完成'}), 400
-        metrics_path = task['metrics_file']
+        if task['status'] == 'failed':
+            return jsonify({'error': task.get('error', '任务处理失败')}), 400
+        metrics_path = task.get('metrics_file')
+        # 处理中输出视频尚未生成，用原视频读取帧率与尺寸
         video_path = task.get('output_video') or task.get('video_path')
     else:
-        # 如果内存中没有，尝试从文件系统加载
+        task = None
+        # 如果内存中没有，尝试从文件系统加载（命中缓存或重新分析的任务映射到源任务的产物）
+        source_task_id = result_cache.resolve(task_id)
         metrics_path = OUTPUT_FOLDER / f"{task_id}_metrics.json"
+        if not metrics_path.exists():
+            metrics_path = OUTPUT_FOLDER / f"{source_task_id}_metrics.json"
         if not metrics_path.exists():
             return jsonify({'error': '任务不存在'}), 404
         # 推断视频路径（优先输出视频，其次原视频）
-        cand_output = OUTPUT_FOLDER / f"{task_id}_output.mp4"
+        cand_output = OUTPUT_FOLDER / f"{source_task_id}_output.mp4"
         if cand_output.exists():
             video_path = str(cand_output)
         else:
             # 查找上传原视频
-            matches = list(UPLOAD_FOLDER.glob(f"{task_id}_*"))
+            matches = list(UPLOAD_FOLDER.glob(f"{source_task_id}_*"))
             video_path = str(matches[0]) if matches else None
     
-    # 读取指标数据
-    with open(metrics_path, 'r', encoding='utf-8') as f:
-        metrics = json.load(f)
+    # 读取指标数据；处理中的任务只有已完成的帧
+    metrics, next_frame, complete = read_task_frames(task, since_frame, limit, metrics_path)
     
     # 读取视频信息: 尝试从真实视频获取 fps/尺寸
     frame_rate = 30.0
@@ -580,6 +1779,8 @@ def get_pose_sequence(task_id):
         "videoSource": f"{task_id}_output.mp4",
         "frameRate": frame_rate,
         "size": size,
+        "complete": complete,
+        "nextFrame": next_frame,
         "frames": []
     }
     
@@ -610,11 +1811,13 @@ def get_video(task_id):
     # 允许任务不在内存的情况：尝试直接从输出目录读取
     if task_id in processing_tasks:
         task = processing_tasks[task_id]
+        if task['status'] == 'transcoding':
+            return jsonify({'error': '视频转码中，请稍后再试'}), 400
         if task['status'] != 'completed':
             return jsonify({'error': '任务尚未完成'}), 400
         video_path = task.get('output_video')
     else:
-        cand = OUTPUT_FOLDER / f"{task_id}_output.mp4"
+        cand = OUTPUT_FOLDER / f"{result_cache.resolve(task_id)}_output.mp4"
         video_path = str(cand) if cand.exists() else None
     
     # 检查文件是否存在
@@ -627,6 +1830,7 @@ def get_video(task_id):
     
     if not range_header:
         # 没有范围请求，返回整个文件
+        VIDEO_BYTES_SERVED.labels('video', 'full').inc(file_size)
         return send_file(
             video_path,
             mimetype='video/mp4',
@@ -652,6 +1856,7 @@ def get_video(task_id):
     with open(video_path, 'rb') as f:
         f.seek(byte_start)
         data = f.read(length)
+    VIDEO_BYTES_SERVED.labels('video', 'range').inc(len(data))
     
     # 返回部分内容
     response = Response(
@@ -677,7 +1882,7 @@ def get_raw_video(task_id):
         video_path = processing_tasks[task_id].get('video_path')
     else:
         # 从文件系统中查找
-        matches = list(UPLOAD_FOLDER.glob(f"{task_id}_*"))
+        matches = list(UPLOAD_FOLDER.glob(f"{result_cache.resolve(task_id)}_*"))
         video_path = str(matches[0]) if matches else None
 
     if not video_path or not os.path.exists(video_path):
@@ -688,6 +1893,7 @@ def get_raw_video(task_id):
 
     if not range_header:
         mime_type, _ = mimetypes.guess_type(video_path)
+        VIDEO_BYTES_SERVED.labels('raw_video', 'full').inc(file_size)
         return send_file(
             video_path,
             mimetype=mime_type or 'application/octet-stream',
@@ -709,6 +1915,7 @@ def get_raw_video(task_id):
     with open(video_path, 'rb') as f:
         f.seek(byte_start)
         data = f.read(length)
+    VIDEO_BYTES_SERVED.labels('raw_video', 'range').inc(len(data))
 
     mime_type, _ = mimetypes.guess_type(video_path)
     response = Response(
@@ -725,10 +1932,152 @@ def get_raw_video(task_id):
     return response
 
 
+class LiveFrameState:
+    """实时会话中需要跨帧保留的状态；帧号按 fps 换算为指标中的时间戳，fps 由 LiveSession 在视频源打开后设为实际帧率"""
+
+    def __init__(self, training_type, roi_mode=True, fps=None):
+        self.training_type = training_type
+        self.fps = fps
+        self.R, self.t = load_extrinsics()
+        self.metrics_calculator = BasketballMetricsCalculator()
+        self.roi_tracker = PersonRoiTracker() if roi_mode else None
+        self.pose_tracker = PoseTracker()
+
+
+def analyze_live_frame(frame, frame_idx, state):
+    """实时会话的单帧分析：姿态估计与训练指标，不绘制也不编码"""
+    poses_3d, poses_2d = estimate_frame_poses(frame, frame_idx, state.pose_tracker, state.roi_tracker)
+    return build_frame_metrics(frame_idx, state.fps, poses_3d, poses_2d, state.R, state.t,
+                               state.metrics_calculator, state.training_type)
+
+
+@app.route('/api/live/start', methods=['POST'])
+def start_live_session():
+    """开始对视频流（rtsp/rtmp/http(s) 地址或摄像头序号）做实时分析"""
+    payload = request.get_json(silent=True) or request.form
+    source = normalize_stream_source(payload.get('source', ''), allowed_root=PROJECT_ROOT / 'data',
+                                     allowed_hosts=LIVE_ALLOWED_HOSTS, allowed_schemes=LIVE_STREAM_SCHEMES)
+    if source is None:
+        return jsonify({'error': f"source 必须是摄像头序号、data 目录下的视频文件或 {'/'.join(LIVE_STREAM_SCHEMES)} 地址；"
+                                 f"视频流主机须在 LIVE_ALLOWED_HOSTS 白名单内，未配置白名单时只允许公网地址"}), 400
+    if sum(1 for session in live_sessions.values() if session.active) >= LIVE_MAX_SESSIONS:
+        return jsonify({'error': f'同时最多运行 {LIVE_MAX_SESSIONS} 个实时会话'}), 429
+    training_type = payload.get('training_type', 'dribbling')
+    max_latency_ms = float(payload.get('max_latency_ms', LIVE_MAX_LATENCY_MS))
+    roi_mode = parse_flag(payload.get('roi_mode', DEFAULT_LIVE_ROI))
+
+    model_manager.start()
+    session = LiveSession(source, analyze_live_frame, live_events.publish, max_latency_ms,
+                          context=LiveFrameState(training_type, roi_mode))
+    # 只保留最近的已结束会话
+    finished = [key for key, other in live_sessions.items() if not other.active]
+    for key in finished[:-20]:
+        live_sessions.pop(key, None)
+    live_sessions[session.session_id] = session
+    session.start(inference_session)
+    return jsonify(session.stats()), 200
+
+
+@app.route('/api/live/<session_id>/stop', methods=['POST'])
+def stop_live_session(session_id):
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': '会话不存在'}), 404
+    session.stop()
+    return jsonify(session.stats()), 200
+
+
+@app.route('/api/live', methods=['GET'])
+def list_live_sessions():
+    return jsonify({'sessions': [session.stats() for session in list(live_sessions.values())]}), 200
+
+
+@app.route('/api/live/<session_id>', methods=['GET'])
+def get_live_session(session_id):
+    """会话状态、丢帧与延迟统计以及最近一次的分析结果"""
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': '会话不存在'}), 404
+    return jsonify({**session.stats(), 'latest': session.result}), 200
+
+
+def stream_live_session(session):
+    """SSE：每有新的分析结果推送 pose 事件，状态变化推送 status 事件，会话结束后推送 end 并关闭。
+    客户端跟不上时只推送最新结果，中间结果直接跳过
+    """
+    seen = {session.session_id: live_events.versions.get(session.session_id, 0)}
+    sent_seq = 0
+    sent_state = None
+    yield 'retry: 3000\n\n'
+    while True:
+        if session.state != sent_state:
+            sent_state = session.state
+            yield _sse_message('status', session.stats())
+        result = session.result
+        if result is not None and result['seq'] > sent_seq:
+            sent_seq = result['seq']
+            yield _sse_message('pose', result)
+        if not session.active:
+            yield _sse_message('end', {'session_id': session.session_id})
+            return
+        changed = live_events.wait(seen, [session.session_id], timeout=SSE_HEARTBEAT_SECONDS)
+        if not changed:
+            yield ': keep-alive\n\n'
+        seen.update(changed)
+
+
+@app.route('/api/live/<session_id>/stream', methods=['GET'])
+def stream_live(session_id):
+    session = live_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': '会话不存在'}), 404
+    return _sse_response(stream_live_session(session))
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查"""
-    return jsonify({'status': 'ok'}), 200
+    response = {'status': 'ok'}
+    if isinstance(model_manager.engine, BatchInferenceScheduler):
+        response['batch_inference'] = model_manager.engine.stats()
+    return jsonify(response), 200
+
+
+@app.route('/api/diagnostics', methods=['GET'])
+def diagnostics():
+    """诊断信息：实际使用的推理后端与线程数、各候选配置的微基准测试耗时、模型加载状态与批量推理统计"""
+    response = {
+        'requested_backend': INFERENCE_BACKEND,
+        'simulation': is_simulated(),
+        'model': model_manager.status(),
+        'engine_selection': {key: value for key, value in engine_selection.items() if key != 'fingerprint'},
+        'shape_buckets': list(BUCKET_WIDTHS),
+    }
+    engine = model_manager.engine
+    if isinstance(engine, BatchInferenceScheduler):
+        response['batch_inference'] = engine.stats()
+        engine = engine.engine
+    if hasattr(engine, 'stats'):
+        response['engine_stats'] = engine.stats()
+    return jsonify(response), 200
+
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """就绪检查：模型加载并预热完成（或模型文件缺失、有意运行在模拟模式）时返回 200，
+    加载或预热中、加载失败时返回 503，失败原因在 error 字段（与存活检查 /api/health 分开）
+    """
+    model_manager.start()
+    response = model_manager.status()
+    response['backend'] = (engine_selection.get('selected') or {}).get('backend', INFERENCE_BACKEND)
+    response['simulation'] = is_simulated()
+    return jsonify(response), 200 if response['ready'] else 503
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 文本格式的运行指标：阶段耗时直方图、处理帧率、任务与队列状态、转码、上传、视频流量与 DeepSeek 调用"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 def call_deepseek_api(training_type: str, metrics_summary: Dict[str, Any]) -> Dict[str, Any]:
@@ -748,7 +2097,7 @@ def call_deepseek_api(training_type: str, metrics_summary: Dict[str, Any]) -> Di
     
     if not api_key:
         print("[WARN] DEEPSEEK_API_KEY not set, using mock response")
-        return generate_mock_ai_analysis(training_type, metrics_summary)
+        return _deepseek_fallback('no_api_key', training_type, metrics_summary)
     
     # DeepSeek API配置
     api_url = "https://api.deepseek.com/v1/chat/completions"
@@ -804,7 +2153,11 @@ def call_deepseek_api(training_type: str, metrics_summary: Dict[str, Any]) -> Di
             'max_tokens': 1000
         }
         
-        response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+        request_start = time.perf_counter()
+        try:
+            response = requests.post(api_url, headers=headers, json=payload, timeout=30)
+        finally:
+            DEEPSEEK_SECONDS.observe(time.perf_counter() - request_start)
         
         if response.status_code == 200:
             result = response.json()
@@ -818,20 +2171,28 @@ def call_deepseek_api(training_type: str, metrics_summary: Dict[str, Any]) -> Di
                 if json_start >= 0 and json_end > json_start:
                     json_str = content[json_start:json_end]
                     analysis_result = json.loads(json_str)
+                    DEEPSEEK_REQUESTS.labels('success').inc()
                     return analysis_result
                 else:
                     # 如果没有找到JSON，使用模拟数据
-                    return generate_mock_ai_analysis(training_type, metrics_summary)
+                    return _deepseek_fallback('no_json', training_type, metrics_summary)
             except json.JSONDecodeError:
                 print(f"[WARN] Failed to parse DeepSeek response as JSON: {content}")
-                return generate_mock_ai_analysis(training_type, metrics_summary)
+                return _deepseek_fallback('parse_error', training_type, metrics_summary)
         else:
             print(f"[ERROR] DeepSeek API error: {response.status_code} - {response.text}")
-            return generate_mock_ai_analysis(training_type, metrics_summary)
+            return _deepseek_fallback('http_error', training_type, metrics_summary)
             
     except Exception as e:
         print(f"[ERROR] DeepSeek API call failed: {e}")
-        return generate_mock_ai_analysis(training_type, metrics_summary)
+        return _deepseek_fallback('exception', training_type, metrics_summary)
+
+
+def _deepseek_fallback(reason: str, training_type: str, metrics_summary: Dict[str, Any]) -> Dict[str, Any]:
+    """记录回退原因后返回模拟分析结果"""
+    DEEPSEEK_REQUESTS.labels('fallback').inc()
+    DEEPSEEK_FALLBACKS.labels(reason).inc()
+    return generate_mock_ai_analysis(training_type, metrics_summary)
 
 
 def generate_mock_ai_analysis(training_type: str, metrics_summary: Dict[str, Any]) -> Dict[str, Any]:
@@ -1089,5 +2450,10 @@ if __name__ == '__main__':
     else:
         print("[WARN] DEEPSEEK_API_KEY not set - using mock AI analysis")
         print("To enable real AI analysis, set DEEPSEEK_API_KEY environment variable")
+
+    # debug 模式下 reloader 会启动两个进程，只在实际提供服务的子进程中加载模型、恢复任务
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        model_manager.start()
+        resume_interrupted_tasks()
     
     app.run(host='0.0.0.0', port=5000, debug=True)
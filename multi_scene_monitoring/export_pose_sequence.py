@@ -13,32 +13,13 @@ import cv2
 import numpy as np
 
 from main import PoseTracker3D
+from modules.engine_factory import INFERENCE_BACKENDS
+from modules.frame_sampling import calculate_adaptive_stride
 from scenes.basketball.metrics_calculator import BasketballMetricsCalculator
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 
 
-def _calculate_adaptive_stride(total_frames: int, fps: float, duration: float) -> int:
-    """根据视频特性自适应计算帧间隔"""
-    # 目标：保持合理的处理帧数，同时保证时间分辨率
-    target_frames = min(300, max(100, duration * 10))  # 每秒10帧，但限制在100-300帧之间
-    
-    if total_frames <= target_frames:
-        return 1  # 短视频不需要跳帧
-    
-    stride = max(1, total_frames // target_frames)
-    
-    # 根据视频长度调整策略
-    if duration < 5:  # 短视频，保持高时间分辨率
-        stride = min(stride, 2)
-    elif duration < 15:  # 中等长度视频
-        stride = min(stride, 3)
-    else:  # 长视频，可以适当跳帧
-        stride = min(stride, 5)
-    
-    return stride
-
-
 POSE_NAME_MAP: Dict[int, str] = {
     0: "颈部",
     1: "鼻尖",
@@ -122,8 +103,9 @@ def export_sequence(
     frame_stride: int,
     confidence_threshold: float,
     max_frames: Optional[int],
+    backend: Optional[str] = None,
 ) -> None:
-    tracker = PoseTracker3D(show_windows=False)
+    tracker = PoseTracker3D(show_windows=False, backend=backend)
     metrics_calculator = BasketballMetricsCalculator()
     capture = cv2.VideoCapture(str(video_path))
     if not capture.isOpened():
@@ -137,7 +119,7 @@ def export_sequence(
 
     # 自适应参数调整
     if frame_stride == 2:  # 使用默认值时才自适应
-        frame_stride = _calculate_adaptive_stride(total_frames, fps, video_duration)
+        frame_stride = calculate_adaptive_stride(total_frames, fps, video_duration)
     
     print(f"视频信息: {total_frames}帧, {fps:.2f}FPS, {video_duration:.2f}秒")
     print(f"使用帧间隔: {frame_stride} (预计处理约{total_frames//frame_stride}帧)")
@@ -250,6 +232,12 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="最多处理的帧数，默认处理全部帧",
     )
+    parser.add_argument(
+        "--backend",
+        choices=INFERENCE_BACKENDS,
+        default=None,
+        help="推理后端 (pytorch / onnx / openvino)，默认读取环境变量 INFERENCE_BACKEND",
+    )
     return parser.parse_args()
 
 
@@ -266,6 +254,7 @@ def main() -> None:
         frame_stride=max(1, args.frame_stride),
         confidence_threshold=max(0.0, args.confidence_threshold),
         max_frames=args.max_frames,
+        backend=args.backend,
     )
     print(f"关键点数据已导出: {output_path}")
 
@@ -15,7 +15,10 @@ from PIL import Image, ImageFont, ImageDraw
 from pathlib import Path
 
 from modules.draw import Plotter3d, draw_poses
-from modules.parse_poses import parse_poses
+from modules.engine_factory import resolve_backend
+from modules.engine_selection import create_selected_engine
+from modules.pose import PoseTracker
+from modules.pose_roi import PersonRoiTracker, infer_with_roi
 from scenes.scene_loader import load_analyzer, summarize_detections
 
 
@@ -118,11 +121,20 @@ def get_angle_3D(v1, v2):
 
 
 class PoseTracker3D:
-    def __init__(self, *, show_windows=True):
-        model_path = str(PROJECT_ROOT / 'human-pose-estimation-3d.pth')
-        from modules.inference_engine_pytorch import InferenceEnginePyTorch
-        self.net = InferenceEnginePyTorch(model_path, 'GPU', use_tensorrt=False)
+    def __init__(self, *, show_windows=True, roi_mode=None, backend=None):
+        # 推理后端：pytorch / onnx / openvino，未指定时读取环境变量 INFERENCE_BACKEND，
+        # auto（默认）时使用与 API 服务共享的本机测试结果，尚无结果时用默认配置，不在实时跟踪启动时测试
+        backend = resolve_backend(backend)
+        selection_path = os.environ.get('ENGINE_SELECTION_PATH', PROJECT_ROOT / 'engine_selection.json')
+        self.net, _ = create_selected_engine(PROJECT_ROOT, backend, selection_path, benchmark=False)
+        if self.net is None:
+            raise FileNotFoundError(f"No usable inference model found in {PROJECT_ROOT}")
         self.show_windows = show_windows
+        # ROI 推理：跟踪到人后只对其周围区域推理，可通过环境变量 ROI_INFERENCE 开启
+        if roi_mode is None:
+            roi_mode = _env_flag('ROI_INFERENCE', default=False)
+        self.roi_tracker = PersonRoiTracker() if roi_mode else None
+        self.pose_tracker = PoseTracker()
 
         # 加载3d画布
         self.canvas_3d = np.zeros((720, 1280, 3), dtype=np.uint8)
@@ -143,15 +155,9 @@ class PoseTracker3D:
         self.t = np.array(extrinsics['t'], dtype=np.float32)
 
     def run_model(self, img):
-        stride = 8
-        base_height = 256  # base_height 默认值为256
-        input_scale = base_height / img.shape[0]
-        scaled_img = cv2.resize(img, dsize=None, fx=input_scale, fy=input_scale)
-        scaled_img = scaled_img[:,
-                          0:scaled_img.shape[1] - (scaled_img.shape[1] % stride)]  # better to pad, but cut out for demo
-        fx = np.float32(0.8 * img.shape[1])
-        inference_result = self.net.infer(scaled_img)
-        poses_3d, poses_2d = parse_poses(inference_result, input_scale, stride, fx, is_video=True)
+        # base_height 默认值为256；开启 ROI 时对跟踪区域裁剪推理，跟丢时回退整帧
+        poses_3d, poses_2d = infer_with_roi(self.net, img, self.roi_tracker, base_height=256, stride=8,
+                                            pose_tracker=self.pose_tracker)
         return poses_3d, poses_2d
 
     def show_canvas_3d(self, poses_3d, injury_warning):
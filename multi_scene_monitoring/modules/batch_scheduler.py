@@ -0,0 +1,124 @@
+"""跨任务批量推理调度：收集所有处理线程提交的帧，按尺寸动态组批后统一调用一次模型"""
+
+import contextlib
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchInferenceScheduler:
+    """包装推理引擎，对外提供与引擎相同的 infer(img) 接口。
+
+    各任务线程调用 infer 时只把帧放入队列并等待结果；后台线程在凑满 max_batch_size
+    或等待超过 max_wait_ms 后把相同尺寸的帧合成一批推理，再把结果分发回各调用方。
+    只有一个活跃任务时不等待，直接推理，不增加单任务延迟。
+    """
+
+    def __init__(self, engine, max_batch_size=8, max_wait_ms=10):
+        self.engine = engine
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.pending = []  # [(img, future), ...]
+        self.condition = threading.Condition()
+        self.active_clients = 0
+        self.running = False
+        self.thread = None
+        self.batches = 0
+        self.frames = 0
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return self
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name='batch-inference', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    @contextlib.contextmanager
+    def session(self):
+        """标记一个正在处理的任务，调度器据此判断是否值得等待其他任务的帧"""
+        with self.condition:
+            self.active_clients += 1
+        try:
+            yield self
+        finally:
+            with self.condition:
+                self.active_clients -= 1
+                self.condition.notify_all()
+
+    def infer(self, img):
+        future = Future()
+        with self.condition:
+            if not self.running:
+                raise RuntimeError('BatchInferenceScheduler is not running')
+            self.pending.append((img, future))
+            self.condition.notify_all()
+        return future.result()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': round(self.frames / self.batches, 2) if self.batches else 0.0,
+            'active_clients': self.active_clients,
+            'queue_depth': len(self.pending),
+        }
+
+    def _collect(self):
+        """等待第一帧，再在时限内继续收集，直到凑满一批或没有其他任务会提交帧"""
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait()
+            if not self.running:
+                return []
+            deadline = time.monotonic() + self.max_wait
+            while len(self.pending) < min(self.max_batch_size, max(1, self.active_clients)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    break
+                self.condition.wait(remaining)
+            batch = self.pending[:self.max_batch_size]
+            del self.pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                if not self.running:
+                    break
+                continue
+            # 只有尺寸相同的帧才能拼成一个张量
+            groups = {}
+            for img, future in batch:
+                groups.setdefault(img.shape, []).append((img, future))
+            for items in groups.values():
+                imgs = [img for img, _ in items]
+                try:
+                    if hasattr(self.engine, 'infer_batch'):
+                        results = self.engine.infer_batch(imgs)
+                    else:
+                        results = [self.engine.infer(img) for img in imgs]
+                except Exception as exc:
+                    for _, future in items:
+                        future.set_exception(exc)
+                    continue
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+                self.batches += 1
+                self.frames += len(items)
+
+        # 停止时让仍在等待的调用方得到异常而不是永久阻塞
+        with self.condition:
+            for _, future in self.pending:
+                future.set_exception(RuntimeError('BatchInferenceScheduler stopped'))
+            self.pending.clear()
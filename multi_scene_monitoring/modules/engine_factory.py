@@ -0,0 +1,54 @@
+"""推理后端选择：按名称创建 PyTorch、ONNX Runtime 或 OpenVINO 推理引擎，三者的 infer 接口一致"""
+
+import os
+from pathlib import Path
+
+INFERENCE_BACKENDS = ('pytorch', 'onnx', 'openvino')
+AUTO_BACKEND = 'auto'  # 由 engine_selection 按主机微基准测试结果选择
+MODEL_FILENAMES = {
+    'pytorch': 'human-pose-estimation-3d.pth',
+    'onnx': 'human-pose-estimation-3d.onnx',
+    'openvino': 'human-pose-estimation-3d.xml',
+}
+
+
+def resolve_backend(backend=None):
+    """未指定时读取环境变量 INFERENCE_BACKEND，默认 auto（按主机自动选择）"""
+    backend = (backend or os.getenv('INFERENCE_BACKEND') or AUTO_BACKEND).strip().lower()
+    if backend != AUTO_BACKEND and backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {INFERENCE_BACKENDS + (AUTO_BACKEND,)}")
+    return backend
+
+
+def default_model_path(project_root, backend):
+    """ONNX / OpenVINO 模型路径可分别用环境变量 ONNX_MODEL_PATH / OPENVINO_MODEL_PATH 覆盖"""
+    if backend == 'onnx' and os.getenv('ONNX_MODEL_PATH'):
+        return str(Path(os.getenv('ONNX_MODEL_PATH')))
+    if backend == 'openvino' and os.getenv('OPENVINO_MODEL_PATH'):
+        return str(Path(os.getenv('OPENVINO_MODEL_PATH')))
+    return str(Path(project_root) / MODEL_FILENAMES[backend])
+
+
+def create_inference_engine(backend, model_path, device='GPU', num_threads=None):
+    """num_threads 为 None 时沿用各后端的环境变量或默认线程数"""
+    if backend == 'onnx':
+        from modules.inference_engine_onnx import InferenceEngineONNX
+        num_threads = num_threads or os.getenv('ONNX_NUM_THREADS')
+        return InferenceEngineONNX(model_path, device,
+                                   num_threads=int(num_threads) if num_threads else None,
+                                   graph_optimization=os.getenv('ONNX_GRAPH_OPTIMIZATION', 'all'))
+    if backend == 'openvino':
+        from modules.inference_engine_openvino import InferenceEngineOpenVINO
+        # OpenVINO 的 GPU 指 Intel 核显，设备单独用 OPENVINO_DEVICE 指定
+        return InferenceEngineOpenVINO(model_path, os.getenv('OPENVINO_DEVICE', 'CPU'),
+                                       num_requests=int(os.getenv('OPENVINO_NUM_REQUESTS', '4')),
+                                       cache_size=int(os.getenv('OPENVINO_SHAPE_CACHE', '4')),
+                                       normalize=os.getenv('OPENVINO_NORMALIZE', '0').strip().lower() in ('1', 'true', 'yes', 'on'),
+                                       num_threads=num_threads)
+    from modules.inference_engine_pytorch import InferenceEnginePyTorch
+    if num_threads:
+        import torch
+        torch.set_num_threads(int(num_threads))
+    # 计算精度：fp32（默认）、bf16 自动混合精度或校准后的 int8
+    precision = os.getenv('INFERENCE_PRECISION', 'fp32').strip().lower()
+    return InferenceEnginePyTorch(model_path, device, use_tensorrt=False, precision=precision)
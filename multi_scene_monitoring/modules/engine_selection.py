@@ -0,0 +1,207 @@
+"""按主机自动选择推理引擎：首次启动时在生产输入尺寸上对每个可用后端与线程数做微基准测试，
+选出单帧耗时最短的配置并按主机名持久化，之后启动直接读取。模型文件、CPU 核数或输入尺寸变化时重新测试。
+
+多个进程同时冷启动时，只有拿到文件锁的进程做测试，其余进程等锁后直接读取它写入的结果；
+结果文件先写临时文件再原子替换，读取方不会看到写了一半的 JSON。
+"""
+
+import contextlib
+import importlib.util
+import json
+import os
+import socket
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只保留原子替换
+    fcntl = None
+
+import numpy as np
+
+from modules.engine_factory import AUTO_BACKEND, INFERENCE_BACKENDS, create_inference_engine, default_model_path
+
+BACKEND_PACKAGES = {'pytorch': 'torch', 'onnx': 'onnxruntime', 'openvino': 'openvino'}
+# 16:9 视频缩放到 256 px 高后的分桶宽度，即线上最常见的网络输入尺寸
+DEFAULT_BENCHMARK_SHAPE = (256, 456)
+
+
+def thread_options(cpu_count=None):
+    """单线程、一半核数与全部核数三档"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return sorted({1, max(1, cpu_count // 2), cpu_count})
+
+
+def _cuda_available():
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def candidate_configs(project_root):
+    """列出模型文件与依赖包都存在的后端，CPU 后端按线程数展开，PyTorch 在有 CUDA 时额外测试 GPU"""
+    configs = []
+    for backend in INFERENCE_BACKENDS:
+        model_path = default_model_path(project_root, backend)
+        if not Path(model_path).exists() or importlib.util.find_spec(BACKEND_PACKAGES[backend]) is None:
+            continue
+        if backend == 'pytorch' and _cuda_available():
+            configs.append({'backend': backend, 'device': 'GPU', 'threads': None, 'model_path': model_path})
+        for threads in thread_options():
+            configs.append({'backend': backend, 'device': 'CPU', 'threads': threads, 'model_path': model_path})
+    return configs
+
+
+def host_fingerprint(configs, shape):
+    """候选配置对应的模型文件（大小与修改时间）、CPU 核数与输入尺寸，任一变化都需要重新测试"""
+    models = {}
+    for config in configs:
+        stat = Path(config['model_path']).stat()
+        models[config['backend']] = [config['model_path'], stat.st_size, int(stat.st_mtime)]
+    return {'models': models, 'cpu_count': os.cpu_count(), 'shape': list(shape),
+            'precision': os.getenv('INFERENCE_PRECISION', 'fp32')}
+
+
+def benchmark_config(config, shape=DEFAULT_BENCHMARK_SHAPE, frames=5):
+    """创建引擎并预热一帧后逐帧计时。卷积网络的耗时与画面内容无关，这里用随机图像代替真实帧"""
+    result = dict(config)
+    try:
+        engine = create_inference_engine(config['backend'], config['model_path'], config['device'],
+                                         num_threads=config['threads'])
+        rng = np.random.default_rng(0)
+        imgs = [rng.integers(0, 256, (shape[0], shape[1], 3), dtype=np.uint8) for _ in range(frames)]
+        engine.infer(imgs[0])
+        timings = []
+        for img in imgs:
+            start = time.perf_counter()
+            engine.infer(img)
+            timings.append((time.perf_counter() - start) * 1000)
+        result['median_ms'] = round(float(np.median(timings)), 2)
+        result['min_ms'] = round(float(np.min(timings)), 2)
+    except Exception as exc:
+        result['error'] = str(exc)
+    return result
+
+
+def benchmark_configs(configs, shape=DEFAULT_BENCHMARK_SHAPE, frames=5):
+    """依次测试各配置；创建 PyTorch 引擎会修改进程全局的 torch 线程数，测试结束后恢复原值"""
+    try:
+        import torch
+        previous_threads = torch.get_num_threads()
+    except ImportError:
+        torch = None
+    try:
+        return [benchmark_config(config, shape, frames) for config in configs]
+    finally:
+        if torch is not None:
+            torch.set_num_threads(previous_threads)
+
+
+def load_selections(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_selections(cache_path, selections):
+    """写入同目录下的临时文件后原子替换"""
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(selections, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, cache_path)
+
+
+@contextlib.contextmanager
+def selection_lock(cache_path):
+    """对结果文件旁的 .lock 文件加排他锁，串行化同一主机上各进程的测试与写入"""
+    if not cache_path or fcntl is None:
+        yield
+        return
+    lock_path = Path(cache_path).with_name(f"{Path(cache_path).name}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _cached_entry(cache_path, host, fingerprint):
+    entry = (load_selections(cache_path) if cache_path else {}).get(host)
+    if entry and entry.get('fingerprint') == fingerprint and entry.get('selected'):
+        return entry
+    return None
+
+
+def select_engine(project_root, backend=None, cache_path=None, shape=DEFAULT_BENCHMARK_SHAPE, frames=5,
+                  force=False, benchmark=True):
+    """返回 {'selected': 配置或 None, 'results': [...], 'cached': bool, ...}。
+
+    backend 不是 auto 时直接使用指定后端（线程数沿用环境变量），不做测试；
+    auto 时读取 cache_path 中本机的测试结果，缺失或过期时重新测试并写回。
+    benchmark 为 False 时缺少结果也不测试，使用第一个候选后端的默认线程数（mode 为 'default'）。
+    """
+    if backend and backend != AUTO_BACKEND:
+        model_path = default_model_path(project_root, backend)
+        selected = {'backend': backend, 'device': 'GPU', 'threads': None, 'model_path': model_path}
+        return {'selected': selected if Path(model_path).exists() else None, 'results': [],
+                'cached': False, 'mode': 'fixed'}
+
+    host = socket.gethostname()
+    configs = candidate_configs(project_root)
+    if not configs:
+        return {'selected': None, 'results': [], 'cached': False, 'mode': AUTO_BACKEND, 'host': host}
+    fingerprint = host_fingerprint(configs, shape)
+
+    entry = None if force else _cached_entry(cache_path, host, fingerprint)
+    if entry:
+        return {**entry, 'cached': True, 'mode': AUTO_BACKEND, 'host': host}
+    if not benchmark:
+        selected = {**configs[0], 'threads': None}
+        return {'selected': selected, 'results': [], 'cached': False, 'mode': 'default', 'host': host}
+
+    with selection_lock(cache_path):
+        # 等锁期间其他进程可能已经完成测试
+        entry = None if force else _cached_entry(cache_path, host, fingerprint)
+        if entry:
+            return {**entry, 'cached': True, 'mode': AUTO_BACKEND, 'host': host}
+
+        print(f"[INFO] 正在对 {len(configs)} 种推理配置做微基准测试（输入 {shape[1]}x{shape[0]}）...")
+        results = benchmark_configs(configs, shape, frames)
+        timed = [result for result in results if 'median_ms' in result]
+        best = min(timed, key=lambda result: result['median_ms']) if timed else None
+        selected = {key: best[key] for key in ('backend', 'device', 'threads', 'model_path')} if best else None
+        entry = {'selected': selected, 'results': results, 'fingerprint': fingerprint,
+                 'benchmarked_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        if cache_path and selected:
+            selections = load_selections(cache_path)
+            selections[host] = entry
+            save_selections(cache_path, selections)
+    return {**entry, 'cached': False, 'mode': AUTO_BACKEND, 'host': host}
+
+
+def create_selected_engine(project_root, backend=None, cache_path=None, selected=None, benchmark=True):
+    """按 select_engine 的结果创建引擎，返回 (engine, selection)，没有可用模型时 engine 为 None。
+
+    selected 为其他进程已选定的配置（例如主进程传给并行分段子进程）时直接使用，不读取结果文件也不测试。
+    """
+    if selected is not None:
+        selection = {'selected': selected, 'results': [], 'cached': True, 'mode': 'inherited'}
+    else:
+        selection = select_engine(project_root, backend, cache_path, benchmark=benchmark)
+    config = selection['selected']
+    if config is None:
+        return None, selection
+    engine = create_inference_engine(config['backend'], config['model_path'], config['device'],
+                                     num_threads=config['threads'])
+    return engine, selection
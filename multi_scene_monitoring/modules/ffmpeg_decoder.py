@@ -0,0 +1,107 @@
+"""基于 ffmpeg 管道的视频解码：由 ffmpeg 的缩放器直接输出网络输入尺寸（高 256、补齐到分桶宽度）的图像，
+需要绘制输出视频时同时输出原分辨率帧。两者在 ffmpeg 中上下拼接成一帧，读入预先分配的缓冲池，
+读取一帧不分配新的内存，返回的是缓冲区的视图。
+
+用法与 cv2.VideoCapture 相同（read / release），另外 network_input(frame) 返回该帧对应的
+(网络输入图像, padding)，推理时可省去 cv2.resize 与补齐。
+"""
+
+import subprocess
+
+import numpy as np
+
+from modules.shape_buckets import PAD_VALUE, bucket_width
+
+
+class FFmpegFrameReader:
+    def __init__(self, ffmpeg_path, video_path, width, height, base_height=256, stride=8, full_frames=True,
+                 pool_size=4, buckets=None):
+        self.width = width
+        self.height = height
+        self.full_frames = full_frames
+        # 与 cv2.resize(fx=fy=base_height/height) 得到的尺寸一致
+        self.input_scale = base_height / height
+        scaled_width = int(round(width * self.input_scale))
+        target = bucket_width(scaled_width, stride, buckets)
+        net_filters = [f'scale={scaled_width}:{base_height}:flags=bilinear', 'format=bgr24']
+        if target is None:
+            # 未启用分桶：与 pad_to_bucket 相同，裁剪到 stride 的整数倍
+            net_width = scaled_width - scaled_width % stride
+            net_filters.append(f'crop={net_width}:{base_height}:0:0')
+            self.padding = None
+        else:
+            net_width = target
+            pad_left = (target - scaled_width) // 2 // stride * stride
+            net_filters.append(f'pad={target}:{base_height}:{pad_left}:0:color=0x{PAD_VALUE:02x}{PAD_VALUE:02x}{PAD_VALUE:02x}')
+            self.padding = (pad_left, target - scaled_width - pad_left)
+        self.net_width = net_width
+
+        if full_frames:
+            # 原分辨率帧在上、网络输入在下，宽度不同时较窄的一方在右侧补齐
+            canvas_width = max(width, net_width)
+            rows = height + base_height
+            full_chain = 'format=bgr24' + (f',pad={canvas_width}:{height}:0:0' if canvas_width > width else '')
+            net_chain = ','.join(net_filters) + (f',pad={canvas_width}:{base_height}:0:0' if canvas_width > net_width else '')
+            filter_graph = f'[0:v]split=2[full][net];[full]{full_chain}[top];[net]{net_chain}[bottom];[top][bottom]vstack'
+        else:
+            canvas_width = net_width
+            rows = base_height
+            filter_graph = f'[0:v]{",".join(net_filters)}'
+
+        self.pool = np.empty((pool_size, rows, canvas_width, 3), dtype=np.uint8)
+        # 预先建好每个缓冲区的视图，network_input 按对象身份找到对应的网络输入
+        self.frames = []
+        self.inputs = []
+        for slot in self.pool:
+            if full_frames:
+                self.frames.append(slot[:height, :width])
+                self.inputs.append(slot[height:, :net_width])
+            else:
+                self.inputs.append(slot[:, :net_width])
+                self.frames.append(self.inputs[-1])
+        self.frame_bytes = self.pool[0].nbytes
+        self.next_slot = 0
+
+        command = [
+            ffmpeg_path, '-nostdin', '-loglevel', 'error', '-noautorotate',
+            '-i', str(video_path),
+            '-filter_complex', filter_graph,
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1',
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def isOpened(self):
+        return self.process is not None
+
+    def read(self):
+        """读取下一帧到缓冲池，返回 (ok, frame)。缓冲区循环使用，pool_size 帧之后会被覆盖"""
+        if self.process is None:
+            return False, None
+        slot = self.next_slot
+        view = memoryview(self.pool[slot]).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                return False, None
+            filled += count
+        self.next_slot = (slot + 1) % len(self.pool)
+        return True, self.frames[slot]
+
+    def network_input(self, frame):
+        """返回 frame（read 返回的视图）对应的 (网络输入图像, padding)，不是本解码器的帧时返回 None"""
+        for slot, candidate in enumerate(self.frames):
+            if candidate is frame:
+                return self.inputs[slot], self.padding
+        return None
+
+    def release(self):
+        """结束 ffmpeg 进程，返回其错误输出（正常结束时为空字符串）"""
+        if self.process is None:
+            return ''
+        process, self.process = self.process, None
+        process.stdout.close()
+        if process.poll() is None:
+            process.terminate()
+        _, stderr = process.communicate(timeout=10)
+        return stderr.decode('utf-8', 'replace').strip()
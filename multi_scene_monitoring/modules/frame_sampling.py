@@ -0,0 +1,139 @@
+"""时间维度跳帧推理：自适应帧间隔计算与关键帧之间的姿态插值"""
+
+import numpy as np
+
+# 相邻两个推理关键帧之间允许的最大关键点位移（相对人体高度）
+MAX_KEYFRAME_DISPLACEMENT = 0.05
+
+
+def calculate_adaptive_stride(total_frames: int, fps: float, duration: float) -> int:
+    """根据视频特性自适应计算帧间隔"""
+    # 目标：保持合理的处理帧数，同时保证时间分辨率
+    target_frames = min(300, max(100, duration * 10))  # 每秒10帧，但限制在100-300帧之间
+
+    if total_frames <= target_frames:
+        return 1  # 短视频不需要跳帧
+
+    stride = max(1, int(total_frames // target_frames))
+
+    # 根据视频长度调整策略
+    if duration < 5:  # 短视频，保持高时间分辨率
+        stride = min(stride, 2)
+    elif duration < 15:  # 中等长度视频
+        stride = min(stride, 3)
+    else:  # 长视频，可以适当跳帧
+        stride = min(stride, 5)
+
+    return stride
+
+
+def _pose_center(pose_2d):
+    pose = np.asarray(pose_2d[0:-1], dtype=np.float32).reshape((-1, 3))
+    valid = pose[:, 2] > 0
+    if not np.any(valid):
+        return None, 0.0
+    points = pose[valid, 0:2]
+    height = float(points[:, 1].max() - points[:, 1].min())
+    return points.mean(axis=0), height
+
+
+def match_poses(poses_2d_a, poses_2d_b):
+    """按关键点中心的最近距离贪心匹配两帧中的人，返回 [(idx_a, idx_b), ...]"""
+    centers_a = [_pose_center(pose) for pose in poses_2d_a]
+    centers_b = [_pose_center(pose) for pose in poses_2d_b]
+    candidates = []
+    for idx_a, (center_a, height_a) in enumerate(centers_a):
+        if center_a is None:
+            continue
+        for idx_b, (center_b, height_b) in enumerate(centers_b):
+            if center_b is None:
+                continue
+            distance = float(np.linalg.norm(center_a - center_b))
+            # 中心位移超过一个身高的视为不同的人
+            if distance <= max(height_a, height_b, 1.0):
+                candidates.append((distance, idx_a, idx_b))
+
+    matches = []
+    used_a, used_b = set(), set()
+    for _, idx_a, idx_b in sorted(candidates):
+        if idx_a in used_a or idx_b in used_b:
+            continue
+        used_a.add(idx_a)
+        used_b.add(idx_b)
+        matches.append((idx_a, idx_b))
+    return matches
+
+
+def stitch_order(reference_poses_2d, seam_poses_2d):
+    """分段拼接：用同一帧在前后两个分段中的姿态匹配人员，返回让后一分段沿用前一分段人员顺序的排列。
+
+    人数不一致或无法一一匹配时返回 None，表示保持原顺序。
+    """
+    if len(reference_poses_2d) != len(seam_poses_2d) or len(seam_poses_2d) < 2:
+        return None
+    matches = match_poses(reference_poses_2d, seam_poses_2d)
+    if len(matches) != len(seam_poses_2d):
+        return None
+    order = [idx_b for _, idx_b in sorted(matches)]
+    if order == list(range(len(order))):
+        return None
+    return order
+
+
+def estimate_pose_motion(poses_2d_a, poses_2d_b, frame_gap):
+    """估计两关键帧之间每帧的关键点平均位移（相对人体高度），无匹配时返回 None"""
+    motions = []
+    for idx_a, idx_b in match_poses(poses_2d_a, poses_2d_b):
+        pose_a = np.asarray(poses_2d_a[idx_a][0:-1], dtype=np.float32).reshape((-1, 3))
+        pose_b = np.asarray(poses_2d_b[idx_b][0:-1], dtype=np.float32).reshape((-1, 3))
+        valid = (pose_a[:, 2] > 0) & (pose_b[:, 2] > 0)
+        if not np.any(valid):
+            continue
+        _, height = _pose_center(poses_2d_b[idx_b])
+        displacement = np.linalg.norm(pose_a[valid, 0:2] - pose_b[valid, 0:2], axis=1).mean()
+        motions.append(float(displacement) / max(height, 1.0) / max(frame_gap, 1))
+    if not motions:
+        return None
+    return max(motions)
+
+
+def adjust_stride_for_motion(base_stride: int, motion) -> int:
+    """根据最近一次测得的运动幅度收紧帧间隔，保证插值误差可控"""
+    if motion is None or motion <= 0:
+        return base_stride
+    stride = int(MAX_KEYFRAME_DISPLACEMENT / motion)
+    return int(min(base_stride, max(1, stride)))
+
+
+def interpolate_poses(start, end, alpha):
+    """在两个推理关键帧的 (poses_3d, poses_2d) 之间线性插值。
+
+    人数与未匹配的人沿用距离更近的关键帧；任一端缺失的关键点也直接取更近关键帧的值。
+    """
+    start_3d, start_2d = start
+    end_3d, end_2d = end
+    near_3d, near_2d = (start_3d, start_2d) if alpha < 0.5 else (end_3d, end_2d)
+    if len(near_2d) == 0:
+        return near_3d, near_2d
+
+    poses_3d = np.array(near_3d, dtype=np.float32, copy=True)
+    poses_2d = np.array(near_2d, dtype=np.float32, copy=True)
+    for idx_a, idx_b in match_poses(start_2d, end_2d):
+        target = idx_a if alpha < 0.5 else idx_b
+
+        pose_a = np.asarray(start_2d[idx_a], dtype=np.float32)
+        pose_b = np.asarray(end_2d[idx_b], dtype=np.float32)
+        conf_a = pose_a[2:-1:3]
+        conf_b = pose_b[2:-1:3]
+        both_found = np.repeat((conf_a != -1) & (conf_b != -1), 3)
+        blended = pose_a[0:-1] * (1 - alpha) + pose_b[0:-1] * alpha
+        poses_2d[target][0:-1] = np.where(both_found, blended, poses_2d[target][0:-1])
+        poses_2d[target][-1] = pose_a[-1] * (1 - alpha) + pose_b[-1] * alpha
+
+        if idx_a < len(start_3d) and idx_b < len(end_3d) and target < len(poses_3d):
+            pose_3d_a = np.asarray(start_3d[idx_a], dtype=np.float32)
+            pose_3d_b = np.asarray(end_3d[idx_b], dtype=np.float32)
+            found_3d = np.repeat((pose_3d_a[3::4] != -1) & (pose_3d_b[3::4] != -1), 4)
+            blended_3d = pose_3d_a * (1 - alpha) + pose_3d_b * alpha
+            poses_3d[target] = np.where(found_3d, blended_3d, poses_3d[target])
+    return poses_3d, poses_2d
@@ -0,0 +1,58 @@
+import numpy as np
+import onnxruntime as ort
+
+from modules.stage_timer import timed
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+class InferenceEngineONNX:
+    def __init__(self, model_path, device='CPU',
+                 img_mean=np.array([128, 128, 128], dtype=np.float32),
+                 img_scale=np.float32(1/255),
+                 num_threads=None, graph_optimization='all'):
+        self.img_mean = img_mean
+        self.img_scale = img_scale
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization]
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+            options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        providers = ['CPUExecutionProvider']
+        if device != 'CPU':
+            if 'CUDAExecutionProvider' in ort.get_available_providers():
+                providers.insert(0, 'CUDAExecutionProvider')
+            else:
+                print('No CUDA execution provider found, inferring on CPU')
+        self.session = ort.InferenceSession(str(model_path), sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = ['features', 'heatmaps', 'pafs']
+
+    def infer(self, img):
+        with timed('normalize'):
+            normalized_img = InferenceEngineONNX._normalize(img, self.img_mean, self.img_scale)[None]
+        features, heatmaps, pafs = self._run(normalized_img)
+        return features[0], heatmaps[0], pafs[0]
+
+    def infer_batch(self, imgs):
+        """对尺寸相同的多帧一次推理，返回与 infer 相同格式的结果列表"""
+        batch = np.stack([InferenceEngineONNX._normalize(img, self.img_mean, self.img_scale) for img in imgs])
+        features, heatmaps, pafs = self._run(batch)
+        return [(features[i], heatmaps[i], pafs[i]) for i in range(len(imgs))]
+
+    def _run(self, batch):
+        data = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        return self.session.run(self.output_names, {self.input_name: data})
+
+    @staticmethod
+    def _normalize(img, img_mean, img_scale):
+        normalized_img = (img.astype(np.float32) - img_mean) * img_scale
+        return normalized_img
@@ -1,36 +1,121 @@
-import os
+import collections
+import threading
+from concurrent.futures import Future
 
 import numpy as np
-from openvino.inference_engine import IENetwork, IECore
+import openvino as ov
+from openvino.preprocess import PrePostProcessor
+
+from modules.stage_timer import timed
 
 
 class InferenceEngineOpenVINO:
-    def __init__(self, net_model_xml_path, device):
+    """基于 OpenVINO 2023+ 运行时 API 的推理引擎，输入为未归一化的 BGR 图像。
+
+    用 mo --mean_values/--scale_values 转换的 IR 已包含归一化；直接由 ONNX 模型转换的 IR
+    需要 normalize=True，由 OpenVINO 预处理把 (img - 128) / 255 编入模型。
+
+    每种输入尺寸编译一次，编译结果按尺寸放在 LRU 缓存中，尺寸切换时不再重新编译；
+    每个编译模型带一个异步请求队列，多个线程同时调用 infer 时可以有多个请求同时在执行。
+    锁只保护编译缓存：等待空闲请求与提交请求都在锁外进行，一种尺寸的请求全忙时不会阻塞其他尺寸与 stats。
+    """
+
+    def __init__(self, net_model_xml_path, device='CPU', num_requests=4, cache_size=4, normalize=False,
+                 num_threads=None):
         self.device = device
+        self.num_requests = max(1, int(num_requests))
+        self.cache_size = max(1, int(cache_size))
+        self.compile_config = {'PERFORMANCE_HINT': 'THROUGHPUT'}
+        if num_threads:
+            self.compile_config['INFERENCE_NUM_THREADS'] = str(int(num_threads))
 
-        net_model_bin_path = os.path.splitext(net_model_xml_path)[0] + '.bin'
-        self.net = IENetwork(model=net_model_xml_path, weights=net_model_bin_path)
-        required_input_key = {'data'}
-        assert required_input_key == set(self.net.inputs.keys()), \
-            'Demo supports only topologies with the following input key: {}'.format(', '.join(required_input_key))
+        self.core = ov.Core()
+        self.model = self.core.read_model(str(net_model_xml_path))
+        input_names = {name for port in self.model.inputs for name in port.get_names()}
+        assert 'data' in input_names, \
+            'Demo supports only topologies with the following input key: data'
+        output_names = {name for port in self.model.outputs for name in port.get_names()}
         required_output_keys = {'features', 'heatmaps', 'pafs'}
-        assert required_output_keys.issubset(self.net.outputs.keys()), \
+        assert required_output_keys.issubset(output_names), \
             'Demo supports only topologies with the following output keys: {}'.format(', '.join(required_output_keys))
+        if normalize:
+            preprocessor = PrePostProcessor(self.model)
+            preprocessor.input('data').preprocess().mean(128.0).scale(255.0)
+            self.model = preprocessor.build()
 
-        self.ie = IECore()
-        self.exec_net = self.ie.load_network(network=self.net, num_requests=1, device_name=device)
+        self.compiled = collections.OrderedDict()  # (h, w) -> AsyncInferQueue
+        self.compile_count = 0
+        self.lock = threading.Lock()
+        self.submitting = collections.Counter()  # AsyncInferQueue -> 已取出但尚未提交完的线程数
+        self.submitted = threading.Condition(self.lock)
 
     def infer(self, img):
-        input_layer = next(iter(self.net.inputs))
-        n, c, h, w = self.net.inputs[input_layer].shape
-        if h != img.shape[0] or w != img.shape[1]:
-            self.net.reshape({input_layer: (n, c, img.shape[0], img.shape[1])})
-            self.exec_net = self.ie.load_network(network=self.net, num_requests=1, device_name=self.device)
-        img = np.transpose(img, (2, 0, 1))[None, ]
+        return self.infer_async(img).result()
+
+    def infer_batch(self, imgs):
+        """逐帧提交异步请求后统一等待，多帧在多个请求上并发执行，返回与 infer 相同格式的结果列表"""
+        futures = [self.infer_async(img) for img in imgs]
+        return [future.result() for future in futures]
+
+    def infer_async(self, img):
+        """提交一帧推理，返回 Future，结果为 (features, heatmaps, pafs)"""
+        future = Future()
+        with timed('normalize'):
+            data = np.transpose(img, (2, 0, 1))[None].astype(np.float32)
+        with self.lock:
+            infer_queue, evicted = self._queue_for(img.shape[0], img.shape[1])
+            self.submitting[infer_queue] += 1
+        try:
+            # start_async 在没有空闲请求时会阻塞，直到有请求完成；AsyncInferQueue 自身是线程安全的
+            infer_queue.start_async({'data': data}, future)
+        finally:
+            with self.lock:
+                self.submitting[infer_queue] -= 1
+                if not self.submitting[infer_queue]:
+                    del self.submitting[infer_queue]
+                    self.submitted.notify_all()
+        if evicted is not None:
+            self._drain(evicted)
+        return future
+
+    def stats(self):
+        with self.lock:
+            return {
+                'cached_shapes': [list(shape) for shape in self.compiled],
+                'compile_count': self.compile_count,
+                'num_requests': self.num_requests,
+            }
+
+    def _queue_for(self, height, width):
+        """持有 self.lock 时调用，返回 (请求队列, 被挤出缓存的请求队列或 None)"""
+        shape = (height, width)
+        infer_queue = self.compiled.get(shape)
+        if infer_queue is not None:
+            self.compiled.move_to_end(shape)
+            return infer_queue, None
 
-        inference_result = self.exec_net.infer(inputs={'data': img})
+        self.model.reshape({'data': [1, 3, height, width]})
+        compiled_model = self.core.compile_model(self.model, self.device, self.compile_config)
+        self.compile_count += 1
+        infer_queue = ov.AsyncInferQueue(compiled_model, self.num_requests)
+        infer_queue.set_callback(InferenceEngineOpenVINO._on_done)
+        self.compiled[shape] = infer_queue
+        evicted = None
+        if len(self.compiled) > self.cache_size:
+            _, evicted = self.compiled.popitem(last=False)
+        return infer_queue, evicted
 
-        inference_result = (inference_result['features'][0],
-                            inference_result['heatmaps'][0], inference_result['pafs'][0])
-        return inference_result
+    def _drain(self, evicted):
+        """等其他线程在被挤出的队列上提交完、已提交的请求全部结束后再释放该队列"""
+        with self.lock:
+            self.submitted.wait_for(lambda: evicted not in self.submitting)
+        evicted.wait_all()
 
+    @staticmethod
+    def _on_done(request, future):
+        try:
+            future.set_result((request.get_tensor('features').data[0].copy(),
+                               request.get_tensor('heatmaps').data[0].copy(),
+                               request.get_tensor('pafs').data[0].copy()))
+        except Exception as exc:
+            future.set_exception(exc)
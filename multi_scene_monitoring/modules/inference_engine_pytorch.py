@@ -1,23 +1,58 @@
+import collections
+import contextlib
+import threading
+from pathlib import Path
+
 import numpy as np
 import torch
 
+from modules.stage_timer import timed
+
 
 class InferenceEnginePyTorch:
     def __init__(self, checkpoint_path, device,
                  img_mean=np.array([128, 128, 128], dtype=np.float32),
                  img_scale=np.float32(1/255),
-                 use_tensorrt=False):
+                 use_tensorrt=False, precision='fp32', int8_model_path=None,
+                 mmap_weights=True, mmap_weights_path=None):
         from models.with_mobilenet import PoseEstimationWithMobileNet
         from modules.load_state import load_state
+        from modules.quantization import PRECISIONS, default_int8_model_path, load_int8_model
+        from modules.shared_weights import build_mmap_net, resolve_mmap_weights
         self.img_mean = img_mean
         self.img_scale = img_scale
         self.device = 'cpu'
+        # 每个线程按输入形状缓存的 NCHW 输入张量，多个任务线程共享同一个引擎时互不覆盖
+        self._buffers = threading.local()
+        if precision not in PRECISIONS:
+            raise ValueError('Unknown precision {}, expected one of {}'.format(precision, PRECISIONS))
+        self.precision = precision
+
+        # INT8 模型由 scripts/calibrate_quantization.py 校准生成，量化算子只能在 CPU 上运行
+        if precision == 'int8':
+            int8_model_path = Path(int8_model_path or default_int8_model_path(checkpoint_path))
+            if int8_model_path.exists():
+                self.net = load_int8_model(int8_model_path)
+                return
+            print('INT8 model {} not found, run scripts/calibrate_quantization.py first; '
+                  'falling back to fp32'.format(int8_model_path))
+            self.precision = 'fp32'
+
         if device != 'CPU':
             if torch.cuda.is_available():
                 self.device = torch.device('cuda:0')
             else:
                 print('No CUDA device found, inferring on CPU')
 
+        # 已由 scripts/convert_weights_mmap.py 预转换时，内存映射加载，多个进程共享同一份权重
+        mmap_weights_path = resolve_mmap_weights(checkpoint_path, mmap_weights_path) if mmap_weights else None
+        if mmap_weights_path is not None and not use_tensorrt:
+            net = build_mmap_net(PoseEstimationWithMobileNet, mmap_weights_path)
+            net = net.to(self.device)
+            net.eval()
+            self.net = net
+            return
+
         net = PoseEstimationWithMobileNet()
         checkpoint = torch.load(checkpoint_path, map_location='cpu')
         if use_tensorrt:
@@ -31,16 +66,69 @@ class InferenceEnginePyTorch:
         self.net = net
 
     def infer(self, img):
-        normalized_img = InferenceEnginePyTorch._normalize(img, self.img_mean, self.img_scale)
-        data = torch.from_numpy(normalized_img).permute(2, 0, 1).unsqueeze(0).to(self.device)
+        with timed('normalize'):
+            data = self._prepare([img])
+
+        features, heatmaps, pafs = self._forward(data)
+
+        return self._to_numpy(features[0]), self._to_numpy(heatmaps[0]), self._to_numpy(pafs[0])
 
-        features, heatmaps, pafs = self.net(data)
+    def infer_batch(self, imgs):
+        """对尺寸相同的多帧一次前向推理，返回与 infer 相同格式的结果列表"""
+        with timed('normalize'):
+            data = self._prepare(imgs)
 
-        return (features[-1].squeeze().data.cpu().numpy(),
-                heatmaps[-1].squeeze().data.cpu().numpy(), pafs[-1].squeeze().data.cpu().numpy())
+        features, heatmaps, pafs = self._forward(data)
+        features = self._to_numpy(features)
+        heatmaps = self._to_numpy(heatmaps)
+        pafs = self._to_numpy(pafs)
+
+        return [(features[i], heatmaps[i], pafs[i]) for i in range(len(imgs))]
+
+    def _prepare(self, imgs):
+        """把 uint8 HWC 图像就地写入复用的 NCHW 输入张量并归一化：copy_ 在写入时完成类型转换与维度重排，
+        减均值、乘缩放也在同一块内存上进行，不再产生 astype/减法/乘法/permute 的临时数组
+        """
+        height, width = imgs[0].shape[:2]
+        data = self._input_buffer((len(imgs), 3, height, width))
+        for slot, img in zip(data, imgs):
+            if min(img.strides) < 0:
+                img = np.ascontiguousarray(img)
+            slot.copy_(torch.from_numpy(img).permute(2, 0, 1))
+        mean, scale = self._buffers.constants
+        return data.sub_(mean).mul_(scale)
+
+    def _input_buffer(self, shape, max_shapes=4):
+        buffers = getattr(self._buffers, 'inputs', None)
+        if buffers is None:
+            buffers = self._buffers.inputs = collections.OrderedDict()
+            self._buffers.constants = (
+                torch.as_tensor(self.img_mean, dtype=torch.float32).view(1, 3, 1, 1).to(self.device),
+                float(self.img_scale))
+        data = buffers.get(shape)
+        if data is None:
+            # 分桶后输入形状只有少数几种（整帧、ROI 裁剪、不同批量），超出时淘汰最久未用的
+            if len(buffers) >= max_shapes:
+                buffers.popitem(last=False)
+            data = buffers[shape] = torch.empty(shape, dtype=torch.float32, device=self.device)
+        else:
+            buffers.move_to_end(shape)
+        return data
+
+    @staticmethod
+    def _to_numpy(output):
+        # CPU 上的 float32 输出直接共享内存，只有 GPU 输出需要拷回主机
+        return output.numpy() if output.device.type == 'cpu' else output.cpu().numpy()
+
+    def _forward(self, data):
+        autocast = contextlib.nullcontext()
+        if self.precision == 'bf16':
+            autocast = torch.autocast(device_type=torch.device(self.device).type, dtype=torch.bfloat16)
+        with torch.no_grad(), autocast:
+            outputs = self.net(data)
+        return tuple(output.float() for output in outputs)
 
     @staticmethod
     def _normalize(img, img_mean, img_scale):
         normalized_img = (img.astype(np.float32) - img_mean) * img_scale
         return normalized_img
-
@@ -31,7 +31,12 @@ def extract_keypoints(heatmap, all_keypoints, total_keypoint_num):
     heatmap_peaks = heatmap_peaks[1:heatmap_center.shape[0]-1, 1:heatmap_center.shape[1]-1]
     keypoints = list(zip(np.nonzero(heatmap_peaks)[1], np.nonzero(heatmap_peaks)[0]))  # (w, h)
     keypoints = sorted(keypoints, key=itemgetter(0))
+    keypoints = [(x, y, heatmap[y, x]) for x, y in keypoints]
+    return extract_keypoints_from_peaks(keypoints, all_keypoints, total_keypoint_num)
 
+
+def extract_keypoints_from_peaks(keypoints, all_keypoints, total_keypoint_num):
+    """keypoints 为按 x 排序的峰值 (x, y, score)，抑制距离过近的峰值后追加到 all_keypoints"""
     suppressed = np.zeros(len(keypoints), np.uint8)
     keypoints_with_score_and_id = []
     keypoint_num = 0
@@ -42,7 +47,7 @@ def extract_keypoints(heatmap, all_keypoints, total_keypoint_num):
             if math.sqrt((keypoints[i][0] - keypoints[j][0]) ** 2 +
                          (keypoints[i][1] - keypoints[j][1]) ** 2) < 6:
                 suppressed[j] = 1
-        keypoint_with_score_and_id = (keypoints[i][0], keypoints[i][1], heatmap[keypoints[i][1], keypoints[i][0]],
+        keypoint_with_score_and_id = (keypoints[i][0], keypoints[i][1], keypoints[i][2],
                                       total_keypoint_num + keypoint_num)
         keypoints_with_score_and_id.append(keypoint_with_score_and_id)
         keypoint_num += 1
@@ -0,0 +1,299 @@
+"""实时分析会话：从 RTSP/HTTP 视频流或摄像头持续取帧并分析。
+
+取帧线程只保留最新的一帧（latest-frame-wins），分析线程每次取最新帧，分析跟不上时中间帧直接丢弃；
+取到的帧如果已经超过延迟预算（例如分析线程刚被阻塞过）也丢弃，等待下一帧，
+因此推送出去的结果从采集到发布的延迟不会因为排队而累积。
+
+视频流地址由服务端主动连接，为避免被用来访问内网服务（SSRF），只接受允许的协议；
+地址不在主机白名单中时，主机名解析出的所有地址都必须是公网地址。
+"""
+
+import collections
+import ipaddress
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+REMOTE_STREAM_SCHEMES = ('rtsp', 'rtmp', 'http', 'https')
+REMOTE_STREAM_PREFIXES = tuple(f"{scheme}://" for scheme in REMOTE_STREAM_SCHEMES)
+DEFAULT_STREAM_FPS = 25.0
+
+
+def host_in_allowlist(host, addresses, allowed_hosts):
+    """allowed_hosts 中的条目可以是主机名（不区分大小写）、IP 地址或网段（如 192.168.1.0/24）"""
+    for entry in allowed_hosts:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            if host.lower() == entry.lower():
+                return True
+            continue
+        if addresses and all(address in network for address in addresses):
+            return True
+    return False
+
+
+def resolve_stream_host(host, port):
+    """解析主机名的所有地址，解析失败返回空列表"""
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError):
+        return []
+    addresses = []
+    for info in infos:
+        # 去掉 IPv6 地址的 zone（如 fe80::1%eth0），IPv4 映射地址按 IPv4 判断
+        address = ipaddress.ip_address(info[4][0].split('%', 1)[0])
+        addresses.append(getattr(address, 'ipv4_mapped', None) or address)
+    return addresses
+
+
+def is_stream_url_allowed(url, allowed_hosts=(), allowed_schemes=REMOTE_STREAM_SCHEMES):
+    """协议须在 allowed_schemes 中；配置了 allowed_hosts 时主机必须在白名单内，
+    否则主机解析出的地址不能是内网、回环、链路本地、保留或组播地址
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return False
+    if parts.scheme.lower() not in allowed_schemes or not parts.hostname:
+        return False
+    addresses = resolve_stream_host(parts.hostname, port)
+    if allowed_hosts:
+        return host_in_allowlist(parts.hostname, addresses, allowed_hosts)
+    return bool(addresses) and all(address.is_global and not address.is_multicast for address in addresses)
+
+
+def normalize_stream_source(source, allowed_root=None, allowed_hosts=(), allowed_schemes=REMOTE_STREAM_SCHEMES):
+    """摄像头序号返回 int，通过 is_stream_url_allowed 检查的视频流地址原样返回；
+    allowed_root 下已存在的视频文件按原帧率回放（用于演示与测试）。其他输入返回 None
+    """
+    source = str(source).strip().strip('"').strip("'")
+    if not source:
+        return None
+    if source.isdigit():
+        return int(source)
+    if source.lower().startswith(REMOTE_STREAM_PREFIXES):
+        return source if is_stream_url_allowed(source, allowed_hosts, allowed_schemes) else None
+    if allowed_root is not None:
+        path = Path(source)
+        path = (path if path.is_absolute() else Path(allowed_root) / path).resolve()
+        if path.is_file() and path.is_relative_to(Path(allowed_root).resolve()):
+            return str(path)
+    return None
+
+
+def mask_source(source):
+    """隐藏视频流地址中的用户名与密码，用于日志与接口返回"""
+    source = str(source)
+    scheme, sep, rest = source.partition('://')
+    if sep and '@' in rest.split('/', 1)[0]:
+        return f"{scheme}://***@{rest.split('@', 1)[1]}"
+    return source
+
+
+class LatestFrameGrabber:
+    """后台线程持续读取视频源，只保留最新一帧"""
+
+    def __init__(self, source, reconnect_attempts=5):
+        self.source = source
+        self.is_file = isinstance(source, str) and not source.lower().startswith(REMOTE_STREAM_PREFIXES)
+        self.reconnect_attempts = reconnect_attempts
+        self.condition = threading.Condition()
+        self.frame = None
+        self.captured_at = 0.0
+        self.seq = 0  # 已读取的帧数
+        self.fps = 0.0
+        self.running = False
+        self.error = None
+        self.thread = None
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        # 解码器内部只缓存一帧，避免读到的是几秒之前的画面
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if isinstance(self.source, int):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+        return cap
+
+    def start(self):
+        cap = self._open()
+        if cap is None:
+            raise IOError(f"Video source unavailable: {self.source}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        # 部分 RTSP 源报告 0 或时间基（如 90000），这时按默认帧率换算
+        self.fps = fps if 0 < fps <= 240 else DEFAULT_STREAM_FPS
+        self.running = True
+        self.thread = threading.Thread(target=self._run, args=(cap,), daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self, cap):
+        failures = 0
+        # 本地文件没有实时节奏，按原帧率回放以模拟视频流
+        interval = 1.0 / self.fps if self.is_file else 0.0
+        next_due = time.perf_counter()
+        try:
+            while self.running:
+                ok, frame = cap.read() if cap is not None else (False, None)
+                if not ok:
+                    if cap is not None:
+                        cap.release()
+                    cap = None
+                    failures += 1
+                    if self.is_file or failures > self.reconnect_attempts:
+                        self.error = None if self.is_file else '视频流中断，重连失败'
+                        break
+                    time.sleep(min(2.0 ** failures * 0.25, 5.0))
+                    cap = self._open()
+                    continue
+                failures = 0
+                if interval:
+                    next_due += interval
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                with self.condition:
+                    self.frame = frame
+                    self.captured_at = time.time()
+                    self.seq += 1
+                    self.condition.notify_all()
+        finally:
+            if cap is not None:
+                cap.release()
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+
+    def latest(self, after_seq, timeout=None):
+        """等待序号大于 after_seq 的帧，返回 (frame, seq, captured_at)；视频源结束时返回 None"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > after_seq or not self.running, timeout)
+            if self.seq <= after_seq:
+                return None
+            return self.frame, self.seq, self.captured_at
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+
+class LiveSession:
+    """一个实时分析会话。analyze(frame, frame_idx, context) 返回要推送的结果字典；
+    每次有新结果时调用 publish(session_id)。context 有 fps 属性时，视频源打开后设为视频源的实际帧率
+    """
+
+    def __init__(self, source, analyze, publish, max_latency_ms=500, context=None):
+        self.session_id = str(uuid.uuid4())
+        self.source = source
+        self.analyze = analyze
+        self.publish = publish
+        self.max_latency = max_latency_ms / 1000.0
+        self.context = context
+        self.state = 'connecting'
+        self.error = None
+        self.started_at = time.time()
+        self.grabber = LatestFrameGrabber(source)
+        self.result = None  # 最近一次的分析结果
+        self.result_seq = 0
+        self.analyzed = 0
+        self.skipped = 0  # 分析跟不上时被新帧覆盖的帧
+        self.stale = 0  # 取到时已超出延迟预算而丢弃的帧
+        self.late = 0  # 单帧分析本身就超出预算的结果（仍然推送，说明需要更快的后端或 ROI 推理）
+        self.latencies = collections.deque(maxlen=300)  # 最近的端到端延迟（秒）
+        self.thread = None
+
+    def start(self, session_scope=None):
+        """session_scope 为可选的上下文管理器工厂，在分析线程中包住整个分析循环（例如登记批量推理客户端）"""
+        self.thread = threading.Thread(target=self._run, args=(session_scope,), daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self, session_scope):
+        try:
+            self.grabber.start()
+            if hasattr(self.context, 'fps'):
+                self.context.fps = self.grabber.fps
+            self.state = 'running'
+            self.publish(self.session_id)
+            if session_scope is None:
+                self._loop()
+            else:
+                with session_scope():
+                    self._loop()
+            if self.state == 'running':
+                self.state = 'finished' if self.grabber.error is None else 'failed'
+                self.error = self.grabber.error
+        except Exception as exc:
+            self.state = 'failed'
+            self.error = str(exc)
+        finally:
+            self.grabber.stop()
+            self.publish(self.session_id)
+
+    def _loop(self):
+        last_seq = 0
+        while self.state == 'running':
+            latest = self.grabber.latest(last_seq, timeout=1.0)
+            if latest is None:
+                if not self.grabber.running:
+                    return
+                continue
+            frame, seq, captured_at = latest
+            self.skipped += seq - last_seq - 1
+            last_seq = seq
+            if time.time() - captured_at > self.max_latency:
+                self.stale += 1
+                continue
+            result = self.analyze(frame, seq - 1, self.context)
+            published_at = time.time()
+            latency = published_at - captured_at
+            self.latencies.append(latency)
+            self.analyzed += 1
+            self.late += latency > self.max_latency
+            self.result = {**result, 'seq': seq, 'captured_at': captured_at,
+                           'latency_ms': round(latency * 1000, 1)}
+            self.result_seq = seq
+            self.publish(self.session_id)
+
+    def stop(self):
+        if self.state in ('connecting', 'running'):
+            self.state = 'stopped'
+        self.grabber.stop()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+
+    @property
+    def active(self):
+        return self.state in ('connecting', 'running')
+
+    def stats(self):
+        latencies = np.asarray(self.latencies) * 1000
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        return {
+            'session_id': self.session_id,
+            'source': mask_source(self.source),
+            'state': self.state,
+            'error': self.error,
+            'source_fps': round(self.grabber.fps, 2),
+            'captured_frames': self.grabber.seq,
+            'analyzed_frames': self.analyzed,
+            'analysis_fps': round(self.analyzed / elapsed, 2),
+            'skipped_frames': self.skipped,
+            'stale_frames': self.stale,
+            'late_results': self.late,
+            'max_latency_ms': round(self.max_latency * 1000),
+            'latency_p50_ms': round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+            'latency_p95_ms': round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+        }
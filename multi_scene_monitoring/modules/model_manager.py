@@ -0,0 +1,86 @@
+"""模型生命周期管理：后台加载、按预期输入尺寸预热，并对外报告是否已就绪"""
+
+import threading
+import time
+
+
+class ModelManager:
+    """loader() 返回推理引擎，缺少模型文件时返回 None（有意的模拟模式）；warmup(engine) 执行预热推理。
+
+    get() 在首次调用时触发加载并等待其完成，导入模块本身不会加载模型。
+    loader 或预热抛出异常时状态为 failed，不算就绪：模型文件损坏等问题不应被负载均衡当作可用节点。
+    """
+
+    def __init__(self, loader, warmup=None):
+        self.loader = loader
+        self.warmup = warmup
+        self.engine = None
+        self.state = 'idle'  # idle -> loading -> warming -> ready / simulation / failed
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """在后台线程中开始加载，重复调用无副作用"""
+        with self.lock:
+            if self.state != 'idle':
+                return self
+            self.state = 'loading'
+        self.thread = threading.Thread(target=self._load, name='model-loader', daemon=True)
+        self.thread.start()
+        return self
+
+    def get(self, timeout=None):
+        """返回已预热的引擎；模拟模式或加载失败时返回 None"""
+        self.start()
+        self.done.wait(timeout)
+        return self.engine
+
+    @property
+    def ready(self):
+        return self.state in ('ready', 'simulation')
+
+    @property
+    def finished(self):
+        """加载已结束（无论成功与否）"""
+        return self.done.is_set()
+
+    @property
+    def simulated(self):
+        """加载已结束但没有可用引擎（模型文件缺失，或加载、预热失败），任务的姿态由模拟数据生成"""
+        return self.done.is_set() and self.engine is None
+
+    def status(self):
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'simulated': self.simulated,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'error': self.error,
+        }
+
+    def _load(self):
+        try:
+            start = time.perf_counter()
+            engine = self.loader()
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            if engine is None:
+                self.state = 'simulation'
+                return
+            if self.warmup is not None:
+                self.state = 'warming'
+                start = time.perf_counter()
+                self.warmup(engine)
+                self.warmup_seconds = round(time.perf_counter() - start, 3)
+            self.engine = engine
+            self.state = 'ready'
+        except Exception as exc:
+            print(f"[WARN] 模型加载失败，任务以模拟模式处理，就绪检查返回 503: {exc}")
+            self.error = str(exc)
+            self.state = 'failed'
+        finally:
+            self.done.set()
@@ -0,0 +1,71 @@
+"""静止帧门控：用降采样灰度帧差能量判断画面是否变化，决定是否需要重新推理"""
+
+import os
+
+import cv2
+
+# 各训练类型的默认帧差能量阈值（像素平均绝对差 / 255），低于阈值视为静止
+# 运球动作幅度小、节奏快，阈值最低；防守多为大幅横移，阈值可以放宽
+DEFAULT_MOTION_THRESHOLDS = {
+    'dribbling': 0.004,
+    'shooting': 0.006,
+    'defense': 0.008,
+}
+FALLBACK_MOTION_THRESHOLD = 0.006
+
+
+def resolve_motion_threshold(training_type):
+    """读取训练类型对应的门控阈值，可用环境变量 MOTION_GATE_<TYPE> 覆盖"""
+    default = DEFAULT_MOTION_THRESHOLDS.get(training_type, FALLBACK_MOTION_THRESHOLD)
+    value = os.getenv(f'MOTION_GATE_{str(training_type).upper()}')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        print(f"[MotionGate] Invalid threshold '{value}' for {training_type}, using {default}")
+        return default
+
+
+class MotionGate:
+    """静止帧门控：与最近一次推理的画面相比帧差能量低于 threshold 时复用姿态。
+
+    max_reuse_frames 按源视频帧数计：距最近一次推理超过这么多帧后，即使画面静止也强制推理一次。
+    只对关键帧调用（帧间隔 k > 1）时传入帧号，刷新间隔仍是 max_reuse_frames 帧，而不是 k 倍。
+    """
+
+    def __init__(self, threshold, max_reuse_frames=30, width=64):
+        self.threshold = threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.width = width
+        self.reference = None  # 最近一次推理帧的缩略灰度图
+        self.reference_frame = 0  # 该帧在源视频中的帧号
+        self.next_frame = 0  # 未传入帧号时按逐帧调用计数
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height = max(1, int(round(gray.shape[0] * self.width / gray.shape[1])))
+        return cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA)
+
+    def should_infer(self, frame, frame_idx=None):
+        """返回 True 表示画面有变化需要推理；距上次推理超过 max_reuse_frames 帧时强制刷新一次。
+
+        frame_idx 为当前帧在源视频中的帧号，省略时视为逐帧调用。
+        """
+        if frame_idx is None:
+            frame_idx = self.next_frame
+        self.next_frame = frame_idx + 1
+        thumbnail = self._thumbnail(frame)
+        if self.reference is None or self.reference.shape != thumbnail.shape \
+                or frame_idx - self.reference_frame > self.max_reuse_frames:
+            self.reference = thumbnail
+            self.reference_frame = frame_idx
+            return True
+
+        energy = float(cv2.absdiff(thumbnail, self.reference).mean()) / 255.0
+        if energy < self.threshold:
+            return False
+
+        self.reference = thumbnail
+        self.reference_frame = frame_idx
+        return True
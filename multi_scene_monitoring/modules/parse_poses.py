@@ -1,12 +1,20 @@
+import os
+
 import numpy as np
 
-from modules.pose import Pose, propagate_ids
+from modules.pose import Pose
+from modules.stage_timer import timed
 try:
     from pose_extractor import extract_poses
 except:
     print('#### Cannot load fast pose extraction, switched to legacy slow implementation. ####')
     from modules.legacy_pose_extractor import extract_poses
 
+# sparse：在低分辨率热图上选候选峰值，只在候选点附近放大、只在用到的位置插值 PAF，不再整体放大热图与 PAF
+POSE_POSTPROCESS = os.environ.get('POSE_POSTPROCESS', 'full').strip().lower()
+if POSE_POSTPROCESS == 'sparse':
+    from modules.sparse_pose_extractor import extract_poses
+
 AVG_PERSON_HEIGHT = 180
 
 # pelvis (body center) is missing, id == 2
@@ -24,7 +32,8 @@ def get_root_relative_poses(inference_results):
     features, heatmap, paf_map = inference_results
 
     upsample_ratio = 4
-    found_poses = extract_poses(heatmap[0:-1], paf_map, upsample_ratio)[0]
+    with timed('extract'):
+        found_poses = extract_poses(heatmap[0:-1], paf_map, upsample_ratio)[0]
     # scale coordinates to features space
     found_poses[:, 0:-1:3] /= upsample_ratio
     found_poses[:, 1:-1:3] /= upsample_ratio
@@ -74,12 +83,38 @@ def get_root_relative_poses(inference_results):
     return poses_3d, np.array(poses_2d), features.shape
 
 
-previous_poses_2d = []
-
-
-def parse_poses(inference_results, input_scale, stride, fx, is_video=False):
-    global previous_poses_2d
+def mask_padding(inference_results, padding, stride):
+    """把热图与 PAF 中完全落在补齐区域内的列置零，避免在补齐区域检测出关键点"""
+    features, heatmaps, pafs = inference_results
+    first = padding[0] // stride
+    last = heatmaps.shape[2] - padding[1] // stride
+    heatmaps = heatmaps.copy()
+    pafs = pafs.copy()
+    heatmaps[:, :, :first] = 0
+    heatmaps[:, :, last:] = 0
+    pafs[:, :, :first] = 0
+    pafs[:, :, last:] = 0
+    return features, heatmaps, pafs
+
+
+def parse_poses(inference_results, input_scale, stride, fx, pose_tracker=None, offset=None, principal_point=None,
+                padding=None):
+    """pose_tracker: 视频的跟踪状态（PoseTracker），传入时跨帧沿用姿态 ID 并平滑 3D 平移，单张图片传 None；
+    offset: 网络输入在原始画面中的左上角坐标（裁剪推理时使用），2D 结果会平移回原画面坐标；
+    principal_point: 原始画面中的主点坐标，默认取网络输入有效区域的中心；
+    padding: 网络输入左右补齐的像素数 (left, right)（尺寸分桶时使用），补齐区域不参与检测。
+    """
+    pad_left, pad_right = padding if padding is not None else (0, 0)
+    if padding is not None:
+        inference_results = mask_padding(inference_results, padding, stride)
     poses_3d, poses_2d, features_shape = get_root_relative_poses(inference_results)
+    offset_x, offset_y = offset if offset is not None else (0, 0)
+    if principal_point is not None:
+        center_x = ((principal_point[0] - offset_x) * input_scale + pad_left) / stride
+        center_y = (principal_point[1] - offset_y) * input_scale / stride
+    else:
+        center_x = (pad_left + (features_shape[2] * stride - pad_left - pad_right) / 2) / stride
+        center_y = features_shape[1] / 2
     # print (1,poses_3d.shape, poses_2d.shape)
     poses_2d_scaled = []
     # print (2,len(poses_2d_scaled))
@@ -89,14 +124,14 @@ def parse_poses(inference_results, input_scale, stride, fx, is_video=False):
         pose_2d_scaled = np.ones(pose_2d.shape[0], dtype=np.float32) * -1  # +1 for pose confidence
         for kpt_id in range(num_kpt):
             if pose_2d[kpt_id * 3 + 2] != -1:
-                pose_2d_scaled[kpt_id * 3] = int(pose_2d[kpt_id * 3] * stride / input_scale)
-                pose_2d_scaled[kpt_id * 3 + 1] = int(pose_2d[kpt_id * 3 + 1] * stride / input_scale)
+                pose_2d_scaled[kpt_id * 3] = int((pose_2d[kpt_id * 3] * stride - pad_left) / input_scale) + offset_x
+                pose_2d_scaled[kpt_id * 3 + 1] = int(pose_2d[kpt_id * 3 + 1] * stride / input_scale) + offset_y
                 pose_2d_scaled[kpt_id * 3 + 2] = pose_2d[kpt_id * 3 + 2]
         pose_2d_scaled[-1] = pose_2d[-1]
         poses_2d_scaled.append(pose_2d_scaled)
     # print(poses_2d_scaled)
 
-    if is_video:  # track poses ids
+    if pose_tracker is not None:  # track poses ids
         # print('is video')
         current_poses_2d = []
         for pose_id in range(len(poses_2d_scaled)):
@@ -107,8 +142,7 @@ def parse_poses(inference_results, input_scale, stride, fx, is_video=False):
                     pose_keypoints[kpt_id, 1] = int(poses_2d_scaled[pose_id][kpt_id * 3 + 1])
             pose = Pose(pose_keypoints, poses_2d_scaled[pose_id][-1])
             current_poses_2d.append(pose)
-        propagate_ids(previous_poses_2d, current_poses_2d)
-        previous_poses_2d = current_poses_2d
+        pose_tracker.update(current_poses_2d)
 
     translated_poses_3d = []
     # translate poses
@@ -127,8 +161,8 @@ def parse_poses(inference_results, input_scale, stride, fx, is_video=False):
             pose_2d_valid[:, valid_id] = pose_2d[0:2, kpt_id]
             valid_id += 1
 
-        pose_2d_valid[0] = pose_2d_valid[0] - features_shape[2]/2
-        pose_2d_valid[1] = pose_2d_valid[1] - features_shape[1]/2
+        pose_2d_valid[0] = pose_2d_valid[0] - center_x
+        pose_2d_valid[1] = pose_2d_valid[1] - center_y
         mean_3d = np.expand_dims(pose_3d_valid.mean(axis=1), axis=1)
         mean_2d = np.expand_dims(pose_2d_valid.mean(axis=1), axis=1)
         numerator = np.trace(np.dot((pose_3d_valid[:2, :] - mean_3d[:2, :]).transpose(),
@@ -140,7 +174,7 @@ def parse_poses(inference_results, input_scale, stride, fx, is_video=False):
         mean_3d = np.array([mean_3d[0, 0], mean_3d[1, 0], 0])
         translation = numerator / denominator * mean_2d - mean_3d
 
-        if is_video:
+        if pose_tracker is not None:
             translation = current_poses_2d[pose_id].filter(translation)
         for kpt_id in range(19):
             pose_3d[0, kpt_id] = pose_3d[0, kpt_id] + translation[0]
@@ -0,0 +1,63 @@
+"""处理中的逐帧结果：每输出一帧就把指标追加为一行 JSON，处理未完成时 /api/result 与 /api/pose-sequence
+按 since_frame 游标返回已处理的帧。与检查点共用同一个 JSONL 文件，检查点只需记录行数。
+"""
+
+import json
+import threading
+from pathlib import Path
+
+
+class PartialResults:
+    def __init__(self, folder, task_id):
+        self.path = Path(folder) / f"{task_id}_metrics.partial.jsonl"
+        self.lock = threading.Lock()
+        self.offsets = []  # 第 i 帧所在行的起始字节
+        self.end = 0
+        # 从检查点恢复时文件中已有前面各帧，补建偏移后继续追加
+        if self.path.exists():
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    self.offsets.append(self.end)
+                    self.end += len(line)
+        self.file = open(self.path, 'ab')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, frame_metrics):
+        line = (json.dumps(frame_metrics, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            self.file.write(line)
+            self.offsets.append(self.end)
+            self.end += len(line)
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def read(self, since_frame=0, limit=None):
+        """返回 (第 since_frame 帧起最多 limit 帧的指标, 下一次请求的游标)；已关闭时返回 None"""
+        with self.lock:
+            if self.file is None:
+                return None
+            # 写入缓冲在读取时才刷新，处理线程不必逐帧刷新
+            self.file.flush()
+            count = len(self.offsets)
+            start = min(max(since_frame, 0), count)
+            stop = count if limit is None else min(count, start + limit)
+            begin = self.offsets[start] if start < count else self.end
+            finish = self.offsets[stop] if stop < count else self.end
+            with open(self.path, 'rb') as f:
+                f.seek(begin)
+                data = f.read(finish - begin)
+        frames = [json.loads(line) for line in data.decode('utf-8').splitlines() if line]
+        return frames, stop
+
+    def close(self, remove=False):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if remove:
+                self.path.unlink(missing_ok=True)
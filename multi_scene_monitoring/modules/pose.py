@@ -34,9 +34,12 @@ class Pose:
                                    OneEuroFilter(freq=80, beta=0.01),
                                    OneEuroFilter(freq=80, beta=0.01)]
 
-    def update_id(self, id=None):
+    def update_id(self, id=None, tracker=None):
         self.id = id
         if self.id is None:
+            if tracker is not None:
+                self.id = tracker.next_id()
+                return
             self.id = Pose.last_id + 1
             Pose.last_id += 1
 
@@ -59,13 +62,14 @@ def get_similarity(a, b, threshold=0.5):
     return num_similar_kpt
 
 
-def propagate_ids(previous_poses, current_poses, threshold=3):
+def propagate_ids(previous_poses, current_poses, threshold=3, tracker=None):
     """Propagate poses ids from previous frame results. Id is propagated,
     if there are at least `threshold` similar keypoints between pose from previous frame and current.
 
     :param previous_poses: poses from previous frame with ids
     :param current_poses: poses from current frame to assign ids
     :param threshold: minimal number of similar keypoints between poses
+    :param tracker: PoseTracker that allocates new ids (class-level counter if None)
     :return: None
     """
     current_poses_sorted_ids = list(range(len(current_poses)))
@@ -88,6 +92,33 @@ def propagate_ids(previous_poses, current_poses, threshold=3):
             mask[best_matched_id] = 0
         else:  # pose not similar to any previous
             best_matched_pose_id = None
-        current_poses[current_pose_id].update_id(best_matched_pose_id)
+        current_poses[current_pose_id].update_id(best_matched_pose_id, tracker)
         if best_matched_pose_id is not None:
             current_poses[current_pose_id].translation_filter = previous_poses[best_matched_id].translation_filter
+
+
+class PoseTracker:
+    """一路视频的跟踪状态：上一帧的姿态（携带 ID 与平移平滑滤波器）和已分配的最大 ID。
+
+    每个处理任务、实时会话与命令行跟踪器各持有一个，并发处理时互不影响；随任务状态一起写入检查点。
+    """
+
+    def __init__(self):
+        self.previous_poses = []
+        self.last_id = -1
+
+    def next_id(self):
+        self.last_id += 1
+        return self.last_id
+
+    def update(self, current_poses):
+        """当前帧的姿态沿用上一帧匹配到的 ID 与滤波器，新出现的人分配新 ID"""
+        propagate_ids(self.previous_poses, current_poses, tracker=self)
+        self.previous_poses = current_poses
+
+    def snapshot(self):
+        return list(self.previous_poses), self.last_id
+
+    def restore(self, snapshot):
+        previous_poses, self.last_id = snapshot
+        self.previous_poses = list(previous_poses)
@@ -0,0 +1,82 @@
+"""原始姿态缓存：按帧保存网络输出的 2D/3D 姿态（指标计算之前），换训练类型或调整指标时无需重新推理"""
+
+import numpy as np
+
+POSE_SOURCES = ('inferred', 'interpolated', 'reused')
+POSE_2D_SIZE = 19 * 3 + 1
+POSE_3D_SIZE = 19 * 4
+
+
+class PoseCacheWriter:
+    """逐帧累积姿态，所有人的姿态拼接成一张大表，另存每帧的人数"""
+
+    def __init__(self):
+        self.frames = []
+        self.people_counts = []
+        self.sources = []
+        self.poses_2d = []
+        self.poses_3d = []
+
+    def __len__(self):
+        return len(self.frames)
+
+    def append(self, frame_idx, poses_3d, poses_2d, pose_source='inferred'):
+        count = len(poses_2d)
+        self.frames.append(frame_idx)
+        self.people_counts.append(count)
+        self.sources.append(POSE_SOURCES.index(pose_source))
+        self.poses_2d.append(np.asarray(poses_2d, dtype=np.float32).reshape(count, POSE_2D_SIZE))
+        self.poses_3d.append(np.asarray(poses_3d, dtype=np.float32).reshape(count, POSE_3D_SIZE))
+
+    def slice(self, start, stop=None):
+        """返回第 start 到 stop 帧组成的新缓存（共享各帧的姿态数组）"""
+        part = PoseCacheWriter()
+        part.frames = self.frames[start:stop]
+        part.people_counts = self.people_counts[start:stop]
+        part.sources = self.sources[start:stop]
+        part.poses_2d = self.poses_2d[start:stop]
+        part.poses_3d = self.poses_3d[start:stop]
+        return part
+
+    def extend(self, other):
+        """按顺序拼接另一个分段的姿态缓存"""
+        self.frames.extend(other.frames)
+        self.people_counts.extend(other.people_counts)
+        self.sources.extend(other.sources)
+        self.poses_2d.extend(other.poses_2d)
+        self.poses_3d.extend(other.poses_3d)
+
+    def reorder_people(self, position, order):
+        """按 order 重新排列第 position 帧中的人"""
+        self.poses_2d[position] = self.poses_2d[position][order]
+        self.poses_3d[position] = self.poses_3d[position][order]
+
+    def save(self, path, fps, R, t):
+        poses_2d = np.concatenate([np.zeros((0, POSE_2D_SIZE), np.float32)] + self.poses_2d)
+        poses_3d = np.concatenate([np.zeros((0, POSE_3D_SIZE), np.float32)] + self.poses_3d)
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                frames=np.asarray(self.frames, dtype=np.int32),
+                people_counts=np.asarray(self.people_counts, dtype=np.int16),
+                sources=np.asarray(self.sources, dtype=np.uint8),
+                poses_2d=poses_2d,
+                poses_3d=poses_3d,
+                fps=np.float32(fps),
+                R=np.asarray(R, dtype=np.float32),
+                t=np.asarray(t, dtype=np.float32),
+            )
+
+
+def load_pose_cache(path):
+    """读取姿态缓存，返回 (fps, R, t, [(frame_idx, poses_3d, poses_2d, pose_source), ...])"""
+    with np.load(path) as data:
+        offsets = np.concatenate([[0], np.cumsum(data['people_counts'], dtype=np.int64)])
+        poses_2d = data['poses_2d']
+        poses_3d = data['poses_3d']
+        frames = []
+        for i, frame_idx in enumerate(data['frames']):
+            start, end = offsets[i], offsets[i + 1]
+            frames.append((int(frame_idx), poses_3d[start:end], poses_2d[start:end],
+                           POSE_SOURCES[int(data['sources'][i])]))
+        return float(data['fps']), data['R'], data['t'], frames
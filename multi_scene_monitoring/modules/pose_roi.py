@@ -0,0 +1,109 @@
+"""人体区域（ROI）裁剪推理：检测到人之后只对其周围的裁剪区域推理，提高远景小目标的有效分辨率"""
+
+import cv2
+import numpy as np
+
+from modules.parse_poses import parse_poses
+from modules.shape_buckets import pad_to_bucket
+from modules.stage_timer import timed
+
+
+class PersonRoiTracker:
+    def __init__(self, padding=0.35, min_aspect=0.75, max_area_ratio=0.6, refresh_interval=30):
+        self.padding = padding  # 包围盒四周额外保留的边距（相对包围盒尺寸）
+        self.min_aspect = min_aspect  # 裁剪区域最小宽高比，保证网络看到足够的上下文
+        self.max_area_ratio = max_area_ratio  # 裁剪区域占整帧比例过大时直接整帧推理
+        self.refresh_interval = refresh_interval  # 每隔若干次推理强制整帧推理一次，发现新入画的人
+        self.bbox = None
+        self.roi_inferences = 0
+
+    def reset(self):
+        self.bbox = None
+        self.roi_inferences = 0
+
+    def select(self, frame_shape):
+        """返回下一次推理使用的裁剪区域 (x0, y0, x1, y1)，None 表示整帧推理"""
+        if self.bbox is None or self.roi_inferences >= self.refresh_interval:
+            return None
+        frame_h, frame_w = frame_shape[:2]
+        x0, y0, x1, y1 = self.bbox
+        box_w, box_h = x1 - x0, y1 - y0
+        box_w += 2 * self.padding * box_w
+        box_h += 2 * self.padding * box_h
+        box_w = max(box_w, box_h * self.min_aspect)
+        center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+
+        roi_x0 = int(max(0, center_x - box_w / 2))
+        roi_y0 = int(max(0, center_y - box_h / 2))
+        roi_x1 = int(min(frame_w, center_x + box_w / 2))
+        roi_y1 = int(min(frame_h, center_y + box_h / 2))
+        if roi_x1 - roi_x0 < 16 or roi_y1 - roi_y0 < 16:
+            return None
+        if (roi_x1 - roi_x0) * (roi_y1 - roi_y0) >= self.max_area_ratio * frame_w * frame_h:
+            return None
+        return roi_x0, roi_y0, roi_x1, roi_y1
+
+    def update(self, poses_2d, used_roi):
+        """用本次推理得到的 2D 姿态（整帧坐标）更新跟踪包围盒，未检测到人即视为跟丢"""
+        points = []
+        for pose_2d in poses_2d:
+            pose = np.asarray(pose_2d[0:-1], dtype=np.float32).reshape((-1, 3))
+            points.append(pose[pose[:, 2] > 0, 0:2])
+        points = np.concatenate(points) if points else np.zeros((0, 2), dtype=np.float32)
+        if len(points) == 0:
+            self.reset()
+            return
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        self.bbox = (float(x0), float(y0), float(x1), float(y1))
+        self.roi_inferences = self.roi_inferences + 1 if used_roi else 0
+
+
+def infer_frame_poses(net, frame, roi=None, base_height=256, stride=8, pose_tracker=None, prescaled=None):
+    """对整帧或其中的裁剪区域执行推理，返回整帧坐标下的 (poses_3d, poses_2d)。
+
+    pose_tracker 为该路视频的跟踪状态，单张图片（预热、校准）传 None；
+    prescaled 为解码器已缩放补齐好的整帧网络输入 (图像, padding)，整帧推理时直接使用。
+    """
+    offset = None
+    principal_point = None
+    img = frame
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        img = frame[y0:y1, x0:x1]
+        offset = (x0, y0)
+        principal_point = (frame.shape[1] / 2, frame.shape[0] / 2)
+
+    input_scale = base_height / img.shape[0]
+    if roi is None and prescaled is not None:
+        scaled_img, padding = prescaled
+    else:
+        with timed('resize'):
+            scaled_img = cv2.resize(img, dsize=None, fx=input_scale, fy=input_scale)
+            # 宽度补齐到固定的分桶宽度（SHAPE_BUCKETS=off 时裁剪到 stride 的整数倍）
+            scaled_img, padding = pad_to_bucket(scaled_img, stride)
+    fx = np.float32(0.8 * frame.shape[1])
+    with timed('infer'):
+        inference_result = net.infer(scaled_img)
+    with timed('parse'):
+        return parse_poses(inference_result, input_scale, stride, fx, pose_tracker=pose_tracker,
+                           offset=offset, principal_point=principal_point, padding=padding)
+
+
+def infer_with_roi(net, frame, tracker, base_height=256, stride=8, pose_tracker=None, prescaled=None):
+    """ROI 模式推理：有跟踪目标时裁剪推理，裁剪区域内跟丢则回退到整帧推理。
+
+    回退时先恢复该路视频 ROI 推理之前的跟踪状态：ROI 推理已把上一帧姿态清空，不恢复的话整帧推理的结果会全部分配新 ID。
+    ROI 结果为空时没有姿态对象被修改，恢复后与只做一次整帧推理完全相同。
+    """
+    roi = tracker.select(frame.shape) if tracker is not None else None
+    tracking_state = pose_tracker.snapshot() if roi is not None and pose_tracker is not None else None
+    poses_3d, poses_2d = infer_frame_poses(net, frame, roi, base_height, stride, pose_tracker, prescaled)
+    if roi is not None and len(poses_2d) == 0:
+        roi = None
+        if tracking_state is not None:
+            pose_tracker.restore(tracking_state)
+        poses_3d, poses_2d = infer_frame_poses(net, frame, None, base_height, stride, pose_tracker, prescaled)
+    if tracker is not None:
+        tracker.update(poses_2d, used_roi=roi is not None)
+    return poses_3d, poses_2d
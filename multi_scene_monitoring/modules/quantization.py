@@ -0,0 +1,39 @@
+"""低精度 CPU 推理：INT8 训练后静态量化（FX 图模式）与 bf16 自动混合精度"""
+
+import copy
+from pathlib import Path
+
+import torch
+
+PRECISIONS = ('fp32', 'bf16', 'int8')
+
+
+def default_int8_model_path(checkpoint_path):
+    """INT8 模型与原始权重放在一起：human-pose-estimation-3d.pth -> human-pose-estimation-3d.int8.pt"""
+    return Path(checkpoint_path).with_suffix('.int8.pt')
+
+
+def quantize_int8(net, calibration_inputs, engine='x86'):
+    """用校准数据统计各层激活范围，把整个网络（主干、CPM、细化阶段与 Pose3D 头）转换为 INT8。
+
+    网络全部由卷积组成，动态量化只覆盖 Linear/RNN 层，因此这里使用静态量化。
+    返回 TorchScript 模型，卷积对输入尺寸无关，可用于任意宽度的输入。
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = engine
+    model = copy.deepcopy(net).cpu().eval()
+    example_input = calibration_inputs[0]
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (example_input,))
+    with torch.no_grad():
+        for data in calibration_inputs:
+            prepared(data)
+        quantized = convert_fx(prepared)
+        return torch.jit.freeze(torch.jit.trace(quantized, example_input).eval())
+
+
+def load_int8_model(path):
+    model = torch.jit.load(str(path), map_location='cpu')
+    model.eval()
+    return model
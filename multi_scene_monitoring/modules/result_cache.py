@@ -0,0 +1,95 @@
+"""上传内容去重：按视频内容哈希 + 训练类型 + 模型版本复用已完成任务的产物，产物只存一份"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def save_stream_with_hash(stream, output_path, chunk_size=HASH_CHUNK_SIZE):
+    """把上传流分块写入磁盘，同时计算 SHA-256，避免写完后再读一遍文件"""
+    digest = hashlib.sha256()
+    with open(output_path, 'wb') as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path, chunk_size=HASH_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash, training_type, model_version, options=None):
+    """缓存键：内容哈希、训练类型、模型版本以及会改变结果的处理参数"""
+    parts = [content_hash, str(training_type), str(model_version)]
+    for name in sorted(options or {}):
+        parts.append(f"{name}={options[name]}")
+    return '|'.join(parts)
+
+
+class ResultCache:
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        self.lock = threading.Lock()
+        self.entries = {}  # 缓存键 -> 源任务产物 {task_id, video_path, output_video, metrics_file}
+        self.aliases = {}  # 命中缓存的任务 ID -> 源任务 ID
+        self._load()
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.entries = index.get('entries', {})
+            self.aliases = index.get('aliases', {})
+        except Exception as exc:
+            print(f"[ResultCache] Failed to load {self.index_path.name}: {exc}")
+
+    def _save(self):
+        temp_path = self.index_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries, 'aliases': self.aliases}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def lookup(self, key):
+        """返回命中的源任务产物；产物文件已被删除时作废该条目"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if all(Path(entry[name]).exists() for name in ('output_video', 'metrics_file')):
+                return dict(entry)
+            del self.entries[key]
+            self._save()
+            return None
+
+    def store(self, key, entry):
+        with self.lock:
+            self.entries[key] = dict(entry)
+            self._save()
+
+    def add_alias(self, task_id, source_task_id):
+        with self.lock:
+            self.aliases[task_id] = source_task_id
+            self._save()
+
+    def aliases_of(self, source_task_ids):
+        """返回引用了这些源任务的任务 ID"""
+        with self.lock:
+            return [task_id for task_id, source in self.aliases.items() if source in source_task_ids]
+
+    def resolve(self, task_id):
+        """把命中缓存的任务 ID 映射回实际持有产物的源任务 ID"""
+        return self.aliases.get(task_id, task_id)
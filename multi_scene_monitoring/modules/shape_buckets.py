@@ -0,0 +1,54 @@
+"""输入尺寸分桶：缩放后的网络输入宽度随视频宽高比变化，补齐到少数几个固定宽度后，
+编译型推理后端（OpenVINO、ONNX Runtime、PyTorch 的 oneDNN 算子缓存）只需针对几种形状编译一次，
+不同宽高比的视频也能在批量推理中合批。补齐区域由 parse_poses 按 padding 屏蔽并修正坐标。
+"""
+
+import os
+
+import cv2
+
+DEFAULT_BUCKET_WIDTHS = (144, 192, 256, 344, 456, 608, 800)  # 竖屏 9:16、方形、4:3、16:9 等
+PAD_VALUE = 128  # 与各推理引擎的 img_mean 相同，归一化后为 0
+
+
+def parse_bucket_widths(value, stride=8):
+    """解析 SHAPE_BUCKETS：off 关闭分桶，on 使用默认宽度，也可直接给出逗号分隔的宽度列表"""
+    value = str(value).strip().lower()
+    if value in ('', '0', 'off', 'false', 'no'):
+        return ()
+    if value in ('1', 'on', 'true', 'yes'):
+        return DEFAULT_BUCKET_WIDTHS
+    widths = {-(-int(item) // stride) * stride for item in value.split(',') if item.strip()}
+    return tuple(sorted(width for width in widths if width > 0))
+
+
+BUCKET_WIDTHS = parse_bucket_widths(os.getenv('SHAPE_BUCKETS', 'on'))
+
+
+def bucket_width(width, stride=8, buckets=None):
+    """返回不小于 width 的最小分桶宽度；超过最大分桶时按 stride 的 8 倍向上取整，未启用分桶时返回 None"""
+    buckets = BUCKET_WIDTHS if buckets is None else buckets
+    if not buckets:
+        return None
+    for bucket in buckets:
+        if width <= bucket:
+            return bucket
+    step = stride * 8
+    return -(-width // step) * step
+
+
+def pad_to_bucket(scaled_img, stride=8, buckets=None):
+    """把网络输入左右对称补齐到分桶宽度，返回 (图像, padding)，padding 为左右补齐的像素数 (left, right)。
+
+    未启用分桶时沿用原来的做法，把宽度裁剪到 stride 的整数倍，padding 为 None。
+    """
+    width = scaled_img.shape[1]
+    target = bucket_width(width, stride, buckets)
+    if target is None:
+        return scaled_img[:, 0:width - (width % stride)], None
+    # 左侧补齐取 stride 的整数倍，屏蔽区域与特征图的列严格对齐
+    pad_left = (target - width) // 2 // stride * stride
+    pad_right = target - width - pad_left
+    padded = cv2.copyMakeBorder(scaled_img, 0, 0, pad_left, pad_right, cv2.BORDER_CONSTANT,
+                                value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return padded, (pad_left, pad_right)
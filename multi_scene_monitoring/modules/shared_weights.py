@@ -0,0 +1,47 @@
+"""内存映射加载模型权重：同一台机器上的多个推理进程共享同一份只读物理页。
+
+原始 .pth 检查点需要经过 load_state 的键名匹配，每个进程都会把权重完整读入各自的内存。
+scripts/convert_weights_mmap.py 预先把检查点转换为与网络 state_dict 完全一致的文件，
+加载时用 torch.load(mmap=True) 直接映射，参数张量指向页缓存，不再复制。
+"""
+
+from pathlib import Path
+
+import torch
+
+from modules.load_state import load_state
+
+
+def default_mmap_weights_path(checkpoint_path):
+    """映射权重与原始权重放在一起：human-pose-estimation-3d.pth -> human-pose-estimation-3d.mmap.pt"""
+    return Path(checkpoint_path).with_suffix('.mmap.pt')
+
+
+def resolve_mmap_weights(checkpoint_path, weights_path=None):
+    """返回可用的映射权重路径；文件不存在或早于原始检查点（需要重新转换）时返回 None"""
+    weights_path = Path(weights_path or default_mmap_weights_path(checkpoint_path))
+    if not weights_path.exists():
+        return None
+    checkpoint_path = Path(checkpoint_path)
+    if checkpoint_path.exists() and checkpoint_path.stat().st_mtime > weights_path.stat().st_mtime:
+        print('Memory-mapped weights {} are older than {}, rerun scripts/convert_weights_mmap.py; '
+              'loading the checkpoint instead'.format(weights_path, checkpoint_path))
+        return None
+    return weights_path
+
+
+def convert_checkpoint(net, checkpoint_path, output_path):
+    """按网络结构整理检查点后保存，得到可直接 load_state_dict 的扁平权重文件"""
+    load_state(net, torch.load(checkpoint_path, map_location='cpu'))
+    state = {key: value.detach().cpu().contiguous() for key, value in net.state_dict().items()}
+    torch.save(state, str(output_path))
+    return output_path
+
+
+def build_mmap_net(net_factory, weights_path):
+    """在 meta 设备上构建网络（跳过随机初始化与内存分配），再把参数直接指向映射的权重文件"""
+    state = torch.load(str(weights_path), map_location='cpu', mmap=True, weights_only=True)
+    with torch.device('meta'):
+        net = net_factory()
+    net.load_state_dict(state, assign=True)
+    return net
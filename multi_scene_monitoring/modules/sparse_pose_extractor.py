@@ -0,0 +1,140 @@
+"""稀疏后处理：不再把 18 个热图通道与 38 个 PAF 通道整体放大 4 倍后搜索峰值。
+
+放大图中每个像素都是低分辨率热图上相邻 2x2 个像素的加权平均，不低于阈值的放大像素至少有一个相邻像素不低于阈值。
+因此先把低分辨率热图中不低于阈值的像素按 8 连通分块，只在各块覆盖的放大区域（外扩一圈用于比较相邻值）
+按 cv2.resize 的双线性插值规则计算放大值并执行与 legacy 相同的峰值判定，其余区域在 legacy 中也会被阈值置零。
+关键点分组时 PAF 也只在实际用到的采样点上插值；3D 特征本来就只在关键点位置读取。
+
+峰值与 legacy_pose_extractor.extract_poses 相同，只有贴近边缘的峰值可能例外：放大图最外两行（列）是边界复制，
+数学上与相邻行相等，legacy 是否在这里检出峰值取决于 cv2.resize 的浮点舍入，这里一律不检出。
+"""
+
+import cv2
+import numpy as np
+
+from modules.legacy_pose_extractor import extract_keypoints_from_peaks, group_keypoints
+
+KEYPOINT_THRESHOLD = 0.1
+
+
+def _linear_table(size, ratio):
+    """放大后第 i 个坐标对应的 (左侧源坐标, 右侧源坐标, 右侧权重)，与 cv2.INTER_LINEAR 放大的取整规则相同"""
+    src = (np.arange(size * ratio, dtype=np.float32) + 0.5) / ratio - 0.5
+    low = np.floor(src).astype(np.int64)
+    weight = src - low
+    weight[low < 0] = 0
+    weight[low >= size - 1] = 0
+    low = np.clip(low, 0, size - 1)
+    high = np.minimum(low + 1, size - 1)
+    return low, high, weight.astype(np.float32)
+
+
+class UpsampledMaps:
+    """按需插值的放大特征图，支持 group_keypoints 用到的索引方式：maps[通道列表]、maps[c, y, x]、maps[:, y, x]"""
+
+    def __init__(self, maps, ratio, tables=None):
+        self.maps = maps
+        self.ratio = ratio
+        self.shape = (maps.shape[0], maps.shape[1] * ratio, maps.shape[2] * ratio)
+        if tables is None:
+            arrays = (_linear_table(maps.shape[1], ratio), _linear_table(maps.shape[2], ratio))
+            # 单点采样（分组时逐点读取 PAF）用 Python 列表查表，避免 numpy 小数组运算的开销
+            tables = arrays, tuple(list(zip(*(part.tolist() for part in table))) for table in arrays)
+        self.tables = tables
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            return UpsampledMaps(self.maps[index], self.ratio, self.tables)
+        channel, y, x = index
+        if isinstance(y, np.ndarray) or isinstance(x, np.ndarray):
+            (y0, y1, wy), (x0, x1, wx) = self.tables[0]
+            maps = self.maps[channel]
+            top = maps[..., y0[y], x0[x]] * (1 - wx[x]) + maps[..., y0[y], x1[x]] * wx[x]
+            bottom = maps[..., y1[y], x0[x]] * (1 - wx[x]) + maps[..., y1[y], x1[x]] * wx[x]
+            return top * (1 - wy[y]) + bottom * wy[y]
+
+        rows, cols = self.tables[1]
+        y0, y1, wy = rows[y]
+        x0, x1, wx = cols[x]
+        item = self.maps.item
+
+        def sample(c):
+            top = item(c, y0, x0) * (1 - wx) + item(c, y0, x1) * wx
+            bottom = item(c, y1, x0) * (1 - wx) + item(c, y1, x1) * wx
+            return top * (1 - wy) + bottom * wy
+
+        if isinstance(channel, slice):
+            return [sample(c) for c in range(self.maps.shape[0])[channel]]
+        return sample(channel)
+
+
+def find_regions(heatmaps):
+    """低分辨率热图中不低于阈值的像素按 8 连通分块，返回每个通道各块的包围盒 (x0, y0, x1, y1)（含端点）"""
+    regions = []
+    for heatmap in heatmaps:
+        mask = (heatmap >= KEYPOINT_THRESHOLD).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        regions.append([(x, y, x + w - 1, y + h - 1) for x, y, w, h, _ in stats[1:count].tolist()])
+    return regions
+
+
+def _covered_range(table, first, last):
+    """插值用到第 first..last 个源像素的放大坐标，前后各外扩一个用于比较相邻值"""
+    low, high, _ = table
+    start = int(np.searchsorted(high, first, side='left'))
+    stop = int(np.searchsorted(low, last, side='right'))
+    return np.arange(start - 1, stop + 1)
+
+
+def find_peaks(upsampled, channel, regions):
+    """在各块覆盖的放大区域中执行与 legacy 相同的峰值判定，返回放大坐标系中按 x 排序的峰值 (x, y, score)"""
+    height, width = upsampled.shape[1:]
+    row_table, col_table = upsampled.tables[0]
+    found = {}
+    for x0, y0, x1, y1 in regions:
+        rows = _covered_range(row_table, y0, y1)
+        cols = _covered_range(col_table, x0, x1)
+        inside = ((rows >= 0) & (rows < height))[:, None] & ((cols >= 0) & (cols < width))[None, :]
+        rows = np.clip(rows, 0, height - 1)
+        cols = np.clip(cols, 0, width - 1)
+        patch = upsampled[channel, rows[:, None], cols[None, :]]
+        # 与 legacy 一致：低于阈值置零，图像边界以外视为 0
+        patch[(patch < KEYPOINT_THRESHOLD) | ~inside] = 0
+
+        center = patch[1:-1, 1:-1]
+        is_peak = ((center > patch[1:-1, 2:]) & (center > patch[1:-1, :-2]) &
+                   (center > patch[2:, 1:-1]) & (center > patch[:-2, 1:-1]))
+        for row, col in zip(*np.nonzero(is_peak)):
+            found[int(cols[col + 1]), int(rows[row + 1])] = center[row, col]
+    # legacy 按行优先找到峰值后按 x 稳定排序，即按 (x, y) 排序
+    return [(x, y, found[x, y]) for x, y in sorted(found)]
+
+
+def extract_poses(heatmaps, pafs, upsample_ratio):
+    """与 legacy_pose_extractor.extract_poses 接口相同"""
+    heatmaps = np.asarray(heatmaps, dtype=np.float32)
+    heatmap_maps = UpsampledMaps(heatmaps, upsample_ratio)
+    paf_maps = UpsampledMaps(np.asarray(pafs, dtype=np.float32), upsample_ratio)
+
+    num_keypoints = heatmaps.shape[0]
+    total_keypoints_num = 0
+    all_keypoints_by_type = []
+    for kpt_idx, regions in enumerate(find_regions(heatmaps)):
+        peaks = find_peaks(heatmap_maps, kpt_idx, regions)
+        total_keypoints_num += extract_keypoints_from_peaks(peaks, all_keypoints_by_type, total_keypoints_num)
+
+    pose_entries, all_keypoints = group_keypoints(all_keypoints_by_type, paf_maps)
+
+    found_poses = []
+    for pose_entry in pose_entries:
+        pose_keypoints = np.ones((num_keypoints * 3 + 1), dtype=np.float32) * -1
+        for kpt_id in range(num_keypoints):
+            if pose_entry[kpt_id] != -1.0:
+                pose_keypoints[kpt_id * 3:kpt_id * 3 + 3] = all_keypoints[int(pose_entry[kpt_id]), 0:3]
+        pose_keypoints[-1] = pose_entry[18]
+        found_poses.append(pose_keypoints)
+
+    if not found_poses:
+        return np.array(found_poses, dtype=np.float32).reshape((0, 0)), None
+
+    return np.array(found_poses, dtype=np.float32), None
@@ -0,0 +1,77 @@
+"""处理流水线分阶段计时：在当前线程激活 StageTimer 后，各阶段的 timed(name) 记录耗时；
+用 observe_stages 注册全局观察者（例如运行指标直方图）后所有线程都会计时，两者都没有时不计时。
+
+阶段可以嵌套（例如 infer 内部的 normalize），记录的是扣除子阶段后的自身耗时，
+因此各阶段耗时之和约等于被计时代码的总耗时。
+"""
+
+import contextlib
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+_local = threading.local()
+_observer = None  # 全局观察者 observer(name, seconds)
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)  # 阶段名 -> 每次调用的自身耗时（秒）
+
+    def record(self, name, seconds):
+        self.samples[name].append(seconds)
+
+    def summary(self):
+        """每个阶段的调用次数、总耗时与 p50/p95/平均单次耗时（毫秒）"""
+        result = {}
+        for name, samples in self.samples.items():
+            values = np.asarray(samples) * 1000
+            result[name] = {
+                'count': len(values),
+                'total_ms': round(float(values.sum()), 3),
+                'mean_ms': round(float(values.mean()), 3),
+                'p50_ms': round(float(np.percentile(values, 50)), 3),
+                'p95_ms': round(float(np.percentile(values, 95)), 3),
+            }
+        return result
+
+
+def observe_stages(observer):
+    """注册全局观察者，每个阶段结束时以 (阶段名, 自身耗时秒数) 调用"""
+    global _observer
+    _observer = observer
+
+
+@contextlib.contextmanager
+def activate(timer):
+    """在当前线程中把 timer 设为活动计时器"""
+    previous = getattr(_local, 'timer', None)
+    _local.timer = timer
+    try:
+        yield timer
+    finally:
+        _local.timer = previous
+
+
+@contextlib.contextmanager
+def timed(name):
+    timer = getattr(_local, 'timer', None)
+    if timer is None and _observer is None:
+        yield
+        return
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(0.0)  # 子阶段累计耗时
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        seconds = elapsed - stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        if timer is not None:
+            timer.record(name, seconds)
+        if _observer is not None:
+            _observer(name, seconds)
@@ -0,0 +1,133 @@
+"""任务检查点：定期落盘已完成帧的指标、原始姿态、跟踪状态与输出视频分段，进程重启后从最近的检查点继续处理。
+
+指标与原始姿态都只追加写入，状态文件中只记录条数，每次检查点的开销不随已处理的帧数增长。
+续跑记录（<task_id>_resume.json）保存自动续跑次数以及任务是否因异常失败，只有被中断的任务才会续跑。
+"""
+
+import json
+import os
+import pickle
+from pathlib import Path
+
+from modules.pose_cache import PoseCacheWriter
+
+
+class TaskCheckpoint:
+    def __init__(self, folder, task_id):
+        self.folder = Path(folder)
+        self.task_id = task_id
+        self.state_path = self.folder / f"{task_id}_checkpoint.pkl"
+        self.metrics_path = self.folder / f"{task_id}_metrics.partial.jsonl"
+        self.poses_path = self.folder / f"{task_id}_poses.partial.pkl"  # 依次 pickle 的 PoseCacheWriter 分块
+        self.resume_path = self.folder / f"{task_id}_resume.json"
+
+    def segment_path(self, index):
+        return self.folder / f"{self.task_id}_output.part{index:03d}.mp4"
+
+    def exists(self):
+        return self.state_path.exists()
+
+    def load(self):
+        """读取检查点，文件缺失或损坏时返回 None"""
+        if not self.state_path.exists():
+            return None
+        try:
+            with open(self.state_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as exc:
+            print(f"[Checkpoint] Failed to load {self.state_path.name}: {exc}")
+            return None
+
+    def load_metrics(self, count):
+        """读取前 count 帧的指标，并截掉检查点之后写入的多余行"""
+        frames = []
+        if self.metrics_path.exists():
+            with open(self.metrics_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if len(frames) >= count:
+                        break
+                    if line.strip():
+                        frames.append(json.loads(line))
+        self._rewrite_metrics(frames)
+        return frames
+
+    def load_pose_cache(self, count):
+        """拼接前 count 帧的原始姿态，并截掉检查点之后追加的多余分块"""
+        pose_cache = PoseCacheWriter()
+        if self.poses_path.exists():
+            with open(self.poses_path, 'rb') as f:
+                while len(pose_cache) < count:
+                    try:
+                        pose_cache.extend(pickle.load(f))
+                    except EOFError:
+                        break
+        pose_cache = pose_cache.slice(0, count)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.poses_path, 'wb') as f:
+            pickle.dump(pose_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return pose_cache
+
+    def load_resume_info(self):
+        """读取续跑记录：已自动续跑的次数与失败原因（任务因异常失败时才有）"""
+        try:
+            with open(self.resume_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'attempts': 0, 'error': None}
+
+    def record_resume_attempt(self):
+        """自动续跑前调用，返回累计的续跑次数"""
+        info = self.load_resume_info()
+        info['attempts'] = info.get('attempts', 0) + 1
+        self._write_resume_info(info)
+        return info['attempts']
+
+    def mark_failed(self, error):
+        """任务因异常失败（而不是进程被中断）时调用，重启后不再续跑"""
+        if self.exists():
+            info = self.load_resume_info()
+            info['error'] = error
+            self._write_resume_info(info)
+
+    def save(self, payload, new_metrics, new_poses=None):
+        """先追加指标与原始姿态，再原子替换状态文件，保证状态引用的数据都已落盘。
+
+        指标已由 PartialResults 逐帧写入同一文件时 new_metrics 传空列表，这里只负责 fsync；
+        new_poses 为上次检查点之后新增帧的 PoseCacheWriter。
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.metrics_path, 'a', encoding='utf-8') as f:
+            for frame_metrics in new_metrics:
+                f.write(json.dumps(frame_metrics, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if new_poses is not None:
+            with open(self.poses_path, 'ab') as f:
+                pickle.dump(new_poses, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        temp_path = self.state_path.with_suffix('.tmp')
+        with open(temp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.state_path)
+
+    def clear(self):
+        """删除检查点文件与输出视频分段（分段合并完成后调用）"""
+        for path in (self.state_path, self.metrics_path, self.poses_path, self.resume_path,
+                     self.state_path.with_suffix('.tmp')):
+            path.unlink(missing_ok=True)
+        for path in self.folder.glob(f"{self.task_id}_output.part*.mp4"):
+            path.unlink(missing_ok=True)
+
+    def _write_resume_info(self, info):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.resume_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+
+    def _rewrite_metrics(self, frames):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(self.metrics_path, 'w', encoding='utf-8') as f:
+            for frame_metrics in frames:
+                f.write(json.dumps(frame_metrics, ensure_ascii=False) + '\n')
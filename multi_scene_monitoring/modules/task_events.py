@@ -0,0 +1,26 @@
+"""任务状态变更通知：处理线程在状态、阶段或进度变化时 publish，SSE 连接在条件变量上等待，
+变化后立即推送，无需客户端轮询。
+"""
+
+import threading
+
+
+class TaskEvents:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.versions = {}  # task_id -> 变更次数
+
+    def publish(self, task_id):
+        with self.condition:
+            self.versions[task_id] = self.versions.get(task_id, 0) + 1
+            self.condition.notify_all()
+
+    def wait(self, seen, task_ids=None, timeout=None):
+        """等待 task_ids（None 表示所有任务）中有版本号与 seen 不同的任务，返回 {task_id: 最新版本}；超时返回空字典"""
+        def changed():
+            ids = self.versions if task_ids is None else task_ids
+            return {task_id: self.versions.get(task_id, 0) for task_id in ids
+                    if self.versions.get(task_id, 0) != seen.get(task_id)}
+
+        with self.condition:
+            return self.condition.wait_for(changed, timeout) or {}
@@ -0,0 +1,122 @@
+"""单个任务的性能剖析：用 cProfile 记录调用耗时、tracemalloc 记录内存分配，并同时统计各阶段耗时，
+结果保存在任务输出旁边，供事后排查异常缓慢的视频。
+
+Python 3.12 起 cProfile 改为进程级：同一时刻只能有一个剖析器，第二个 enable() 会抛出 ValueError，
+剖析期间其他线程（例如同时运行的未剖析任务）的调用也会计入。因此剖析任务逐个运行，后来的任务排队等待。
+3.12 之前 cProfile 只剖析调用线程。tracemalloc 是进程级的，同时运行的其他任务的分配也会计入。
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from modules.stage_timer import StageTimer, activate
+
+PROFILE_FILES = {
+    'report': '{task_id}_profile.txt',       # 可读的报告：耗时最多的函数与分配最多的代码行
+    'pstats': '{task_id}_profile.prof',      # pstats 二进制，可用 snakeviz 等工具打开
+    'memory': '{task_id}_memory.snapshot',   # tracemalloc 快照，可用 tracemalloc.Snapshot.load 对比
+    'stages': '{task_id}_profile_stages.json',
+}
+
+_profile_lock = threading.Lock()  # 同一时刻只剖析一个任务
+_tracing_lock = threading.Lock()
+_tracing_users = 0  # 同时剖析的任务数，最后一个结束时才停止 tracemalloc
+_tracing_started = False  # tracemalloc 是否由这里启动（外部已启动时不负责停止）
+
+
+def profile_paths(folder, task_id):
+    return {kind: Path(folder) / name.format(task_id=task_id) for kind, name in PROFILE_FILES.items()}
+
+
+def _start_tracing(frames):
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0:
+            _tracing_started = not tracemalloc.is_tracing()
+            if _tracing_started:
+                tracemalloc.start(frames)
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+
+
+def _format_report(task_id, wall_seconds, profiler, peak_bytes, snapshot, baseline, top):
+    out = io.StringIO()
+    out.write(f"task {task_id}  wall {wall_seconds:.3f} s  tracemalloc peak {peak_bytes / 2 ** 20:.1f} MiB\n")
+    for sort_key in ('cumulative', 'tottime'):
+        out.write(f"\n==== top {top} functions by {sort_key} ====\n")
+        pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort_key).print_stats(top)
+    out.write(f"\n==== top {top} allocation sites still held at the end ====\n")
+    for stat in snapshot.statistics('lineno')[:top]:
+        out.write(f"{stat}\n")
+    out.write(f"\n==== top {top} allocation growth since task start ====\n")
+    for stat in snapshot.compare_to(baseline, 'lineno')[:top]:
+        out.write(f"{stat}\n")
+    return out.getvalue()
+
+
+@contextlib.contextmanager
+def profile_task(folder, task_id, top=30, memory_frames=1):
+    """在 with 块内剖析（3.12 起为整个进程），结束后（包括异常退出）写出 PROFILE_FILES 中的文件。
+
+    其他任务正在剖析时先等待其结束。
+    yield 的字典在退出后包含 {'files': {类型: 路径}, 'wall_seconds': ..., 'peak_memory_mb': ...}。
+    """
+    if not _profile_lock.acquire(blocking=False):
+        print(f"[INFO] 任务 {task_id} 等待其他任务的性能剖析结束")
+        _profile_lock.acquire()
+    try:
+        with _profile_section(folder, task_id, top, memory_frames) as result:
+            yield result
+    finally:
+        _profile_lock.release()
+
+
+@contextlib.contextmanager
+def _profile_section(folder, task_id, top, memory_frames):
+    paths = profile_paths(folder, task_id)
+    result = {}
+    timer = StageTimer()
+    profiler = cProfile.Profile()
+    _start_tracing(memory_frames)
+    baseline = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        with activate(timer):
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+    finally:
+        wall_seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ])
+        _stop_tracing()
+
+        profiler.dump_stats(str(paths['pstats']))
+        snapshot.dump(str(paths['memory']))
+        with open(paths['report'], 'w', encoding='utf-8') as f:
+            f.write(_format_report(task_id, wall_seconds, profiler, peak_bytes, snapshot, baseline, top))
+        with open(paths['stages'], 'w', encoding='utf-8') as f:
+            json.dump(timer.summary(), f, ensure_ascii=False, indent=2)
+        result.update({'files': {kind: str(path) for kind, path in paths.items()},
+                       'wall_seconds': round(wall_seconds, 3),
+                       'peak_memory_mb': round(peak_bytes / 2 ** 20, 1)})
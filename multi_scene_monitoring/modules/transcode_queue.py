@@ -0,0 +1,65 @@
+"""H.264 转码队列：推理完成后输出视频交给固定数量的转码线程排队处理，处理线程不必等待转码结束。
+
+每个 ffmpeg 进程的编码线程数按 CPU 核数除以并发数设置，几个转码同时运行时不会互相争抢 CPU；
+已经是浏览器可直接播放的 H.264 视频（例如 OpenCV 直接以 avc1 写出）经探测后跳过转码。
+"""
+
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 主流浏览器都能硬解的 H.264 档次；10 bit、4:2:2 等格式仍需转码
+BROWSER_H264_PROFILES = ('Constrained Baseline', 'Baseline', 'Main', 'High')
+_VIDEO_STREAM = re.compile(r'Stream #\S+.*?: Video: (\w+)(?: \(([^)]*)\))?.*?, (\w+)')
+
+
+def probe_video_stream(ffmpeg_path, video_path):
+    """读取第一条视频流的编码、档次与像素格式，返回 {'codec', 'profile', 'pix_fmt'}，无法识别时返回 None。
+
+    只需要 ffmpeg（不依赖 ffprobe）：ffmpeg -i 在没有输出文件时打印输入信息后退出。
+    """
+    result = subprocess.run([ffmpeg_path, '-hide_banner', '-nostdin', '-i', str(video_path)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors='replace')
+    match = _VIDEO_STREAM.search(result.stderr)
+    if match is None:
+        return None
+    codec, profile, pix_fmt = match.groups()
+    return {'codec': codec, 'profile': profile, 'pix_fmt': pix_fmt}
+
+
+def is_browser_h264(stream_info):
+    return (stream_info is not None and stream_info['codec'] == 'h264'
+            and stream_info['profile'] in BROWSER_H264_PROFILES and stream_info['pix_fmt'] == 'yuv420p')
+
+
+class TranscodeQueue:
+    def __init__(self, workers, threads=None):
+        self.workers = max(1, workers)
+        # 每个转码进程的编码线程数，默认让同时运行的转码恰好占满所有核
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='transcode')
+        self.lock = threading.Lock()
+        self.pending = 0  # 排队中与正在转码的任务数
+        self.running = 0
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self.pending += 1
+        return self.executor.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        with self.lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            return {'workers': self.workers, 'threads': self.threads,
+                    'running': self.running, 'waiting': self.pending - self.running}
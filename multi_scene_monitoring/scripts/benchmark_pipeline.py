@@ -0,0 +1,179 @@
+"""离线处理流水线分阶段性能基准：完整运行 process_video，统计解码、缩放、归一化、推理、姿态提取与解析、
+坐标规范化、指标计算、绘制、编码、转码与 JSON 写出各阶段的 p50/p95 耗时及整体帧率，结果保存为 JSON。
+
+用法:
+    python scripts/benchmark_pipeline.py                          # 默认使用 data/运球.mp4
+    python scripts/benchmark_pipeline.py --synthetic --frames 300 # 生成合成视频
+    python scripts/benchmark_pipeline.py --baseline outputs/benchmarks/v1.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import api_server  # noqa: E402
+from modules.draw import draw_poses  # noqa: E402
+from modules.stage_timer import StageTimer, activate  # noqa: E402
+
+STAGE_ORDER = ('decode', 'resize', 'normalize', 'infer', 'extract', 'parse', 'canonicalize', 'metrics',
+               'draw', 'encode', 'transcode', 'json_write', 'pose_cache_write')
+
+
+def generate_synthetic_video(path, frames, width=1280, height=720, fps=25):
+    """生成合成视频：在渐变背景上绘制 generate_mock_poses 的骨架，并让人物左右移动"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    background = np.tile(np.linspace(40, 120, width, dtype=np.uint8)[None, :, None], (height, 1, 3))
+    for frame_idx in range(frames):
+        frame = background.copy()
+        _, poses_2d = api_server.generate_mock_poses(frame, frame_idx)
+        shift = int(np.sin(frame_idx / 15.0) * width * 0.2)
+        for pose_2d in poses_2d:
+            pose_2d[0:-1:3] += shift
+        draw_poses(frame, poses_2d)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=api_server.PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(video_path, training_type='dribbling', frame_stride=1):
+    """在当前线程中计时运行一次 process_video，返回报告字典"""
+    # 模型加载与预热不计入流水线耗时
+    engine = api_server.model_manager.get()
+    task_id = f"benchmark-{int(time.time())}"
+    api_server.processing_tasks[task_id] = {'status': 'uploaded', 'progress': 0,
+                                            'video_path': str(video_path), 'training_type': training_type}
+    cap = cv2.VideoCapture(str(video_path))
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    resolution = [int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))]
+    cap.release()
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    with activate(timer):
+        ok = api_server.process_video(Path(video_path), task_id, training_type, frame_stride)
+    # 转码在转码线程中进行，等它结束后把耗时计入 transcode 阶段
+    task = api_server.processing_tasks[task_id]
+    seen = {}
+    while task['status'] == 'transcoding':
+        seen.update(api_server.task_events.wait(seen, [task_id], timeout=1.0))
+    wall_seconds = time.perf_counter() - start
+    if 'transcode_seconds' in task:
+        timer.record('transcode', task['transcode_seconds'])
+    api_server.processing_tasks.pop(task_id)
+    if not ok:
+        raise RuntimeError(f"process_video failed: {task.get('error')}")
+
+    # 只保留报告，删除本次产生的输出文件
+    for path in api_server.OUTPUT_FOLDER.glob(f"{task_id}_*"):
+        path.unlink(missing_ok=True)
+
+    summary = timer.summary()
+    stages = {name: summary[name] for name in STAGE_ORDER if name in summary}
+    stages.update({name: value for name, value in summary.items() if name not in stages})
+    selected = api_server.engine_selection.get('selected') or {}
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'git_revision': git_revision(),
+            'host': socket.gethostname(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'video': str(video_path),
+            'resolution': resolution,
+            'training_type': training_type,
+            'frame_stride': frame_stride,
+            'backend': selected.get('backend', 'simulation' if engine is None else api_server.INFERENCE_BACKEND),
+            'threads': selected.get('threads'),
+            'simulation': engine is None,
+        },
+        'frames': frames,
+        'wall_seconds': round(wall_seconds, 3),
+        'fps': round(frames / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        'stages': stages,
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance):
+    """返回相对基线变慢超过 tolerance 的项：整体帧率与各阶段 p50"""
+    regressions = []
+    if baseline.get('fps') and report['fps'] < baseline['fps'] * (1 - tolerance):
+        regressions.append(f"fps {baseline['fps']} -> {report['fps']}")
+    for name, stage in report['stages'].items():
+        base_stage = baseline.get('stages', {}).get(name)
+        # 亚毫秒级阶段的抖动远大于实际变化，不参与比较
+        if not base_stage or base_stage['p50_ms'] < 0.5:
+            continue
+        if stage['p50_ms'] > base_stage['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name} p50 {base_stage['p50_ms']}ms -> {stage['p50_ms']}ms")
+    return regressions
+
+
+def print_report(report):
+    meta = report['meta']
+    print(f"\n{meta['video']}  {meta['resolution'][0]}x{meta['resolution'][1]}  {report['frames']} frames  "
+          f"backend={meta['backend']}")
+    print(f"{'stage':<18}{'count':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'total(ms)':>12}")
+    for name, stage in report['stages'].items():
+        print(f"{name:<18}{stage['count']:>8}{stage['p50_ms']:>10}{stage['p95_ms']:>10}{stage['total_ms']:>12}")
+    print(f"overall: {report['fps']} fps, {report['wall_seconds']} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-stage latency benchmark for the offline video pipeline')
+    parser.add_argument('--video', type=str, default=str(api_server.PROJECT_ROOT / 'data' / '运球.mp4'),
+                        help='clip to process (default: data/运球.mp4)')
+    parser.add_argument('--synthetic', action='store_true', help='generate a synthetic clip instead')
+    parser.add_argument('--frames', type=int, default=250, help='frame count of the synthetic clip')
+    parser.add_argument('--training-type', type=str, default='dribbling', help='dribbling / defense / shooting')
+    parser.add_argument('--frame-stride', type=str, default='1', help='1 | N | auto')
+    parser.add_argument('--output', type=str, default=None,
+                        help='report path (default: outputs/benchmarks/pipeline_<timestamp>.json)')
+    parser.add_argument('--baseline', type=str, default=None, help='previous report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown ratio vs baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = Path(args.video)
+        if args.synthetic or not video_path.exists():
+            video_path = generate_synthetic_video(Path(tmp_dir) / 'synthetic.mp4', args.frames)
+        report = run_benchmark(video_path, args.training_type, api_server.parse_frame_stride(args.frame_stride))
+    if args.synthetic or not Path(args.video).exists():
+        report['meta']['video'] = f"synthetic:{args.frames}"
+    print_report(report)
+
+    output_path = Path(args.output) if args.output else \
+        api_server.OUTPUT_FOLDER / 'benchmarks' / f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Saved report: {output_path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print('Performance regressions vs baseline:')
+            for item in regressions:
+                print(f'  - {item}')
+            sys.exit(1)
+        print('No regressions vs baseline')
@@ -0,0 +1,160 @@
+"""在自有训练视频上校准 INT8 模型，并对比 bf16 / int8 与 fp32 的关键点误差和推理速度。
+
+用法:
+    python scripts/calibrate_quantization.py uploads/a.mp4 uploads/b.mp4 --report outputs/quantization_report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.with_mobilenet import PoseEstimationWithMobileNet
+from modules.frame_sampling import match_poses
+from modules.inference_engine_pytorch import InferenceEnginePyTorch
+from modules.load_state import load_state
+from modules.parse_poses import mask_padding
+from modules.pose_roi import infer_frame_poses
+from modules.quantization import default_int8_model_path, quantize_int8
+from modules.shape_buckets import pad_to_bucket
+
+
+def sample_frames(video_paths, frames_per_video):
+    """从每个视频中均匀抽取若干帧"""
+    frames = []
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(str(video_path))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for frame_idx in np.linspace(0, max(total - 1, 0), frames_per_video).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames
+
+
+def scale_frame(frame, base_height=256, stride=8):
+    """与 infer_frame_poses 相同的缩放与分桶补齐（SHAPE_BUCKETS=off 时裁剪到 stride 的整数倍），返回 (图像, padding)"""
+    input_scale = base_height / frame.shape[0]
+    scaled_img = cv2.resize(frame, dsize=None, fx=input_scale, fy=input_scale)
+    return pad_to_bucket(scaled_img, stride)
+
+
+def network_input(engine, frame, base_height=256, stride=8):
+    """与线上推理相同的网络输入张量，校准时补齐区域的激活范围也与线上一致"""
+    scaled_img, _ = scale_frame(frame, base_height, stride)
+    normalized_img = engine._normalize(scaled_img, engine.img_mean, engine.img_scale)
+    return torch.from_numpy(normalized_img).permute(2, 0, 1).unsqueeze(0)
+
+
+def heatmap_error(reference_engine, engine, frame, base_height=256, stride=8):
+    """同一网络输入上两者热图的平均绝对误差；与 parse_poses 一样先用 mask_padding 屏蔽补齐区域，不计入误差"""
+    scaled_img, padding = scale_frame(frame, base_height, stride)
+    reference = reference_engine.infer(scaled_img)
+    candidate = engine.infer(scaled_img)
+    if padding is not None:
+        reference = mask_padding(reference, padding, stride)
+        candidate = mask_padding(candidate, padding, stride)
+    return float(np.abs(reference[1] - candidate[1]).mean())
+
+
+def keypoint_errors(reference, candidate):
+    """逐人匹配后计算 2D（像素）与 3D（厘米）关键点平均误差"""
+    ref_3d, ref_2d = reference
+    cand_3d, cand_2d = candidate
+    errors_2d, errors_3d = [], []
+    for idx_a, idx_b in match_poses(ref_2d, cand_2d):
+        pose_a = np.asarray(ref_2d[idx_a][0:-1]).reshape((-1, 3))
+        pose_b = np.asarray(cand_2d[idx_b][0:-1]).reshape((-1, 3))
+        valid = (pose_a[:, 2] != -1) & (pose_b[:, 2] != -1)
+        if np.any(valid):
+            errors_2d.append(np.linalg.norm(pose_a[valid, 0:2] - pose_b[valid, 0:2], axis=1).mean())
+        pose_3d_a = np.asarray(ref_3d[idx_a]).reshape((-1, 4))
+        pose_3d_b = np.asarray(cand_3d[idx_b]).reshape((-1, 4))
+        valid_3d = (pose_3d_a[:, 3] != -1) & (pose_3d_b[:, 3] != -1)
+        if np.any(valid_3d):
+            errors_3d.append(np.linalg.norm(pose_3d_a[valid_3d, 0:3] - pose_3d_b[valid_3d, 0:3], axis=1).mean())
+    return errors_2d, errors_3d, abs(len(ref_2d) - len(cand_2d))
+
+
+def evaluate(engines, frames):
+    reference_engine = engines['fp32']
+    references = [infer_frame_poses(reference_engine, frame) for frame in frames]
+    report = {}
+    for name, engine in engines.items():
+        infer_frame_poses(engine, frames[0])  # 预热
+        start = time.perf_counter()
+        results = [infer_frame_poses(engine, frame) for frame in frames]
+        elapsed = time.perf_counter() - start
+
+        errors_2d, errors_3d, count_diff = [], [], 0
+        for reference, result in zip(references, results):
+            frame_2d, frame_3d, frame_count_diff = keypoint_errors(reference, result)
+            errors_2d.extend(frame_2d)
+            errors_3d.extend(frame_3d)
+            count_diff += frame_count_diff
+        heatmap_errors = [heatmap_error(reference_engine, engine, frame) for frame in frames]
+        report[name] = {
+            'fps': round(len(frames) / elapsed, 2),
+            'mean_error_2d_px': round(float(np.mean(errors_2d)), 3) if errors_2d else 0.0,
+            'p95_error_2d_px': round(float(np.percentile(errors_2d, 95)), 3) if errors_2d else 0.0,
+            'mean_error_3d_cm': round(float(np.mean(errors_3d)), 3) if errors_3d else 0.0,
+            'mean_heatmap_error': round(float(np.mean(heatmap_errors)), 5),
+            'people_count_mismatch': count_diff,
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Calibrate INT8 model and report accuracy deltas vs fp32')
+    parser.add_argument('videos', nargs='+', help='training clips used for calibration and evaluation')
+    parser.add_argument('--checkpoint-path', type=str, default='human-pose-estimation-3d.pth',
+                        help='path to the fp32 checkpoint')
+    parser.add_argument('--output', type=str, default=None,
+                        help='where to save the INT8 TorchScript model (default: <checkpoint>.int8.pt)')
+    parser.add_argument('--calibration-frames', type=int, default=16, help='frames per video used for calibration')
+    parser.add_argument('--eval-frames', type=int, default=16, help='frames per video used for evaluation')
+    parser.add_argument('--quantized-engine', type=str, default='x86', help='torch quantized engine: x86 / fbgemm / qnnpack')
+    parser.add_argument('--report', type=str, default=None, help='optional JSON report path')
+    args = parser.parse_args()
+
+    output_path = args.output or str(default_int8_model_path(args.checkpoint_path))
+    fp32_engine = InferenceEnginePyTorch(args.checkpoint_path, 'CPU')
+
+    # 校准帧与评估帧分开抽取，评估结果反映的是未参与校准的画面
+    calibration_frames = sample_frames(args.videos, args.calibration_frames)
+    eval_frames = sample_frames(args.videos, args.eval_frames + args.calibration_frames)
+    eval_frames = [frame for i, frame in enumerate(eval_frames) if i % 2 == 1] or eval_frames
+    print(f'Calibrating INT8 model on {len(calibration_frames)} frames...')
+
+    net = PoseEstimationWithMobileNet()
+    load_state(net, torch.load(args.checkpoint_path, map_location='cpu'))
+    net.eval()
+    calibration_inputs = [network_input(fp32_engine, frame) for frame in calibration_frames]
+    quantized = quantize_int8(net, calibration_inputs, engine=args.quantized_engine)
+    torch.jit.save(quantized, output_path)
+    print(f'Saved INT8 model: {output_path}')
+
+    engines = {
+        'fp32': fp32_engine,
+        'bf16': InferenceEnginePyTorch(args.checkpoint_path, 'CPU', precision='bf16'),
+        'int8': InferenceEnginePyTorch(args.checkpoint_path, 'CPU', precision='int8', int8_model_path=output_path),
+    }
+    report = evaluate(engines, eval_frames)
+
+    print(f"{'precision':<10}{'fps':>8}{'2D err(px)':>12}{'2D p95':>10}{'3D err(cm)':>12}{'heatmap err':>13}"
+          f"{'count diff':>12}")
+    for name, row in report.items():
+        print(f"{name:<10}{row['fps']:>8}{row['mean_error_2d_px']:>12}{row['p95_error_2d_px']:>10}"
+              f"{row['mean_error_3d_cm']:>12}{row['mean_heatmap_error']:>13}{row['people_count_mismatch']:>12}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'frames': len(eval_frames), 'results': report}, f, ensure_ascii=False, indent=2)
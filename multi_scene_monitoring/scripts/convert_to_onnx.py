@@ -0,0 +1,48 @@
+"""把 PoseEstimationWithMobileNet 的 PyTorch 权重导出为 ONNX 模型，供 InferenceEngineONNX 使用"""
+
+import argparse
+import inspect
+import os
+import sys
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.with_mobilenet import PoseEstimationWithMobileNet
+from modules.load_state import load_state
+
+
+def convert_to_onnx(net, output_name, height=256, width=448, opset=13):
+    """导出网络；批大小、输入高宽均为动态维度，可直接用于批量推理与任意宽高比的视频"""
+    net.eval()
+    dummy_input = torch.randn(1, 3, height, width)
+    input_names = ['data']
+    output_names = ['features', 'heatmaps', 'pafs']
+    dynamic_axes = {name: {0: 'batch', 2: 'height', 3: 'width'} for name in input_names + output_names}
+    # 新版 PyTorch 默认使用 dynamo 导出器，这里固定使用支持 dynamic_axes 的 TorchScript 导出
+    extra_args = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+
+    with torch.no_grad():
+        torch.onnx.export(net, dummy_input, output_name, verbose=False, opset_version=opset,
+                          input_names=input_names, output_names=output_names, dynamic_axes=dynamic_axes,
+                          **extra_args)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkpoint-path', type=str, default='human-pose-estimation-3d.pth',
+                        help='path to the checkpoint')
+    parser.add_argument('--output-name', type=str, default='human-pose-estimation-3d.onnx',
+                        help='name of output model in ONNX format')
+    parser.add_argument('--height', type=int, default=256, help='network input height used for tracing')
+    parser.add_argument('--width', type=int, default=448, help='network input width used for tracing')
+    parser.add_argument('--opset', type=int, default=13, help='ONNX opset version')
+    args = parser.parse_args()
+
+    net = PoseEstimationWithMobileNet()
+    checkpoint = torch.load(args.checkpoint_path, map_location='cpu')
+    load_state(net, checkpoint)
+
+    convert_to_onnx(net, args.output_name, args.height, args.width, args.opset)
+    print(f'Exported ONNX model: {args.output_name}')
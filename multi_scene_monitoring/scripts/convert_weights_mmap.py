@@ -0,0 +1,87 @@
+"""把 PyTorch 检查点转换为可内存映射加载的权重文件，并可选地测量多进程下的启动耗时与内存占用。
+
+用法:
+    python scripts/convert_weights_mmap.py --checkpoint-path human-pose-estimation-3d.pth
+    python scripts/convert_weights_mmap.py --checkpoint-path human-pose-estimation-3d.pth --benchmark 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def read_memory_kb():
+    """读取当前进程的 Rss / Pss / 私有内存（kB），Pss 把共享页按共享进程数平摊"""
+    usage = {}
+    with open('/proc/self/smaps_rollup', encoding='utf-8') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                usage[key] = int(value.split()[0])
+    return {'rss': usage['Rss'], 'pss': usage['Pss'],
+            'private': usage['Private_Clean'] + usage['Private_Dirty']}
+
+
+def _benchmark_worker(checkpoint_path, weights_path, start_barrier, done_barrier, results):
+    import torch
+    from modules.inference_engine_pytorch import InferenceEnginePyTorch
+
+    torch.set_num_threads(1)
+    before = read_memory_kb()
+    start = time.perf_counter()
+    engine = InferenceEnginePyTorch(checkpoint_path, 'CPU', mmap_weights=weights_path is not None,
+                                    mmap_weights_path=weights_path)
+    engine.infer(np.zeros((256, 448, 3), dtype=np.uint8))
+    startup = time.perf_counter() - start
+    # 所有进程都加载完后再采样，Pss 才能反映共享情况
+    start_barrier.wait()
+    after = read_memory_kb()
+    results.put({'startup_seconds': startup,
+                 **{f'{key}_delta_mb': (after[key] - before[key]) / 1024 for key in after}})
+    done_barrier.wait()
+
+
+def benchmark(checkpoint_path, processes, weights_path=None):
+    """同时启动多个进程各自加载模型并推理一帧，返回各指标的进程平均值；weights_path 为 None 时读取原始检查点"""
+    ctx = multiprocessing.get_context('spawn')
+    start_barrier, done_barrier, results = ctx.Barrier(processes), ctx.Barrier(processes), ctx.Queue()
+    workers = [ctx.Process(target=_benchmark_worker,
+                           args=(checkpoint_path, weights_path, start_barrier, done_barrier, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    rows = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {key: round(float(np.mean([row[key] for row in rows])), 3) for key in rows[0]}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a checkpoint into memory-mappable weights')
+    parser.add_argument('--checkpoint-path', type=str, default='human-pose-estimation-3d.pth',
+                        help='path to the checkpoint')
+    parser.add_argument('--output', type=str, default=None,
+                        help='where to save the converted weights (default: <checkpoint>.mmap.pt)')
+    parser.add_argument('--benchmark', type=int, default=0,
+                        help='measure startup time and memory with this many concurrent processes')
+    args = parser.parse_args()
+
+    from models.with_mobilenet import PoseEstimationWithMobileNet
+    from modules.shared_weights import convert_checkpoint, default_mmap_weights_path
+
+    output_path = args.output or str(default_mmap_weights_path(args.checkpoint_path))
+    convert_checkpoint(PoseEstimationWithMobileNet(), args.checkpoint_path, output_path)
+    print(f'Saved memory-mappable weights: {output_path}')
+
+    if args.benchmark > 0:
+        print(f"{'mode':<8}{'startup(s)':>12}{'RSS(MB)':>10}{'PSS(MB)':>10}{'private(MB)':>13}")
+        for mode, weights_path in (('load', None), ('mmap', output_path)):
+            row = benchmark(args.checkpoint_path, args.benchmark, weights_path)
+            print(f"{mode:<8}{row['startup_seconds']:>12}{row['rss_delta_mb']:>10.1f}"
+                  f"{row['pss_delta_mb']:>10.1f}{row['private_delta_mb']:>13.1f}")
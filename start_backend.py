@@ -12,9 +12,14 @@ try:
     print("正在启动后端服务...")
     
     # 尝试导入并启动Flask应用
-    from multi_scene_monitoring.api_server import app
+    from multi_scene_monitoring.api_server import app, model_manager, resume_interrupted_tasks
     
     print("Flask应用导入成功，正在启动服务器...")
+
+    # 后台加载并预热模型，同时恢复上次服务中断时未完成的任务（仅在 reloader 子进程中执行，避免重复处理）
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        model_manager.start()
+        resume_interrupted_tasks()
     print("后端服务将在 http://localhost:5000 启动")
     
     # 启动Flask应用
@@ -137,6 +137,143 @@ def test_students_db():
         return False
 
 
+def test_readiness_gate():
+    """模型加载抛出异常时 /api/ready 返回 503 并带上错误原因；有意的模拟模式仍视为就绪"""
+    print("\nTesting readiness gate...")
+    import api_server
+    from modules.model_manager import ModelManager
+
+    def broken_loader():
+        raise RuntimeError('checkpoint is corrupt')
+
+    def broken_warmup(engine):
+        raise RuntimeError('warmup ran out of memory')
+
+    original = api_server.model_manager
+    original_simulation = api_server.SIMULATION_MODE
+    client = api_server.app.test_client()
+    try:
+        api_server.model_manager = ModelManager(broken_loader)
+        api_server.model_manager.get(timeout=5)
+        response = client.get('/api/ready')
+        assert response.status_code == 503
+        body = response.get_json()
+        assert body['state'] == 'failed' and not body['ready']
+        assert 'checkpoint is corrupt' in body['error']
+
+        # 预热失败同样没有可用引擎，姿态由模拟数据生成
+        api_server.SIMULATION_MODE = False
+        api_server.model_manager = ModelManager(object, broken_warmup)
+        api_server.model_manager.get(timeout=5)
+        body = client.get('/api/ready').get_json()
+        assert body['state'] == 'failed' and body['simulation'] and api_server.is_simulated()
+        api_server.SIMULATION_MODE = original_simulation
+
+        api_server.model_manager = ModelManager(lambda: None)
+        api_server.model_manager.get(timeout=5)
+        assert client.get('/api/ready').status_code == 200
+    finally:
+        api_server.model_manager = original
+        api_server.SIMULATION_MODE = original_simulation
+    print("✓ Failed model load keeps the node out of rotation")
+    return True
+
+
+def test_resume_only_interrupted():
+    """重启时只续跑被中断的任务：异常失败的任务与续跑次数用尽的任务清理检查点后跳过"""
+    print("\nTesting checkpoint resume...")
+    import tempfile
+    from pathlib import Path
+    import api_server
+    from modules.task_checkpoint import TaskCheckpoint
+
+    original_folder = api_server.OUTPUT_FOLDER
+    original_start = api_server.start_processing_thread
+    started = []
+    with tempfile.TemporaryDirectory() as folder:
+        try:
+            api_server.OUTPUT_FOLDER = Path(folder)
+            api_server.start_processing_thread = lambda video_path, task_id, *args, **kwargs: started.append(task_id)
+            payload = {'video_path': __file__, 'training_type': 'dribbling', 'options': {}}
+            for task_id in ('resume-interrupted', 'resume-failed', 'resume-exhausted'):
+                TaskCheckpoint(folder, task_id).save(payload, [])
+            TaskCheckpoint(folder, 'resume-failed').mark_failed('无法打开视频文件')
+            for _ in range(api_server.MAX_RESUME_ATTEMPTS):
+                TaskCheckpoint(folder, 'resume-exhausted').record_resume_attempt()
+
+            assert api_server.resume_interrupted_tasks() == ['resume-interrupted']
+            assert not TaskCheckpoint(folder, 'resume-failed').exists()
+            assert not TaskCheckpoint(folder, 'resume-exhausted').exists()
+            assert TaskCheckpoint(folder, 'resume-interrupted').load_resume_info()['attempts'] == 1
+            assert started == ['resume-interrupted']
+        finally:
+            api_server.OUTPUT_FOLDER = original_folder
+            api_server.start_processing_thread = original_start
+            api_server.processing_tasks.pop('resume-interrupted', None)
+    print("✓ Only interrupted tasks are resumed")
+    return True
+
+
+def test_live_source_allowlist():
+    """实时会话的视频流地址：拒绝内网、回环与链路本地地址，白名单内的主机与网段放行"""
+    print("\nTesting live stream source allowlist...")
+    import api_server
+    from modules.live_session import normalize_stream_source
+
+    for url in ('rtsp://127.0.0.1:8554/live', 'http://169.254.169.254/latest/meta-data/',
+                'rtsp://admin:pw@192.168.1.20/stream1', 'http://[::1]:5000/api/health',
+                'http://[::ffff:10.0.0.1]/', 'rtmp://0.0.0.0/live'):
+        assert normalize_stream_source(url) is None, url
+    assert normalize_stream_source('rtsp://8.8.8.8/live') == 'rtsp://8.8.8.8/live'
+    assert normalize_stream_source('rtmp://8.8.8.8/live', allowed_schemes=('rtsp',)) is None
+
+    lan_cameras = ('192.168.1.0/24',)
+    assert normalize_stream_source('rtsp://admin:pw@192.168.1.20/stream1', allowed_hosts=lan_cameras)
+    assert normalize_stream_source('rtsp://192.168.2.20/stream1', allowed_hosts=lan_cameras) is None
+    assert normalize_stream_source('rtsp://8.8.8.8/live', allowed_hosts=lan_cameras) is None
+
+    response = api_server.app.test_client().post('/api/live/start', json={'source': 'http://127.0.0.1:5000/'})
+    assert response.status_code == 400
+    print("✓ Private stream addresses are rejected")
+    return True
+
+
+def test_follow_all_sees_alias_tasks():
+    """跟随所有任务的状态推送能看到复用结果新建的任务，并随源任务一起推送其完成状态"""
+    print("\nTesting follow-all status stream with cached aliases...")
+    import tempfile
+    from pathlib import Path
+    import api_server
+    from modules.result_cache import ResultCache
+
+    def next_status(stream):
+        message = next(stream)
+        assert message.startswith('event: status'), message
+        return json.loads(message.split('data: ', 1)[1])
+
+    original_cache = api_server.result_cache
+    with tempfile.TemporaryDirectory() as folder:
+        try:
+            api_server.result_cache = ResultCache(Path(folder) / 'result_cache.json')
+            api_server.processing_tasks['alias-source'] = {'status': 'processing', 'progress': 10, 'cache_key': 'k'}
+            stream = api_server.stream_task_status()
+            for _ in range(len(api_server.processing_tasks) + 1):  # retry 行与已有任务的当前状态
+                next(stream)
+
+            assert api_server.reuse_cached_result('alias-copy', 'k') == 'alias-source'
+            assert next_status(stream) == {'task_id': 'alias-copy', 'status': 'processing', 'progress': 10}
+
+            api_server.processing_tasks['alias-source'].update(status='completed', progress=100)
+            api_server.task_events.publish('alias-source')
+            assert {next_status(stream)['task_id'] for _ in range(2)} == {'alias-source', 'alias-copy'}
+        finally:
+            api_server.result_cache = original_cache
+            api_server.processing_tasks.pop('alias-source', None)
+            api_server.processing_tasks.pop('alias-copy', None)
+    print("✓ Alias tasks are pushed to follow-all streams")
+    return True
+
+
 def main():
     """运行所有测试"""
     print("=" * 60)
@@ -148,6 +285,10 @@ def main():
         ("Mock AI Analysis", test_mock_ai_analysis),
         ("Metrics Summary", test_metrics_summary),
         ("Students Database", test_students_db),
+        ("Readiness Gate", test_readiness_gate),
+        ("Checkpoint Resume", test_resume_only_interrupted),
+        ("Live Source Allowlist", test_live_source_allowlist),
+        ("Follow-all Alias Events", test_follow_all_sees_alias_tasks),
     ]
     
     results = []
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""测试跨任务批量推理调度：多线程提交的帧被合批推理，结果正确分发回各调用方"""
+
+import sys
+import os
+import threading
+
+import numpy as np
+
+# 添加 multi_scene_monitoring 到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'multi_scene_monitoring'))
+
+from modules.batch_scheduler import BatchInferenceScheduler
+
+
+class _EchoEngine:
+    """返回输入均值的假引擎，记录每次批量推理的批大小"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def infer_batch(self, imgs):
+        self.batch_sizes.append(len(imgs))
+        return [float(img.mean()) for img in imgs]
+
+
+def test_batches_across_clients():
+    """多个任务同时提交时合成一批，且每帧拿回自己的结果"""
+    print("Testing cross-task batching...")
+    engine = _EchoEngine()
+    scheduler = BatchInferenceScheduler(engine, max_batch_size=4, max_wait_ms=200).start()
+    results = {}
+
+    def client(value):
+        with scheduler.session():
+            barrier.wait()
+            results[value] = scheduler.infer(np.full((8, 8, 3), value, dtype=np.uint8))
+
+    barrier = threading.Barrier(4)
+    threads = [threading.Thread(target=client, args=(value,)) for value in (10, 20, 30, 40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.stop()
+
+    assert results == {10: 10.0, 20: 20.0, 30: 30.0, 40: 40.0}
+    assert max(engine.batch_sizes) > 1
+    print(f"✓ Cross-task batching OK, batch sizes: {engine.batch_sizes}")
+
+
+def test_mixed_shapes():
+    """不同尺寸的帧分组推理"""
+    print("\nTesting mixed input shapes...")
+    engine = _EchoEngine()
+    scheduler = BatchInferenceScheduler(engine, max_batch_size=8, max_wait_ms=0).start()
+    assert scheduler.infer(np.full((8, 8, 3), 5, dtype=np.uint8)) == 5.0
+    assert scheduler.infer(np.full((8, 16, 3), 7, dtype=np.uint8)) == 7.0
+    scheduler.stop()
+    print("✓ Mixed shapes OK")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Testing Batch Inference Scheduler")
+    print("=" * 60)
+    test_batches_across_clients()
+    test_mixed_shapes()
+    print("\n✓ All batch scheduler tests passed!")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
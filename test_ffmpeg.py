@@ -3,12 +3,14 @@
 
 import sys
 import os
+import struct
+import tempfile
 from pathlib import Path
 
 # 添加multi_scene_monitoring到路径
 sys.path.append(str(Path(__file__).parent / "multi_scene_monitoring"))
 
-from api_server import transcode_video_to_h264
+from api_server import find_ffmpeg, remux_faststart, transcode_video_to_h264
 
 def test_ffmpeg_function():
     """测试FFmpeg转码功能"""
@@ -30,6 +32,49 @@ def test_ffmpeg_function():
         print(f"⚠️  其他错误: {message}")
         return False
 
+
+def _top_level_boxes(path):
+    """按顺序返回 MP4 顶层 box 的类型"""
+    boxes = []
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return boxes
+            size, kind = struct.unpack('>I4s', header)
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0] - 8
+            boxes.append(kind.decode('latin-1'))
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+def test_remux_faststart():
+    """跳过转码的视频仍重新封装：moov 移到 mdat 之前"""
+    print("测试faststart重新封装...")
+    if find_ffmpeg() is None:
+        print("⚠️  FFmpeg未找到，跳过")
+        return True
+    import cv2
+    import numpy as np
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / 'output.mp4'
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 25, (64, 48))
+        for i in range(10):
+            writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+        writer.release()
+        boxes = _top_level_boxes(path)
+        assert boxes.index('mdat') < boxes.index('moov')
+
+        success, message = remux_faststart(path)
+        assert success, message
+        boxes = _top_level_boxes(path)
+        assert boxes.index('moov') < boxes.index('mdat')
+        assert not (Path(folder) / 'output_faststart.mp4').exists()
+    print("✅ moov 已移到文件开头")
+    return True
+
+
 if __name__ == "__main__":
     if test_ffmpeg_function():
         print("\n🎉 FFmpeg配置成功！视频转码功能应该可以正常工作了。")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""测试跳帧推理：自适应帧间隔、关键帧插值与静止帧门控"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加 multi_scene_monitoring 到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'multi_scene_monitoring'))
+
+from modules.frame_sampling import (
+    adjust_stride_for_motion,
+    calculate_adaptive_stride,
+    estimate_pose_motion,
+    interpolate_poses,
+    stitch_order,
+)
+from modules.motion_gate import MotionGate, resolve_motion_threshold
+
+
+def _make_pose(offset_x, missing=()):
+    """构造一个站立人体的 2D/3D 姿态，整体水平平移 offset_x"""
+    pose_2d = np.ones(19 * 3 + 1, dtype=np.float32)
+    pose_3d = np.ones(19 * 4, dtype=np.float32)
+    for kpt_id in range(19):
+        pose_2d[kpt_id * 3] = 100 + offset_x + kpt_id
+        pose_2d[kpt_id * 3 + 1] = 50 + kpt_id * 10
+        pose_3d[kpt_id * 4] = offset_x
+        pose_3d[kpt_id * 4 + 1] = kpt_id
+        pose_3d[kpt_id * 4 + 2] = 300
+    for kpt_id in missing:
+        pose_2d[kpt_id * 3:kpt_id * 3 + 3] = -1
+        pose_3d[kpt_id * 4:kpt_id * 4 + 4] = -1
+    return pose_3d.reshape(1, -1), np.array([pose_2d])
+
+
+def test_adaptive_stride():
+    """短视频逐帧推理，长视频按时长放宽帧间隔"""
+    print("Testing adaptive stride...")
+    assert calculate_adaptive_stride(60, 30.0, 2.0) == 1
+    assert calculate_adaptive_stride(3000, 30.0, 100.0) == 5
+    assert adjust_stride_for_motion(5, None) == 5
+    assert adjust_stride_for_motion(5, 0.5) == 1
+    print("✓ Adaptive stride OK")
+
+
+def test_interpolate_poses():
+    """中间帧按比例插值，缺失关键点沿用更近的关键帧"""
+    print("\nTesting pose interpolation...")
+    start = _make_pose(0)
+    end = _make_pose(40, missing=(5,))
+    poses_3d, poses_2d = interpolate_poses(start, end, 0.25)
+
+    assert poses_2d.shape == start[1].shape
+    assert abs(poses_2d[0][0] - 110) < 1e-4
+    assert abs(poses_3d[0][0] - 10) < 1e-4
+    # 左腕在结束关键帧缺失，保留开始关键帧的位置
+    assert abs(poses_2d[0][5 * 3] - start[1][0][5 * 3]) < 1e-4
+
+    motion = estimate_pose_motion(start[1], end[1], frame_gap=4)
+    assert motion is not None and motion > 0
+    print(f"✓ Interpolation OK, motion per frame: {motion:.4f}")
+
+
+def test_interpolate_without_people():
+    """一端无人时直接沿用更近的关键帧"""
+    print("\nTesting interpolation with empty keyframe...")
+    start = _make_pose(0)
+    end = (np.array([]), np.array([]))
+    poses_3d, poses_2d = interpolate_poses(start, end, 0.8)
+    assert len(poses_2d) == 0
+    poses_3d, poses_2d = interpolate_poses(start, end, 0.2)
+    assert len(poses_2d) == 1
+    print("✓ Empty keyframe OK")
+
+
+def test_stitch_order():
+    """分段拼接时按重叠帧匹配人员，后一分段沿用前一分段的人员顺序"""
+    print("\nTesting segment stitching...")
+    left = _make_pose(0)[1][0]
+    right = _make_pose(200)[1][0]
+    reference = np.array([left, right])
+    assert stitch_order(reference, np.array([right, left])) == [1, 0]
+    assert stitch_order(reference, reference) is None
+    assert stitch_order(reference, np.array([left])) is None
+    print("✓ Segment stitching OK")
+
+
+def test_motion_gate():
+    """静止画面复用姿态，画面变化或复用过久时重新推理"""
+    print("\nTesting motion gate...")
+    gate = MotionGate(resolve_motion_threshold('dribbling'), max_reuse_frames=3)
+    still = np.full((240, 320, 3), 60, dtype=np.uint8)
+    moved = still.copy()
+    moved[60:180, 100:220] = 255
+
+    decisions = [gate.should_infer(still) for _ in range(5)]
+    assert decisions == [True, False, False, False, True]
+    assert gate.should_infer(moved)
+    assert not gate.should_infer(moved)
+
+    # 只对关键帧调用时按源视频帧号计算复用上限，而不是按复用的关键帧数
+    gate = MotionGate(resolve_motion_threshold('dribbling'), max_reuse_frames=3)
+    decisions = [gate.should_infer(still, frame_idx) for frame_idx in (0, 2, 4, 6)]
+    assert decisions == [True, False, True, False]
+    print("✓ Motion gate OK")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Testing Frame Sampling")
+    print("=" * 60)
+    test_adaptive_stride()
+    test_interpolate_poses()
+    test_interpolate_without_people()
+    test_stitch_order()
+    test_motion_gate()
+    print("\n✓ All frame sampling tests passed!")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""测试输入尺寸分桶：补齐到固定宽度后，解析出的姿态与未补齐时一致，补齐区域不产生检测"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加 multi_scene_monitoring 到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'multi_scene_monitoring'))
+
+from modules.parse_poses import parse_poses
+from modules.shape_buckets import bucket_width, pad_to_bucket
+
+STRIDE = 8
+# 颈部、鼻子、双肩、双髋在特征图上的坐标 (x, y)
+KEYPOINTS = {1: (20, 10), 0: (20, 6), 2: (16, 12), 5: (24, 12), 8: (18, 22), 11: (22, 22)}
+# (关键点 a, 关键点 b, PAF x 通道, PAF y 通道)
+LIMBS = [(1, 2, 12, 13), (1, 5, 20, 21), (1, 8, 0, 1), (1, 11, 6, 7), (1, 0, 28, 29)]
+
+
+def _draw_person(heatmaps, pafs, shift_x=0):
+    ys, xs = np.mgrid[0:heatmaps.shape[1], 0:heatmaps.shape[2]]
+    for kpt_id, (x, y) in KEYPOINTS.items():
+        # 峰值中心偏离整数网格，上采样后仍是唯一极大值
+        blob = np.exp(-((xs - x - 0.3 - shift_x) ** 2 + (ys - y - 0.3) ** 2) / 2.0)
+        heatmaps[kpt_id] = np.maximum(heatmaps[kpt_id], blob)
+    for kpt_a, kpt_b, paf_x, paf_y in LIMBS:
+        start = np.array(KEYPOINTS[kpt_a], dtype=np.float32) + (shift_x, 0)
+        end = np.array(KEYPOINTS[kpt_b], dtype=np.float32) + (shift_x, 0)
+        length = np.linalg.norm(end - start)
+        direction = (end - start) / length
+        # 肢体两侧 1.5 个像素以内填充单位方向向量
+        along = (xs - start[0]) * direction[0] + (ys - start[1]) * direction[1]
+        across = np.abs((xs - start[0]) * direction[1] - (ys - start[1]) * direction[0])
+        on_limb = (along >= 0) & (along <= length) & (across <= 1.5)
+        pafs[paf_x][on_limb] = direction[0]
+        pafs[paf_y][on_limb] = direction[1]
+
+
+def _inference_results(width, shift_x=0):
+    rng = np.random.default_rng(0)
+    features = rng.uniform(-1, 1, (57, 32, width)).astype(np.float32)
+    heatmaps = np.zeros((19, 32, width), dtype=np.float32)
+    pafs = np.zeros((38, 32, width), dtype=np.float32)
+    _draw_person(heatmaps, pafs, shift_x)
+    return features, heatmaps, pafs
+
+
+def test_bucket_width():
+    """宽度补齐到不小于自身的最小分桶，超出最大分桶时按 64 对齐"""
+    print("Testing bucket width...")
+    assert bucket_width(144) == 144
+    assert bucket_width(341) == 344
+    assert bucket_width(455) == 456
+    assert bucket_width(900) == 960
+    assert bucket_width(455, buckets=()) is None
+
+    img = np.zeros((256, 341, 3), dtype=np.uint8)
+    padded, padding = pad_to_bucket(img)
+    assert padded.shape == (256, 344, 3)
+    assert padding[0] % STRIDE == 0 and sum(padding) == 344 - 341
+    cropped, padding = pad_to_bucket(img, buckets=())
+    assert cropped.shape == (256, 336, 3) and padding is None
+    print("✓ Bucket width OK")
+
+
+def test_padding_is_transparent():
+    """左右补齐并屏蔽补齐区域后，2D/3D 结果与未补齐的输入完全一致"""
+    print("\nTesting padded parsing...")
+    input_scale = 0.5
+    fx = np.float32(0.8 * 80 * STRIDE / input_scale)
+    poses_3d, poses_2d = parse_poses(_inference_results(40), input_scale, STRIDE, fx)
+    assert len(poses_2d) == 1
+
+    pad_cols = 3
+    features, heatmaps, pafs = _inference_results(40 + pad_cols + 5, shift_x=pad_cols)
+    features[:, :, pad_cols:pad_cols + 40] = _inference_results(40)[0]
+    # 补齐区域内的干扰峰值应被屏蔽
+    heatmaps[1, 16, 1] = 1.0
+    padded_3d, padded_2d = parse_poses((features, heatmaps, pafs), input_scale, STRIDE, fx,
+                                       padding=(pad_cols * STRIDE, 5 * STRIDE))
+    assert len(padded_2d) == 1
+    assert np.array_equal(poses_2d, padded_2d)
+    assert np.allclose(poses_3d, padded_3d, atol=1e-3)
+    print("✓ Padded parsing OK")
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Testing Shape Buckets")
+    print("=" * 60)
+    test_bucket_width()
+    test_padding_is_transparent()
+    print("\n✓ All shape bucket tests passed!")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())